@@ -1,12 +1,17 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from typing import Dict, Set, Any
+from contextlib import aclosing
 import json
 import uuid
 import asyncio
+import time
 from datetime import datetime
 import logging
 
-from app.models.api_models import ChatRequest, ChatResponse, ChatError
+from app.core.instrumentation import LatencyWindow
+from app.models.api_models import ChatRequest, ChatResponse, ChatSources, ChatDelta, ChatError
+from app.api.dependencies import get_document_service
+from app.services.container import service_container
 from app.services.document_service import DocumentService
 from app.services.llm_service import llm_service
 
@@ -74,11 +79,14 @@ class ConnectionManager:
 # Global connection manager instance
 manager = ConnectionManager()
 
-# Initialize document service
-document_service = DocumentService()
+# Time from receiving a question to sending the first streamed answer token
+chat_ttft = LatencyWindow()
 
 @router.websocket("/chat")
-async def websocket_chat_endpoint(websocket: WebSocket):
+async def websocket_chat_endpoint(
+    websocket: WebSocket,
+    document_service: DocumentService = Depends(get_document_service)
+):
     """
     WebSocket endpoint for real-time chat with document analysis capabilities.
     
@@ -86,8 +94,12 @@ async def websocket_chat_endpoint(websocket: WebSocket):
     and receive AI-powered responses with relevant source citations.
     
     Message Format:
-    - Incoming: {"message": "user question", "session_id": "optional", "context": {}}
-    - Outgoing: {"type": "ai_response", "answer": "response", "sources": [], "financial_summary": {}}
+    - Incoming: {"message": "user question", "session_id": "optional", "context": {}, "stream": true}
+    - Outgoing, streamed (default):
+        {"type": "ai_response_sources", "sources": [], "financial_summary": {}}
+        {"type": "ai_response_delta", "content": "partial answer text"}  (repeated)
+        {"type": "ai_response", "answer": "full response", "sources": [], "usage": {}, "ttft_ms": 850.0}
+    - Outgoing with "stream": false: a single "ai_response" frame
     """
     session_id = None
     try:
@@ -122,7 +134,7 @@ async def websocket_chat_endpoint(websocket: WebSocket):
                     continue
                 
                 # Process the user's question
-                await process_chat_message(chat_request, session_id)
+                await process_chat_message(chat_request, session_id, document_service)
                 
             except WebSocketDisconnect:
                 logger.info(f"WebSocket client disconnected: {session_id}")
@@ -148,14 +160,16 @@ async def websocket_chat_endpoint(websocket: WebSocket):
         if session_id:
             manager.disconnect(session_id)
 
-async def process_chat_message(chat_request: ChatRequest, session_id: str):
+async def process_chat_message(chat_request: ChatRequest, session_id: str, document_service: DocumentService):
     """
     Process a chat message and generate an AI response using the document service.
     
     Args:
         chat_request: The parsed chat request from the user
         session_id: The WebSocket session ID
+        document_service: The application's shared DocumentService
     """
+    received = time.perf_counter()
     try:
         # Validate the message
         if not chat_request.message.strip():
@@ -183,6 +197,10 @@ async def process_chat_message(chat_request: ChatRequest, session_id: str):
         if chat_request.llm_provider:
             filters['llm_provider'] = chat_request.llm_provider
         
+        if chat_request.stream:
+            await stream_chat_response(chat_request, session_id, document_service, filters, received)
+            return
+        
         # Use the existing DocumentService.query_financial_data method
         query_result = await document_service.query_financial_data(
             query=chat_request.message,
@@ -206,6 +224,7 @@ async def process_chat_message(chat_request: ChatRequest, session_id: str):
             llm_provider=query_result.get("llm_provider"),
             model_used=query_result.get("model_used"),
             usage=query_result.get("usage"),
+            context_tokens=query_result.get("context_tokens"),
             session_id=session_id
         )
         
@@ -224,6 +243,72 @@ async def process_chat_message(chat_request: ChatRequest, session_id: str):
             "INTERNAL_ERROR"
         )
 
+async def stream_chat_response(chat_request: ChatRequest,
+                               session_id: str,
+                               document_service: DocumentService,
+                               filters: Dict[str, Any],
+                               received: float):
+    """
+    Send the retrieved sources, then the answer as ai_response_delta frames as
+    the provider produces it, then a final ai_response frame with the full
+    answer, usage and time to first token.
+    """
+    sources = []
+    financial_summary = None
+    ttft_ms = None
+    
+    events = document_service.stream_financial_query(
+        query=chat_request.message,
+        filters=filters if filters else None
+    )
+    try:
+        # Closing the generator on disconnect also closes the provider stream
+        async with aclosing(events):
+            async for event in events:
+                if event["event"] == "sources":
+                    sources = event["sources"]
+                    financial_summary = event["financial_summary"]
+                    await manager.send_personal_message(ChatSources(
+                        sources=sources,
+                        financial_summary=financial_summary,
+                        session_id=session_id
+                    ).model_dump(), session_id)
+                
+                elif event["event"] == "delta":
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - received) * 1000, 1)
+                        chat_ttft.add(ttft_ms)
+                    await manager.send_personal_message(ChatDelta(
+                        content=event["content"],
+                        session_id=session_id
+                    ).model_dump(), session_id)
+                
+                elif event["event"] == "done":
+                    await manager.send_personal_message(ChatResponse(
+                        answer=event["answer"] or "I couldn't find relevant information to answer your question.",
+                        sources=sources,
+                        financial_summary=financial_summary,
+                        llm_provider=event["llm_provider"],
+                        model_used=event["model_used"],
+                        usage=event["usage"],
+                        context_tokens=event["context_tokens"],
+                        ttft_ms=ttft_ms,
+                        session_id=session_id
+                    ).model_dump(), session_id)
+    
+    except Exception as e:
+        if session_id not in manager.active_connections:
+            # The client went away mid-answer; nothing left to send
+            raise
+        logger.error(f"Error streaming chat response for session {session_id}: {e}")
+        await manager.send_error(f"Query failed: {str(e)}", session_id, "QUERY_ERROR")
+        return
+    
+    logger.info(
+        f"Streamed answer for session {session_id} with {len(sources)} sources, "
+        f"first token after {ttft_ms}ms"
+    )
+
 @router.get("/chat/status")
 async def get_chat_status():
     """
@@ -232,12 +317,25 @@ async def get_chat_status():
     Returns information about active connections and service health.
     """
     try:
+        document_service = service_container.document_service
+        if document_service is None:
+            return {
+                "status": "unavailable",
+                "active_connections": manager.get_connection_count(),
+                "indexed_documents": None,
+                "service_info": {
+                    "document_service": "not_ready",
+                    "chroma_db": "disconnected"
+                },
+                "timestamp": datetime.now().isoformat()
+            }
         document_count = await document_service.get_document_count()
         
         return {
             "status": "healthy",
             "active_connections": manager.get_connection_count(),
             "indexed_documents": document_count,
+            "time_to_first_token": chat_ttft.to_dict(),
             "service_info": {
                 "document_service": "ready" if document_service.query_engine else "not_ready",
                 "chroma_db": "connected" if document_service.collection else "disconnected"
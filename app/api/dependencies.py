@@ -0,0 +1,27 @@
+"""
+FastAPI dependencies for the shared application services
+"""
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.startup import startup_state
+from app.services.container import service_container
+from app.services.document_service import DocumentService
+
+
+async def require_started():
+    """Reject data requests with 503 and Retry-After until tables exist and the job service is up"""
+    if not startup_state.completed("database", "jobs"):
+        raise HTTPException(
+            status_code=503,
+            detail="Service is starting. Try again shortly.",
+            headers={"Retry-After": str(settings.STARTUP_RETRY_AFTER_SECONDS)}
+        )
+
+
+async def get_document_service() -> DocumentService:
+    """The application's DocumentService, created in the lifespan"""
+    if not service_container.started:
+        raise HTTPException(status_code=503, detail="Document service is not available")
+    return service_container.document_service
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
 from fastapi.responses import JSONResponse
-from typing import List
+from typing import List, Optional
+import asyncio
+import mimetypes
 import uuid
 import shutil
 from pathlib import Path
@@ -8,13 +10,40 @@ from datetime import datetime
 
 from app.core.config import settings
 from app.models.document import DocumentResponse, DocumentQuery, SearchResult
+from app.api.dependencies import get_document_service
 from app.services.document_service import DocumentService
 from app.services.job_service import job_service
+from app.services.document_catalog import document_catalog
+from app.services.storage_service import (
+    stream_upload_to_temp, extract_archive_members, is_archive_filename, blob_store,
+    FileTooLargeError, InvalidArchiveError, ARCHIVE_SUFFIXES
+)
+from app.services.ingestion_executor import ingestion_executor, QueueFullError
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-# Initialize document service
-document_service = DocumentService()
+def upload_size_limit(path: str) -> Optional[int]:
+    """
+    Largest request body an upload route accepts, or None for other routes.
+    Checked against Content-Length before the body is received, since the
+    multipart form is read in full before the handler runs.
+    """
+    if path.endswith("/documents/upload"):
+        return settings.MAX_FILE_SIZE + settings.UPLOAD_FORM_OVERHEAD
+    if path.endswith("/documents/upload/batch"):
+        return settings.MAX_ARCHIVE_SIZE + settings.UPLOAD_FORM_OVERHEAD
+    return None
+
+async def check_ingestion_capacity(incoming: int = 1):
+    """Reject uploads with 503 and Retry-After while the ingestion queue is full"""
+    try:
+        await ingestion_executor.check_capacity(incoming)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{e}. Try again later.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
 
 @router.post("/upload")
 async def upload_document(file: UploadFile = File(...)):
@@ -30,9 +59,13 @@ async def upload_document(file: UploadFile = File(...)):
             detail=f"File type {file_extension} not allowed. Allowed types: {settings.ALLOWED_EXTENSIONS}"
         )
     
-    # Check file size
-    content = await file.read()
-    if len(content) > settings.MAX_FILE_SIZE:
+    # Apply backpressure before accepting the body
+    await check_ingestion_capacity()
+    
+    # Copy the upload to a temp file, enforcing the size limit as it goes
+    try:
+        stored = await stream_upload_to_temp(file)
+    except FileTooLargeError:
         raise HTTPException(
             status_code=400,
             detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE} bytes"
@@ -42,10 +75,10 @@ async def upload_document(file: UploadFile = File(...)):
     document_id = str(uuid.uuid4())
     file_path = settings.DOCUMENTS_DIR / f"{document_id}_{file.filename}"
     
+    blob = None
     try:
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        # Store the upload by content digest and link it into the documents directory
+        blob = await blob_store.add(stored, file_path)
         
         # Create document response
         document = DocumentResponse(
@@ -53,10 +86,12 @@ async def upload_document(file: UploadFile = File(...)):
             filename=file.filename,
             file_path=str(file_path),
             content_type=file.content_type,
-            file_size=len(content),
+            file_size=stored.size,
             uploaded_at=datetime.now(),
-            indexed=False
+            indexed=False,
+            content_digest=stored.sha256
         )
+        await document_catalog.add(document)
         
         # Initialize job service if needed
         if not job_service._initialized:
@@ -70,18 +105,126 @@ async def upload_document(file: UploadFile = File(...)):
             "document_id": document_id,
             "job_id": job_id,
             "filename": file.filename,
-            "file_size": len(content),
+            "file_size": stored.size,
+            "sha256": stored.sha256,
+            "upload": stored.to_dict(),
             "status": "processing"
         }
         
     except Exception as e:
-        # Clean up file if something went wrong
+        # Clean up file if something went wrong, without touching shared blobs
+        await document_catalog.remove(document_id)
+        if blob:
+            await blob_store.release(stored.sha256, document_id)
+        elif stored.path.parent == settings.UPLOAD_TMP_DIR:
+            stored.discard()
         if file_path.exists():
             file_path.unlink()
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
+@router.post("/upload/batch")
+async def upload_document_batch(file: UploadFile = File(...)):
+    """
+    Upload a ZIP or TAR archive of documents and process every supported member
+    Returns a batch ID for tracking aggregate progress
+    
+    The archive is received into one spooled temporary file (ZIP needs random
+    access to its central directory) and each member is then copied out once.
+    Archives declared larger than MAX_ARCHIVE_SIZE are refused before the body
+    is read (see ``upload_size_limit``); the check below covers bodies sent
+    without a Content-Length.
+    """
+    if not file.filename or not is_archive_filename(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Archive type not supported. Supported types: {', '.join(ARCHIVE_SUFFIXES)}"
+        )
+    
+    if file.size is not None and file.size > settings.MAX_ARCHIVE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Archive too large. Maximum size: {settings.MAX_ARCHIVE_SIZE} bytes"
+        )
+    
+    # Apply backpressure before extracting anything
+    await check_ingestion_capacity()
+    
+    # Copy members to their own temp files in a worker thread
+    try:
+        extracted, skipped = await asyncio.to_thread(extract_archive_members, file.file, file.filename)
+    except InvalidArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not extracted:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No supported documents found in archive. Allowed types: {settings.ALLOWED_EXTENSIONS}"
+        )
+    
+    try:
+        await check_ingestion_capacity(len(extracted))
+    except HTTPException:
+        for _, stored in extracted:
+            stored.discard()
+        raise
+    
+    batch_id = str(uuid.uuid4())
+    documents = []
+    items = []
+    for filename, stored in extracted:
+        document_id = str(uuid.uuid4())
+        file_path = settings.DOCUMENTS_DIR / f"{document_id}_{filename}"
+        items.append((stored, file_path))
+        documents.append(DocumentResponse(
+            id=document_id,
+            filename=filename,
+            file_path=str(file_path),
+            content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            file_size=stored.size,
+            uploaded_at=datetime.now(),
+            indexed=False,
+            content_digest=stored.sha256
+        ))
+    
+    blobs = []
+    try:
+        # Store every member by content digest in one transaction
+        blobs = await blob_store.add_many(items)
+        await document_catalog.add_many(documents)
+        
+        # Initialize job service if needed
+        if not job_service._initialized:
+            await job_service.initialize()
+        
+        job_ids = await job_service.create_batch_jobs(documents, batch_id)
+        
+        return {
+            "message": "Archive uploaded successfully",
+            "batch_id": batch_id,
+            "job_ids": job_ids,
+            "document_count": len(documents),
+            "total_bytes": sum(document.file_size for document in documents),
+            "skipped": skipped,
+            "status": "processing"
+        }
+        
+    except Exception as e:
+        # Clean up files if something went wrong, without touching shared blobs
+        for (stored, file_path), document in zip(items, documents):
+            await document_catalog.remove(document.id)
+            if blobs:
+                await blob_store.release(stored.sha256, document.id)
+            elif stored.path.parent == settings.UPLOAD_TMP_DIR:
+                stored.discard()
+            if file_path.exists():
+                file_path.unlink()
+        raise HTTPException(status_code=500, detail=f"Error uploading archive: {str(e)}")
+
 @router.post("/search", response_model=List[SearchResult])
-async def search_documents(query: DocumentQuery):
+async def search_documents(
+    query: DocumentQuery,
+    document_service: DocumentService = Depends(get_document_service)
+):
     """
     Search documents using vector similarity
     """
@@ -92,7 +235,10 @@ async def search_documents(query: DocumentQuery):
         raise HTTPException(status_code=500, detail=f"Error searching documents: {str(e)}")
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: str):
+async def delete_document(
+    document_id: str,
+    document_service: DocumentService = Depends(get_document_service)
+):
     """
     Delete a document by ID (removes from disk and ChromaDB)
     """
@@ -108,27 +254,43 @@ async def delete_document(document_id: str):
         raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
 
 @router.get("")
-async def list_documents():
+async def list_documents(
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of documents to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    sort: str = Query("uploaded_at", description="Sort field: uploaded_at, filename, file_size"),
+    order: str = Query("desc", description="Sort order: asc or desc"),
+    filename: Optional[str] = Query(None, description="Filter by filename substring"),
+    content_type: Optional[str] = Query(None, description="Filter by content type"),
+    index_state: Optional[str] = Query(None, description="Filter by index state: pending, indexed, failed, cancelled"),
+    uploaded_after: Optional[datetime] = Query(None, description="Only documents uploaded at or after this time"),
+    uploaded_before: Optional[datetime] = Query(None, description="Only documents uploaded before this time")
+):
+    """
+    List uploaded documents from the catalog, one page at a time
+    """
+    try:
+        return await document_catalog.list_documents(
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            order=order,
+            filename=filename,
+            content_type=content_type,
+            index_state=index_state,
+            uploaded_after=uploaded_after,
+            uploaded_before=uploaded_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
+
+@router.post("/reconcile")
+async def reconcile_documents(dry_run: bool = Query(False, description="Report drift without changing anything")):
     """
-    List all uploaded documents
+    Repair drift between the documents directory and the document catalog
     """
     try:
-        documents = []
-        for file_path in settings.DOCUMENTS_DIR.glob("*"):
-            if file_path.is_file():
-                # Extract document ID and original filename
-                parts = file_path.name.split("_", 1)
-                if len(parts) == 2:
-                    doc_id, filename = parts
-                    stat = file_path.stat()
-                    documents.append({
-                        "id": doc_id,
-                        "filename": filename,
-                        "file_path": str(file_path),
-                        "file_size": stat.st_size,
-                        "uploaded_at": datetime.fromtimestamp(stat.st_ctime),
-                        "indexed": True  # Assume indexed if file exists
-                    })
-        return documents
+        return await document_catalog.reconcile(dry_run=dry_run)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error reconciling documents: {str(e)}")
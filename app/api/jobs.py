@@ -2,14 +2,62 @@
 API endpoints for job tracking and progress monitoring
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import json
 
 from app.services.job_service import job_service
+from app.models.api_models import DeadLetterRedriveRequest
+from app.services.ingestion_executor import ingestion_executor, QueueFullError
+from app.services.job_events import job_events
+from app.services.progress_writer import job_progress_writer
+from app.services.job_metrics import job_metrics
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+# Comment line sent on idle event streams so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def format_sse(event: Dict[str, Any], event_type: str = "progress") -> str:
+    """Serialize an event as a Server-Sent Events frame"""
+    return f"event: {event_type}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@router.get("")
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of jobs to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    order: str = Query("desc", description="Sort order by creation time: asc or desc"),
+    status: Optional[str] = Query(None, description="Filter by status: pending, processing, completed, failed, cancelled, dead_letter"),
+    document_id: Optional[str] = Query(None, description="Filter by document"),
+    batch_id: Optional[str] = Query(None, description="Filter by batch"),
+    created_after: Optional[datetime] = Query(None, description="Only jobs created at or after this time"),
+    created_before: Optional[datetime] = Query(None, description="Only jobs created before this time"),
+    fields: str = Query("summary", description="summary (no result or error details) or full")
+):
+    """
+    List processing jobs one page at a time
+    """
+    try:
+        return await job_service.list_jobs(
+            limit=limit,
+            cursor=cursor,
+            order=order,
+            status=status,
+            document_id=document_id,
+            batch_id=batch_id,
+            created_after=created_after,
+            created_before=created_before,
+            fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing jobs: {str(e)}")
+
 
 @router.get("/status/{job_id}")
 async def get_job_status(job_id: str):
@@ -48,7 +96,7 @@ async def get_jobs_by_status(
             await job_service.initialize()
         
         # Validate status
-        valid_statuses = ["pending", "processing", "completed", "failed"]
+        valid_statuses = ["pending", "processing", "completed", "failed", "cancelled", "dead_letter"]
         if status not in valid_statuses:
             raise HTTPException(
                 status_code=400, 
@@ -91,35 +139,120 @@ async def get_recent_jobs(limit: int = Query(20, description="Maximum number of
 
 
 @router.get("/stats")
-async def get_job_stats():
+async def get_job_stats(
+    window_minutes: int = Query(60, ge=1, le=10080, description="Throughput window in minutes")
+):
+    """
+    Get job processing statistics: counts per status and stage, recent
+    throughput and stage duration percentiles, all from aggregate queries
+    """
+    try:
+        return await job_metrics.get_metrics(window_minutes=window_minutes)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting job stats: {str(e)}")
+
+
+@router.get("/metrics/latency")
+async def get_stage_latency(
+    window_minutes: int = Query(60, ge=1, le=10080, description="Time window in minutes"),
+    stage: Optional[str] = Query(None, description="Only this stage: parse, extract, chunk, embed, index")
+):
+    """
+    Get latency histograms per pipeline stage over a time window
     """
-    Get job processing statistics
+    try:
+        return await job_metrics.get_latency_histograms(window_minutes=window_minutes, stage=stage)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting stage latency: {str(e)}")
+
+
+@router.get("/queue")
+async def get_queue_stats():
+    """
+    Get ingestion queue depth and per-stage in-flight counts
+    """
+    return ingestion_executor.get_stats()
+
+
+@router.get("/writes")
+async def get_progress_write_stats():
+    """
+    Get commit and lock-wait counters for batched job progress writes
+    """
+    return job_progress_writer.get_stats()
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch_progress(batch_id: str):
+    """
+    Get aggregate progress for all jobs created from an archive upload
     """
     try:
         # Initialize job service if needed
         if not job_service._initialized:
             await job_service.initialize()
         
-        # Get counts by status
-        stats = {}
-        for status in ["pending", "processing", "completed", "failed"]:
-            jobs = await job_service.get_jobs_by_status(status, 1000)  # Get all
-            stats[status] = len(jobs)
+        batch_progress = await job_service.get_batch_progress(batch_id)
         
-        return {
-            "total_jobs": sum(stats.values()),
-            "by_status": stats,
-            "last_updated": datetime.utcnow().isoformat()
-        }
+        if not batch_progress:
+            raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
         
+        return batch_progress
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting job stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting batch progress: {str(e)}")
+
+
+@router.get("/events")
+async def stream_job_events(
+    request: Request,
+    job_id: Optional[str] = Query(None, description="Only events for this job"),
+    batch_id: Optional[str] = Query(None, description="Only events for jobs in this batch")
+):
+    """
+    Stream job progress as Server-Sent Events for one job, one batch or all jobs.
+    The current state of matching jobs is sent first; a single-job stream
+    closes once the job reaches a terminal state.
+    """
+    if job_id and not job_events.latest(job_id=job_id):
+        # Not tracked in this process yet: seed from the stored state once
+        job_status = await job_service.get_job_status(job_id)
+        if not job_status:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        job_events.seed(job_status)
+    
+    subscription = job_events.subscribe(job_id=job_id, batch_id=batch_id)
+    
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                
+                yield format_sse(event)
+                if job_id and event["completed"]:
+                    break
+        finally:
+            job_events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/progress/{job_id}")
 async def get_job_progress(job_id: str):
     """
-    Get simplified progress information for a job (for polling)
+    Get simplified progress information for a job (for polling).
+    Prefer GET /jobs/events, which pushes updates without database reads.
     """
     try:
         # Initialize job service if needed
@@ -138,7 +271,7 @@ async def get_job_progress(job_id: str):
             "progress": job_status["progress"],
             "current_step": job_status["current_step"],
             "error_message": job_status.get("error_message"),
-            "completed": job_status["status"] in ["completed", "failed"]
+            "completed": job_status["status"] in ["completed", "failed", "cancelled", "dead_letter"]
         }
         
     except HTTPException:
@@ -147,37 +280,80 @@ async def get_job_progress(job_id: str):
         raise HTTPException(status_code=500, detail=f"Error getting job progress: {str(e)}")
 
 
+@router.post("/dead-letter/redrive")
+async def redrive_dead_letter_jobs(request: DeadLetterRedriveRequest):
+    """
+    Re-queue dead-lettered jobs in bulk; each resumes from the stage that failed
+    """
+    try:
+        # Initialize job service if needed
+        if not job_service._initialized:
+            await job_service.initialize()
+        
+        return await job_service.redrive_dead_letter_jobs(
+            job_ids=request.job_ids,
+            batch_id=request.batch_id,
+            stage=request.stage,
+            limit=request.limit
+        )
+        
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"{e}. Try again later.", headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error re-driving jobs: {str(e)}")
+
+
+@router.delete("/batch/{batch_id}")
+async def cancel_batch(batch_id: str):
+    """
+    Cancel every pending or processing job created from an archive upload
+    """
+    try:
+        # Initialize job service if needed
+        if not job_service._initialized:
+            await job_service.initialize()
+        
+        outcome = await job_service.cancel_batch(batch_id)
+        
+        if not outcome:
+            raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+        
+        return {
+            "message": f"Batch {batch_id} cancellation requested",
+            **outcome
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error canceling batch: {str(e)}")
+
+
 @router.delete("/{job_id}")
 async def cancel_job(job_id: str):
     """
-    Cancel a pending or processing job
-    Note: This is a placeholder - actual job cancellation would require 
-    more sophisticated implementation with APScheduler
+    Cancel a pending or processing job.
+    Queued jobs are cancelled immediately; running jobs stop at their next
+    stage boundary and report status "cancelling" until they do.
     """
     try:
         # Initialize job service if needed
         if not job_service._initialized:
             await job_service.initialize()
         
-        job_status = await job_service.get_job_status(job_id)
+        outcome = await job_service.cancel_job(job_id)
         
-        if not job_status:
+        if not outcome:
             raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
         
-        if job_status["status"] in ["completed", "failed"]:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Cannot cancel job in status: {job_status['status']}"
-            )
-        
-        # TODO: Implement actual job cancellation with APScheduler
-        # For now, just return a message
         return {
             "message": f"Job cancellation requested for {job_id}",
-            "note": "Job cancellation is not fully implemented yet"
+            **outcome
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error canceling job: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error canceling job: {str(e)}")
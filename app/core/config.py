@@ -6,16 +6,102 @@ class Settings(BaseSettings):
     # Document storage
     UPLOAD_DIR: Path = Path("uploads")
     DOCUMENTS_DIR: Path = Path("uploads/documents")
+    BLOB_DIR: Path = Path("uploads/blobs")  # Content-addressed storage keyed by SHA-256
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: set = {".pdf", ".png", ".jpg", ".jpeg", ".txt", ".docx"}
+    UPLOAD_TMP_DIR: Path = Path("uploads/tmp")  # Must be on the same filesystem as DOCUMENTS_DIR
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB read/write chunks for streaming uploads
+    UPLOAD_FORM_OVERHEAD: int = 64 * 1024  # Allowance for multipart framing on top of the file size limits
+    MAX_ARCHIVE_SIZE: int = 1024 * 1024 * 1024  # 1GB batch archive upload limit
+    MAX_ARCHIVE_MEMBERS: int = 1000  # Maximum documents extracted from one archive
     
     # ChromaDB
     CHROMA_DB_PATH: str = "data/chroma_db"
     COLLECTION_NAME: str = "penny_documents"
     
+    # Embeddings: the model and dimension are recorded in the collection metadata,
+    # and changing them re-embeds the collection in the background
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_DIMENSIONS: int = 0  # 0 uses the model's native dimension
+    EMBEDDING_MIGRATION_BATCH_SIZE: int = 256  # Chunks re-embedded per batch during a migration
+    EMBEDDING_RETIRE_GRACE_SECONDS: int = 300  # Old collection kept after a swap while worker processes reopen the new one
+    EMBEDDING_BATCH_MAX_TOKENS: int = 250_000  # Tokens per embedding request (OpenAI allows 300k)
+    EMBEDDING_BATCH_MAX_INPUTS: int = 2048  # Texts per embedding request (OpenAI maximum)
+    EMBEDDING_CACHE_ENABLED: bool = True  # Reuse vectors for identical text under the same model
+    EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB, least recently used vectors evicted first
+    
     # LlamaIndex
     CHUNK_SIZE: int = 1024
     CHUNK_OVERLAP: int = 200
+    
+    # Startup: data routes answer 503 until the database and job service phases finish
+    STARTUP_RETRY_AFTER_SECONDS: int = 2
+    
+    # Ingestion executor: worker pool size, per-stage concurrency and backpressure
+    INGEST_WORKERS: int = 4
+    INGEST_PARSE_CONCURRENCY: int = 2  # Concurrent LlamaParse jobs
+    INGEST_EXTRACT_CONCURRENCY: int = 2  # Concurrent LLM extraction calls
+    INGEST_EMBED_CONCURRENCY: int = 2  # Concurrent embedding batches
+    INGEST_INDEX_CONCURRENCY: int = 1  # Concurrent ChromaDB inserts
+    INGEST_MAX_QUEUE_DEPTH: int = 500  # Uploads are rejected with 503 beyond this
+    INGEST_RETRY_AFTER_SECONDS: int = 30
+    INGEST_MODE: str = "inline"  # "inline": the API process runs the workers; "api": API only, run `python -m app.worker` separately
+    INGEST_POLL_INTERVAL: float = 1.0  # Seconds between claim attempts in worker processes
+    JOB_EVENTS_POLL_INTERVAL: float = 1.0  # API-only mode: seconds between relays of worker progress to subscribers
+    
+    # Provider retries per pipeline stage (jittered exponential backoff, honours Retry-After)
+    INGEST_RETRY_ATTEMPTS: int = 4  # Attempts per stage before the job is dead-lettered
+    INGEST_RETRY_BASE_DELAY: float = 1.0  # Seconds; doubles each attempt
+    INGEST_RETRY_MAX_DELAY: float = 60.0
+    
+    # Write-behind job progress (one writer task batches updates into a single transaction)
+    JOB_PROGRESS_FLUSH_INTERVAL: float = 0.5  # Seconds between progress flushes
+    JOB_PROGRESS_LOCK_RETRIES: int = 5  # Retries when SQLite reports the database is locked
+    JOB_METRICS_PERIOD_SECONDS: int = 300  # Granularity of the stage latency histograms
+    
+    # Leases on running jobs; a job whose lease expires is recovered and resumed
+    JOB_LEASE_SECONDS: int = 60
+    JOB_HEARTBEAT_INTERVAL: int = 15  # Seconds between lease renewals
+    
+    # Parse artifact cache (LlamaParse markdown + extraction, keyed by content and parser config)
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 256MB, least recently used entries evicted first
+    CACHE_ACCESS_FLUSH_INTERVAL: float = 30.0  # Seconds between batched writes of cache hit counts and access times
+
+    # LLM response cache (opt-in per call with cache_ttl; answers built on documents are dropped when the corpus changes)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB, least recently used entries evicted first
+    LLM_CACHE_ANALYTICS_TTL: int = 900  # Seconds the canned analytics and summary answers are reused
+
+    # Token budget for retrieved context in a prompt, per provider or "provider:model"
+    LLM_CONTEXT_BUDGETS: dict = {
+        "openai:gpt-3.5-turbo": 2500,
+        "openai": 6000,
+        "claude": 12000,
+    }
+    LLM_CONTEXT_DEFAULT_BUDGET: int = 4000
+    LLM_CONTEXT_MIN_NOVELTY: float = 0.3  # Chunks with a smaller share of unseen lines are dropped as duplicates
+    LLM_CONTEXT_MIN_CHUNK_TOKENS: int = 64  # Smallest remaining budget worth filling with a truncated chunk
+
+    # Client-side rate limits per provider or "provider:model" (requests and tokens per minute)
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RATE_LIMITS: dict = {
+        "openai": {"rpm": 3500, "tpm": 200_000},
+        "claude": {"rpm": 50, "tpm": 40_000},
+    }
+    LLM_RATE_INTERACTIVE_RESERVE: float = 0.2  # Share of each limit bulk (ingestion) traffic cannot use
+    LLM_RATE_COMPLETION_TOKENS: int = 512  # Completion budget counted up front when a call sets no max_tokens
+    LLM_RATE_POLL_INTERVAL: float = 0.25  # Seconds between retries while other processes hold the capacity
+
+    # Routing between OpenAI and Claude: "single" (one provider), "failover" (alternate on error or
+    # after the deadline) or "hedged" (interactive calls also start the alternate after the primary's p95 latency)
+    LLM_ROUTING_POLICY: str = "single"
+    LLM_FAILOVER_DEADLINE_SECONDS: float = 30.0  # Primary latency after which the alternate is started
+    LLM_FAILOVER_ERROR_RATE: float = 0.5  # Recent error rate at which the alternate becomes the primary
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Latency samples needed before the p95 sets the hedge delay
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS: float = 5.0  # Hedge delay until enough samples exist
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 0.5
+    LLM_HEALTH_WINDOW: int = 100  # Recent calls per provider used for latency and error rates
 
     # LLM API Keys
     OPENAI_API_KEY: str = ""
@@ -37,4 +123,6 @@ settings = Settings()
 # Ensure directories exist
 settings.UPLOAD_DIR.mkdir(exist_ok=True)
 settings.DOCUMENTS_DIR.mkdir(exist_ok=True)
+settings.UPLOAD_TMP_DIR.mkdir(exist_ok=True)
+settings.BLOB_DIR.mkdir(exist_ok=True)
 Path(settings.CHROMA_DB_PATH).mkdir(parents=True, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Lightweight instrumentation for the ingestion pipeline
+
+Code that talks to external providers calls ``record_external_call``; the
+counts land on whichever counter is active in the current async context, so
+a job can report exactly how many LlamaParse, LLM and embedding requests it
+made without threading a counter through every call.
+
+Pipeline stages are wrapped in ``time_stage``, which records wall time,
+bytes in and out, tokens and the external calls made inside the stage on
+the job's active ``StageTimings``.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Any, Callable
+
+
+class ExternalCallCounter:
+    """Counts external API calls by name"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+
+    def record(self, name: str, count: int = 1):
+        """Add ``count`` calls under ``name``"""
+        self.calls[name] = self.calls.get(name, 0) + count
+
+    @property
+    def total(self) -> int:
+        """Total number of calls recorded"""
+        return sum(self.calls.values())
+
+    def to_dict(self) -> Dict[str, int]:
+        """Convert to dictionary for storage and API responses"""
+        return {**self.calls, "total": self.total}
+
+
+_current_counter: ContextVar[Optional[ExternalCallCounter]] = ContextVar("external_call_counter", default=None)
+
+
+@contextmanager
+def track_external_calls():
+    """Collect external calls made in this context into a fresh counter"""
+    counter = ExternalCallCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def record_external_call(name: str, count: int = 1):
+    """Record external calls on the active counter, if any"""
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.record(name, count)
+
+    timer = _current_stage.get()
+    if timer is not None:
+        timer.calls[name] = timer.calls.get(name, 0) + count
+
+
+class StageTimer:
+    """Measurements for one run of a pipeline stage"""
+
+    def __init__(self, stage: str, bytes_in: int = 0):
+        self.stage = stage
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.items = 0
+        self.tokens = 0
+        self.wait_ms = 0.0
+        self.wall_ms = 0.0
+        self.calls: Dict[str, int] = {}
+
+
+class StageTimings:
+    """Per-stage timing record for one job; repeated runs of a stage accumulate"""
+
+    def __init__(self, on_stage: Optional[Callable[[str, float], None]] = None):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.on_stage = on_stage
+
+    def add(self, timer: StageTimer):
+        """Fold a finished stage run into the record"""
+        entry = self.stages.setdefault(timer.stage, {
+            "runs": 0, "wall_ms": 0.0, "wait_ms": 0.0, "bytes_in": 0, "bytes_out": 0,
+            "items": 0, "tokens": 0, "external_calls": {}
+        })
+        entry["runs"] += 1
+        entry["wall_ms"] = round(entry["wall_ms"] + timer.wall_ms, 2)
+        entry["wait_ms"] = round(entry["wait_ms"] + timer.wait_ms, 2)
+        entry["bytes_in"] += timer.bytes_in
+        entry["bytes_out"] += timer.bytes_out
+        entry["items"] += timer.items
+        entry["tokens"] += timer.tokens
+        for name, count in timer.calls.items():
+            entry["external_calls"][name] = entry["external_calls"].get(name, 0) + count
+
+        if self.on_stage:
+            self.on_stage(timer.stage, timer.wall_ms)
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Convert to dictionary for storage and API responses"""
+        return {stage: {**entry, "external_calls": dict(entry["external_calls"])} for stage, entry in self.stages.items()}
+
+
+_current_timings: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+_current_stage: ContextVar[Optional[StageTimer]] = ContextVar("stage_timer", default=None)
+
+
+@contextmanager
+def track_stage_timings(on_stage: Optional[Callable[[str, float], None]] = None):
+    """Collect stage timings made in this context into a fresh record"""
+    timings = StageTimings(on_stage)
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+@contextmanager
+def time_stage(stage: str, bytes_in: int = 0):
+    """Time a pipeline stage; set ``bytes_out``/``items`` on the yielded timer"""
+    timer = StageTimer(stage, bytes_in)
+    token = _current_stage.set(timer)
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.wall_ms = (time.perf_counter() - started) * 1000
+        _current_stage.reset(token)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add(timer)
+
+
+def record_tokens(count: int):
+    """Add tokens to the stage running in this context, if any"""
+    timer = _current_stage.get()
+    if timer is not None:
+        timer.tokens += count
+
+
+def record_stage_wait(wait_ms: float):
+    """Add time spent waiting for a concurrency slot to the running stage"""
+    timer = _current_stage.get()
+    if timer is not None:
+        timer.wait_ms += wait_ms
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count for text, using tiktoken when it is installed"""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        # Roughly four characters per token for English text
+        return max(1, len(text) // 4) if text else 0
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latency samples, in milliseconds"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, latency_ms: float):
+        self.samples.append(latency_ms)
+        self.count += 1
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile over the window, or None when it is empty"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Sample count and p50/p95/p99 over the window"""
+        return {
+            "count": self.count,
+            "window": len(self.samples),
+            **{
+                f"p{percentile}_ms": round(value, 1) if value is not None else None
+                for percentile in (50, 95, 99)
+                for value in [self.percentile(percentile)]
+            }
+        }
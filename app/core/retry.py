@@ -0,0 +1,127 @@
+"""
+Retry policy for calls to external providers
+
+Transient provider failures (429s, 5xx responses, timeouts and dropped
+connections) are retried with jittered exponential backoff. A ``Retry-After``
+header on the error's response is honoured as a lower bound on the delay.
+Anything else is raised immediately. When the attempts run out,
+``RetryExhaustedError`` records which pipeline stage gave up.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Callable, Awaitable, TypeVar
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504, 529}
+TRANSIENT_ERROR_NAMES = ("Timeout", "RateLimit", "APIConnection", "Overloaded", "ServiceUnavailable")
+
+
+class RetryExhaustedError(Exception):
+    """Raised when a stage keeps failing with transient errors"""
+
+    def __init__(self, stage: str, attempts: int, last_error: Exception):
+        self.stage = stage
+        self.attempts = attempts
+        self.last_error = last_error
+        super().__init__(f"{stage} failed after {attempts} attempts: {last_error}")
+
+
+def _error_chain(exc: BaseException):
+    """The exception and whatever it wraps, since SDKs often re-raise provider errors"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Whether an error is worth retrying"""
+    for error in _error_chain(exc):
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+            return True
+        if _status_code(error) in TRANSIENT_STATUS_CODES:
+            return True
+        if any(name in type(error).__name__ for name in TRANSIENT_ERROR_NAMES):
+            return True
+    return False
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Delay requested by the provider via Retry-After / retry-after-ms, if any"""
+    for error in _error_chain(exc):
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if not headers:
+            continue
+
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+                except (TypeError, ValueError):
+                    pass
+    return None
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's Retry-After"""
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
+
+
+async def with_retries(operation: Callable[[], Awaitable[T]],
+                       stage: str,
+                       attempts: Optional[int] = None,
+                       base_delay: Optional[float] = None,
+                       max_delay: Optional[float] = None) -> T:
+    """
+    Await ``operation()`` until it succeeds, retrying transient errors.
+
+    Non-transient errors propagate unchanged; running out of attempts raises
+    RetryExhaustedError for ``stage``.
+    """
+    attempts = attempts or settings.INGEST_RETRY_ATTEMPTS
+    base_delay = settings.INGEST_RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = settings.INGEST_RETRY_MAX_DELAY if max_delay is None else max_delay
+
+    for attempt in range(attempts):
+        try:
+            return await operation()
+        except Exception as e:
+            if not is_transient_error(e):
+                raise
+            if attempt == attempts - 1:
+                raise RetryExhaustedError(stage, attempts, e) from e
+
+            delay = backoff_delay(attempt, base_delay, max_delay, retry_after_seconds(e))
+            logger.warning(f"Transient {stage} error (attempt {attempt + 1}/{attempts}), retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
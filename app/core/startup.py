@@ -0,0 +1,169 @@
+"""
+Startup phases, readiness and a cold-start benchmark
+
+Importing app.main only defines routes. The slow work (creating tables,
+opening ChromaDB and loading the index, starting the job service) runs as
+named startup phases in the background once uvicorn is already serving.
+``/health/live`` answers as soon as the process serves requests;
+``/health/ready`` answers 200 only after every phase has finished. The data
+routes answer 503 with Retry-After until the database and job service
+phases have completed (``app.api.dependencies.require_started``).
+
+Run the benchmark from the repository root:
+
+    python -m app.core.startup [--runs 3] [--budget 2.0]
+
+It measures how long ``import app.main`` takes and, for a fresh uvicorn
+process, the time until the first request is served and until the app
+reports ready.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StartupState:
+    """Timings and outcome of each startup phase"""
+
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.import_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.ready = False
+
+    def mark_imported(self, import_started: float):
+        """Record how long importing the application took"""
+        self.import_ms = (time.perf_counter() - import_started) * 1000
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Time a startup phase. A failing phase is logged and recorded, and the
+        app stays not ready, but later phases still run.
+        """
+        started = time.perf_counter()
+        self.phases[name] = {"status": "running", "duration_ms": None, "error": None}
+        try:
+            yield
+            self.phases[name]["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Startup phase {name} failed: {e}")
+            self.phases[name].update(status="failed", error=str(e))
+        finally:
+            self.phases[name]["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def completed(self, *names: str) -> bool:
+        """Whether all the named phases have completed"""
+        return all(self.phases.get(name, {}).get("status") == "completed" for name in names)
+
+    def mark_ready(self):
+        """Ready once every phase has completed"""
+        self.ready = all(phase["status"] == "completed" for phase in self.phases.values())
+        self.ready_ms = (time.perf_counter() - self.created_at) * 1000
+        logger.info(f"Startup finished in {self.ready_ms:.0f}ms, ready={self.ready}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Readiness report"""
+        return {
+            "ready": self.ready,
+            "import_ms": round(self.import_ms, 1) if self.import_ms is not None else None,
+            "startup_ms": round(self.ready_ms, 1) if self.ready_ms is not None else None,
+            "phases": self.phases
+        }
+
+
+# Global startup state instance
+startup_state = StartupState()
+
+
+def _measure_import(python: str) -> float:
+    """Milliseconds to import app.main in a fresh interpreter"""
+    import subprocess
+
+    code = "import time; t = time.perf_counter(); import app.main; print((time.perf_counter() - t) * 1000)"
+    output = subprocess.run([python, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _measure_server(python: str, port: int, timeout: float) -> Dict[str, Optional[float]]:
+    """Milliseconds from spawning uvicorn until /health/live and /health/ready answer 200"""
+    import subprocess
+    import urllib.error
+    import urllib.request
+
+    def status(path: str) -> Optional[int]:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return None
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [python, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    timings = {"first_request_ms": None, "ready_ms": None}
+    try:
+        while time.perf_counter() - started < timeout:
+            if timings["first_request_ms"] is None:
+                if status("/health/live") == 200:
+                    timings["first_request_ms"] = (time.perf_counter() - started) * 1000
+            elif status("/health/ready") == 200:
+                timings["ready_ms"] = (time.perf_counter() - started) * 1000
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return timings
+
+
+def run_benchmark(runs: int = 3, port: int = 8765, timeout: float = 60.0) -> Dict[str, Any]:
+    """Median import time, time to first request and time to ready over ``runs`` cold starts"""
+    import statistics
+    import sys
+
+    def median(values):
+        values = [value for value in values if value is not None]
+        return round(statistics.median(values), 1) if values else None
+
+    imports = [_measure_import(sys.executable) for _ in range(runs)]
+    servers = [_measure_server(sys.executable, port, timeout) for _ in range(runs)]
+    return {
+        "runs": runs,
+        "import_ms": median(imports),
+        "first_request_ms": median([server["first_request_ms"] for server in servers]),
+        "ready_ms": median([server["ready_ms"] for server in servers])
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    arg_parser = argparse.ArgumentParser(description="Measure API cold-start time")
+    arg_parser.add_argument("--runs", type=int, default=3, help="Cold starts to measure (median is reported)")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for readiness")
+    arg_parser.add_argument("--budget", type=float, default=None,
+                            help="Fail if the time to first request exceeds this many seconds")
+    args = arg_parser.parse_args()
+
+    results = run_benchmark(runs=args.runs, port=args.port, timeout=args.timeout)
+    print(json.dumps(results, indent=2))
+
+    if args.budget is not None:
+        first_request_ms = results["first_request_ms"]
+        if first_request_ms is None or first_request_ms > args.budget * 1000:
+            print(f"Cold start exceeded the {args.budget}s budget", file=sys.stderr)
+            sys.exit(1)
@@ -3,7 +3,7 @@ Database configuration and session management
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from app.db.models import Base
 from app.core.config import settings
 from pathlib import Path
@@ -37,16 +37,59 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+def _column_ddl(column, dialect) -> str:
+    """Column definition for ALTER TABLE ... ADD COLUMN"""
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    # SQLite cannot add a NOT NULL column without a constant default, and
+    # non-constant server defaults (CURRENT_TIMESTAMP) are not allowed either;
+    # such columns are added nullable and filled by the application
+    return ddl
+
+
+def upgrade_schema(conn):
+    """
+    Bring an existing database up to the models: add missing columns and
+    indexes to tables that ``create_all`` skipped because they already exist.
+    Idempotent; runs on every start.
+    """
+    for table in Base.metadata.sorted_tables:
+        existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table.name})"))}
+        if not existing:
+            continue  # Created fresh by create_all
+
+        for column in table.columns:
+            if column.name not in existing and not column.primary_key:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, conn.dialect)}"))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+        indexes = {row[1] for row in conn.execute(text(f"PRAGMA index_list({table.name})"))}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(conn, checkfirst=True)
+                logger.info(f"Created index {index.name}")
+
+
+def _create_and_upgrade(conn):
+    Base.metadata.create_all(conn)
+    upgrade_schema(conn)
+
+
 async def create_tables():
-    """Create all database tables"""
+    """Create all database tables and add columns and indexes missing from existing ones"""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_and_upgrade)
     logger.info("Database tables created successfully")
 
 
 def create_tables_sync():
     """Create all database tables synchronously"""
-    Base.metadata.create_all(bind=sync_engine)
+    with sync_engine.begin() as conn:
+        _create_and_upgrade(conn)
     logger.info("Database tables created successfully (sync)")
 
 
@@ -62,9 +105,3 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
-
-# Initialize database on import
-try:
-    create_tables_sync()
-except Exception as e:
-    logger.error(f"Failed to create database tables: {e}")
\ No newline at end of file
@@ -2,7 +2,7 @@
 SQLAlchemy models for job tracking and async processing
 """
 
-from sqlalchemy import Column, String, Text, DateTime, Float, Integer, Boolean, JSON
+from sqlalchemy import Column, String, Text, DateTime, Float, Integer, Boolean, JSON, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -14,23 +14,43 @@ Base = declarative_base()
 class ProcessingJob(Base):
     """Model for tracking document processing jobs"""
     __tablename__ = "processing_jobs"
+    __table_args__ = (
+        # Keyset pagination indexes for job listings: (filter column, created_at, id)
+        Index("ix_processing_jobs_created_at_id", "created_at", "id"),
+        Index("ix_processing_jobs_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_processing_jobs_document_id_created_at_id", "document_id", "created_at", "id"),
+    )
     
     id = Column(String, primary_key=True)  # UUID
     document_id = Column(String, nullable=False, index=True)
+    batch_id = Column(String, nullable=True, index=True)  # Set for jobs created from an archive upload
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_digest = Column(String, nullable=True, index=True)  # SHA-256 of file contents
+    duplicate_of = Column(String, nullable=True, index=True)  # Job in the same batch with identical content; waits for it
     
     # Job status and progress
-    status = Column(String, nullable=False, default="pending", index=True)  # pending, processing, completed, failed
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, processing, completed, failed, cancelled, dead_letter
     progress = Column(Float, default=0.0)  # 0.0 to 100.0
     current_step = Column(String, nullable=True)  # Current processing step
+    current_stage = Column(String, nullable=True, index=True)  # Pipeline stage: parse, extract, embed, index
     total_steps = Column(Integer, default=4)  # Total number of processing steps
+    failed_stage = Column(String, nullable=True)  # Stage that exhausted its retries (dead_letter jobs)
+    redrive_count = Column(Integer, default=0)  # Times the job was re-driven from the dead-letter state
+    last_completed_stage = Column(String, nullable=True)  # Resume point: parse, extract, index
+    
+    # Lease held by the worker running the job, renewed by its heartbeat
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    recovery_count = Column(Integer, default=0)  # Times the job was recovered after its worker died
+    cancel_requested_at = Column(DateTime, nullable=True)  # Cancel asked for while another process runs the job
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     started_at = Column(DateTime(timezone=True), nullable=True)
-    completed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True, index=True)
     
     # Results and errors
     result = Column(JSON, nullable=True)  # Processing results
@@ -40,18 +60,32 @@ class ProcessingJob(Base):
     llamaparse_job_id = Column(String, nullable=True)  # LlamaParse job ID
     financial_data_extracted = Column(Boolean, default=False)
     indexed_in_chroma = Column(Boolean, default=False)
+    external_calls = Column(JSON, nullable=True)  # External API calls made, by provider/purpose
+    stage_timings = Column(JSON, nullable=True)  # Per stage: wall/wait ms, bytes, items, tokens, external calls
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for API responses"""
         return {
             "id": self.id,
             "document_id": self.document_id,
+            "batch_id": self.batch_id,
             "filename": self.filename,
             "file_size": self.file_size,
+            "content_digest": self.content_digest,
+            "duplicate_of": self.duplicate_of,
             "status": self.status,
             "progress": self.progress,
             "current_step": self.current_step,
+            "current_stage": self.current_stage,
             "total_steps": self.total_steps,
+            "failed_stage": self.failed_stage,
+            "redrive_count": self.redrive_count,
+            "last_completed_stage": self.last_completed_stage,
+            "lease_owner": self.lease_owner,
+            "lease_expires_at": self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            "heartbeat_at": self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            "recovery_count": self.recovery_count,
+            "cancel_requested_at": self.cancel_requested_at.isoformat() if self.cancel_requested_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
@@ -59,6 +93,8 @@ class ProcessingJob(Base):
             "llamaparse_job_id": self.llamaparse_job_id,
             "financial_data_extracted": self.financial_data_extracted,
             "indexed_in_chroma": self.indexed_in_chroma,
+            "external_calls": self.external_calls,
+            "stage_timings": self.stage_timings,
             "result": self.result
         }
 
@@ -125,4 +161,167 @@ class DocumentMetadata(Base):
             "manually_verified": self.manually_verified,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+class DocumentBlob(Base):
+    """Content-addressed file storage with reference counting"""
+    __tablename__ = "document_blobs"
+    
+    digest = Column(String, primary_key=True)  # SHA-256 hex digest
+    blob_path = Column(String, nullable=False)
+    file_size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    
+    # Document whose parse, extraction and vector artifacts can be reused
+    source_document_id = Column(String, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for API responses"""
+        return {
+            "digest": self.digest,
+            "blob_path": self.blob_path,
+            "file_size": self.file_size,
+            "ref_count": self.ref_count,
+            "source_document_id": self.source_document_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class DocumentRecord(Base):
+    """Catalog of uploaded documents, the source of truth for listings and lookups"""
+    __tablename__ = "documents"
+    __table_args__ = (
+        # Keyset pagination indexes: (sort column, id)
+        Index("ix_documents_uploaded_at_id", "uploaded_at", "id"),
+        Index("ix_documents_filename_id", "filename", "id"),
+        Index("ix_documents_file_size_id", "file_size", "id"),
+    )
+    
+    id = Column(String, primary_key=True)  # UUID, same as document_id elsewhere
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    file_size = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=True, index=True)
+    content_digest = Column(String, nullable=True, index=True)  # SHA-256 of file contents
+    uploaded_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    # Index state: pending, indexed, failed, cancelled
+    index_state = Column(String, nullable=False, default="pending", index=True)
+    indexed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for API responses"""
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "file_path": self.file_path,
+            "file_size": self.file_size,
+            "content_type": self.content_type,
+            "content_digest": self.content_digest,
+            "uploaded_at": self.uploaded_at.isoformat() if self.uploaded_at else None,
+            "index_state": self.index_state,
+            "indexed": self.index_state == "indexed",
+            "indexed_at": self.indexed_at.isoformat() if self.indexed_at else None
+        }
+
+
+class ParseArtifact(Base):
+    """Cached LlamaParse output and LLM extraction for a file's content"""
+    __tablename__ = "parse_artifacts"
+    
+    cache_key = Column(String, primary_key=True)  # SHA-256 of content digest + parser fingerprint
+    content_digest = Column(String, nullable=False, index=True)
+    fingerprint = Column(String, nullable=False)  # Parsing instruction, prompt and model
+    
+    # Artifacts
+    parsed_content = Column(Text, nullable=False)  # Markdown from LlamaParse
+    extraction = Column(JSON, nullable=True)  # Raw extraction JSON
+    extracted_data = Column(JSON, nullable=True)  # Structured financial data
+    
+    # Eviction bookkeeping
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class LLMResponseCacheEntry(Base):
+    """Cached LLM completion for a provider, model, sampling settings and prompt"""
+    __tablename__ = "llm_response_cache"
+    
+    cache_key = Column(String, primary_key=True)  # SHA-256 of provider, model, settings and normalized messages
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    
+    # Response
+    content = Column(Text, nullable=False)
+    usage = Column(JSON, nullable=True)
+    response_metadata = Column(JSON, nullable=True)
+    
+    # Answers built from retrieved documents are dropped when the corpus changes
+    corpus_scoped = Column(Boolean, nullable=False, default=False, index=True)
+    
+    # Expiry and eviction bookkeeping
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)  # Naive UTC
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class EmbeddingCacheEntry(Base):
+    """Cached embedding vector for a text under one embedding model and dimension"""
+    __tablename__ = "embedding_cache"
+    
+    model_key = Column(String, primary_key=True)  # Embedding model and output dimension
+    text_hash = Column(String, primary_key=True)  # SHA-256 of the embedded text
+    dimension = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 array
+    
+    # Eviction bookkeeping
+    size_bytes = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class LLMRateGrant(Base):
+    """One LLM request granted by the rate governor, shared by the API and worker processes"""
+    __tablename__ = "llm_rate_ledger"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket = Column(String, nullable=False)  # provider:model
+    granted_at = Column(Float, nullable=False)  # Unix time
+    tokens = Column(Integer, nullable=False, default=0)  # Estimated, then settled to actual usage
+    priority = Column(Integer, nullable=False, default=0)  # 0 interactive, 1 bulk
+    
+    __table_args__ = (
+        Index("ix_llm_rate_ledger_bucket_granted_at", "bucket", "granted_at"),
+    )
+
+
+class JobStageMetric(Base):
+    """Incrementally updated histogram of pipeline stage durations"""
+    __tablename__ = "job_stage_metrics"
+    
+    stage = Column(String, primary_key=True)  # parse, extract, chunk, embed, index
+    period_start = Column(DateTime, primary_key=True, index=True)  # Start of the aggregation period (UTC)
+    bucket_ms = Column(Integer, primary_key=True)  # Upper bound of the duration bucket
+    count = Column(Integer, nullable=False, default=0)
+    total_ms = Column(Float, nullable=False, default=0.0)  # Sum of durations in this bucket
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for API responses"""
+        return {
+            "stage": self.stage,
+            "period_start": self.period_start.isoformat() if self.period_start else None,
+            "bucket_ms": self.bucket_ms,
+            "count": self.count,
+            "total_ms": self.total_ms
+        }
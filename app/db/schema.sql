@@ -82,12 +82,22 @@ CREATE TABLE documents (
     id TEXT PRIMARY KEY,
     filename TEXT NOT NULL,
     file_path TEXT NOT NULL,
-    content_type TEXT NOT NULL,
     file_size INTEGER NOT NULL,
-    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    indexed BOOLEAN DEFAULT FALSE
+    content_type TEXT,
+    content_digest TEXT, -- SHA-256 of file contents
+    uploaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    index_state TEXT NOT NULL DEFAULT 'pending' CHECK (index_state IN ('pending', 'indexed', 'failed', 'cancelled')),
+    indexed_at TIMESTAMP
 );
 
+-- Create indexes for documents (sort column + id for keyset pagination)
+CREATE INDEX ix_documents_uploaded_at_id ON documents(uploaded_at, id);
+CREATE INDEX ix_documents_filename_id ON documents(filename, id);
+CREATE INDEX ix_documents_file_size_id ON documents(file_size, id);
+CREATE INDEX ix_documents_content_type ON documents(content_type);
+CREATE INDEX ix_documents_content_digest ON documents(content_digest);
+CREATE INDEX ix_documents_index_state ON documents(index_state);
+
 -- Financial documents table (links to documents table)
 CREATE TABLE financial_documents (
     id TEXT PRIMARY KEY,
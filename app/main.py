@@ -1,19 +1,63 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
-from app.api.documents import router as documents_router
+from app.api.documents import router as documents_router, upload_size_limit
 from app.api.files import router as files_router
 from app.api.financial import router as financial_router
 from app.api.jobs import router as jobs_router
 from app.api.chat import router as chat_router
+from app.api.dependencies import require_started
+from app.core.startup import startup_state
+from app.db.database import create_tables
+from app.services.container import service_container
+from app.services.document_catalog import document_catalog
 from app.services.job_service import job_service
 
+
+async def run_startup():
+    """Startup phases; the API serves liveness checks while they run"""
+    with startup_state.phase("database"):
+        await create_tables()
+        # Documents uploaded before the catalog existed
+        await document_catalog.backfill()
+    with startup_state.phase("services"):
+        await service_container.start()
+    with startup_state.phase("jobs"):
+        # INGEST_MODE=api runs the API only; jobs are then processed by `python -m app.worker`
+        await job_service.initialize()
+    startup_state.mark_ready()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the startup phases in the background and release the shared services on shutdown"""
+    app.state.services = service_container
+    startup = asyncio.create_task(run_startup(), name="startup")
+    
+    yield
+    
+    if not startup.done():
+        startup.cancel()
+        await asyncio.gather(startup, return_exceptions=True)
+    try:
+        await job_service.shutdown()
+    except Exception as e:
+        print(f"Error during shutdown: {e}")
+    await service_container.stop()
+
+
 app = FastAPI(
     title="Penny - Financial Document Analysis",
     description="Intelligent expense tracking with OCR and AI-powered document analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Mount static files
@@ -22,11 +66,23 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="app/templates")
 
-# Include routers
-app.include_router(documents_router, prefix="/api/v1")
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse upload bodies declared larger than the route accepts before they are received"""
+    limit = upload_size_limit(request.url.path)
+    length = request.headers.get("content-length")
+    if limit is not None and length and length.isdigit() and int(length) > limit:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body too large. Maximum size: {limit} bytes"}
+        )
+    return await call_next(request)
+
+# Include routers; data routes wait for the database and job service startup phases
+app.include_router(documents_router, prefix="/api/v1", dependencies=[Depends(require_started)])
 app.include_router(files_router)
-app.include_router(financial_router, prefix="/api/v1")
-app.include_router(jobs_router, prefix="/api/v1")
+app.include_router(financial_router, prefix="/api/v1", dependencies=[Depends(require_started)])
+app.include_router(jobs_router, prefix="/api/v1", dependencies=[Depends(require_started)])
 app.include_router(chat_router)
 
 @app.get("/")
@@ -45,20 +101,17 @@ async def chat_interface(request: Request):
 async def say_hello(name: str):
     return {"message": f"Hello {name}"}
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "alive"}
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on application startup"""
-    try:
-        await job_service.initialize()
-    except Exception as e:
-        print(f"Failed to initialize job service: {e}")
+@app.get("/health/ready")
+async def readiness():
+    """Every startup phase has finished; 503 until then"""
+    report = startup_state.to_dict()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on application shutdown"""
-    try:
-        await job_service.shutdown()
-    except Exception as e:
-        print(f"Error during shutdown: {e}")
+startup_state.mark_imported(_import_started)
+
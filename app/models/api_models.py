@@ -229,6 +229,14 @@ class BulkOperationResponse(BaseModel):
     execution_time: float = Field(..., description="Operation execution time in seconds")
 
 
+class DeadLetterRedriveRequest(BaseModel):
+    """Request model for re-driving dead-lettered processing jobs"""
+    job_ids: Optional[List[str]] = Field(None, description="Specific jobs to re-drive; all dead-lettered jobs if omitted")
+    batch_id: Optional[str] = Field(None, description="Only jobs from this archive batch")
+    stage: Optional[str] = Field(None, description="Only jobs that failed at this stage (parse, extract, embed, index)")
+    limit: int = Field(default=500, ge=1, le=5000, description="Maximum number of jobs to re-drive")
+
+
 # Dashboard and Analytics Models
 class DashboardSummary(BaseModel):
     """Dashboard summary data"""
@@ -345,6 +353,7 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = Field(None, description="Chat session ID for context")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
     llm_provider: Optional[str] = Field(None, description="LLM provider to use (openai or claude)")
+    stream: bool = Field(True, description="Stream the answer as ai_response_delta frames before the final ai_response")
     
     
 class ChatResponse(BaseModel):
@@ -356,10 +365,28 @@ class ChatResponse(BaseModel):
     llm_provider: Optional[str] = Field(None, description="LLM provider used")
     model_used: Optional[str] = Field(None, description="Model used for generation")
     usage: Optional[Dict[str, Any]] = Field(None, description="Token usage information")
+    context_tokens: Optional[int] = Field(None, description="Prompt tokens used by retrieved document context")
+    ttft_ms: Optional[float] = Field(None, description="Milliseconds from receiving the question to sending the first answer token")
     timestamp: str = Field(default_factory=lambda: datetime.now().isoformat(), description="Response timestamp")
     session_id: Optional[str] = Field(None, description="Chat session ID")
 
 
+class ChatSources(BaseModel):
+    """First frame of a streamed answer: the retrieved sources"""
+    type: str = Field(default="ai_response_sources", description="Response type")
+    sources: List[Dict[str, Any]] = Field(default_factory=list, description="Source documents")
+    financial_summary: Optional[Dict[str, Any]] = Field(None, description="Financial data summary")
+    timestamp: str = Field(default_factory=lambda: datetime.now().isoformat(), description="Response timestamp")
+    session_id: Optional[str] = Field(None, description="Chat session ID")
+
+
+class ChatDelta(BaseModel):
+    """Incremental text of a streamed answer"""
+    type: str = Field(default="ai_response_delta", description="Response type")
+    content: str = Field(..., description="Answer text to append")
+    session_id: Optional[str] = Field(None, description="Chat session ID")
+
+
 class ChatError(BaseModel):
     """WebSocket chat error model"""
     type: str = Field(default="error", description="Message type")
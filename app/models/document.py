@@ -15,6 +15,7 @@ class DocumentResponse(BaseModel):
     file_size: int
     uploaded_at: datetime
     indexed: bool = False
+    content_digest: Optional[str] = None  # SHA-256 of file contents
     
     # Enhanced financial metadata
     is_financial_document: bool = False
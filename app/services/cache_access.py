@@ -0,0 +1,76 @@
+"""
+Batched access bookkeeping for the SQLite-backed caches
+
+A cache hit has to refresh the entry's ``last_accessed_at`` (for LRU
+eviction) and bump its ``hit_count``. Doing that with an UPDATE and a commit
+on every hit turns each read into a write competing with the job progress
+writer for the database lock. ``CacheAccessLog`` keeps the hits in memory
+instead and writes them in one transaction at most every
+``CACHE_ACCESS_FLUSH_INTERVAL`` seconds, and before the cache evicts, so
+eviction still sees current access times.
+"""
+
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+import logging
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class CacheAccessLog:
+    """Pending access times and hit counts for one cache table"""
+
+    def __init__(self, model, flush_interval: Optional[float] = None):
+        self.model = model
+        self.flush_interval = settings.CACHE_ACCESS_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._pending: Dict[str, List[Any]] = {}
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+
+    def record(self, key: str):
+        """Note a hit on ``key`` for the next flush"""
+        entry = self._pending.setdefault(key, [None, 0])
+        entry[0] = datetime.utcnow()
+        entry[1] += 1
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def due(self) -> bool:
+        return bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    async def flush(self) -> int:
+        """Write pending hits in one transaction; returns the number of entries updated"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+
+        async with AsyncSessionLocal() as session:
+            try:
+                for key, (accessed_at, hits) in batch.items():
+                    await session.execute(
+                        update(self.model)
+                        .where(self.model.cache_key == key)
+                        .values(last_accessed_at=accessed_at, hit_count=self.model.hit_count + hits)
+                    )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                # Keep the hits for the next flush, under anything recorded since
+                for key, (accessed_at, hits) in batch.items():
+                    entry = self._pending.setdefault(key, [accessed_at, 0])
+                    entry[1] += hits
+                logger.error(f"Failed to record cache accesses for {self.model.__tablename__}: {e}")
+                return 0
+
+        self.flushes += 1
+        return len(batch)
@@ -0,0 +1,71 @@
+"""
+Application-scoped service container
+
+The DocumentService owns the expensive state: the ChromaDB client, the
+vector index and query engine, and the LlamaParse parser. It is built once
+when the API (FastAPI lifespan) or a worker process starts. Every router and
+ingestion job then shares it, so the index is loaded once and stays warm.
+Routes receive it through ``Depends(get_document_service)`` from
+app/api/dependencies.py.
+"""
+
+import asyncio
+from typing import Optional, TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    from app.services.document_service import DocumentService
+    from app.services.financial_parser import FinancialDocumentParser
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Holds the services shared by the whole process"""
+
+    def __init__(self):
+        self.document_service: Optional["DocumentService"] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self.document_service is not None
+
+    @property
+    def financial_parser(self) -> Optional["FinancialDocumentParser"]:
+        return self.document_service.financial_parser if self.document_service else None
+
+    async def start(self, run_migrations: bool = True):
+        """
+        Build the shared services; safe to call more than once. With
+        ``run_migrations`` this process also re-embeds the collection in the
+        background if the embedding model changed (worker processes leave
+        that to the API process).
+        """
+        async with self._lock:
+            if self.started:
+                return
+            from app.services.document_service import DocumentService
+
+            # Opening Chroma and loading the index are blocking calls
+            self.document_service = await asyncio.to_thread(DocumentService)
+            if run_migrations:
+                self.document_service.start_embedding_migration()
+            logger.info("Service container started")
+
+    async def get_document_service(self) -> "DocumentService":
+        """The shared DocumentService, starting the container if needed"""
+        if not self.started:
+            await self.start()
+        return self.document_service
+
+    async def stop(self):
+        """Release the shared services"""
+        if self.document_service and self.document_service.embedding_migration:
+            await self.document_service.embedding_migration.stop()
+        self.document_service = None
+        logger.info("Service container stopped")
+
+
+# Global service container instance
+service_container = ServiceContainer()
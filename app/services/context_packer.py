@@ -0,0 +1,189 @@
+"""
+Token-budgeted assembly of retrieved chunks into an LLM prompt
+
+Retrieval returns up to ``similarity_top_k`` chunks, and neighbouring chunks
+of one document share ``CHUNK_OVERLAP`` characters, so the lines at a chunk
+boundary often arrive twice. ``pack_context`` orders chunks by retrieval
+score and, for chunks of a document already included, drops the lines that
+overlap an included chunk of that same document: the leading lines that
+repeat its tail, or the trailing lines that repeat its head. Lines repeated
+within a chunk or across documents are real data (two identical line items,
+the same purchase on two receipts) and are kept. Chunks that add almost
+nothing new are skipped, and separator and blank lines are stripped. The
+model's token budget is then filled best chunk first, truncating the last
+chunk that fits only partly at a line boundary.
+"""
+
+import re
+from typing import Optional, Dict, Any, List, Tuple, Union
+import logging
+
+from app.core.config import settings
+from app.core.instrumentation import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Lines made only of separators, bullets or box drawing carry no information
+_FILLER_LINE = re.compile(r"^[\W_]*$")
+
+# Overlaps shorter than this many characters are too generic ("Total", "1") to drop
+_MIN_OVERLAP_CHARS = 12
+
+
+class ContextChunk:
+    """One retrieved chunk, its similarity score and where it sits in its document"""
+
+    def __init__(self, text: str, score: Optional[float] = None,
+                 document_id: Optional[str] = None, position: Optional[int] = None):
+        self.text = text
+        self.score = score
+        self.document_id = document_id
+        self.position = position  # Start offset in the document, when known
+
+
+class PackedContext:
+    """Chunks chosen for the prompt and what packing did to get there"""
+
+    def __init__(self, chunks: List[str], budget: int):
+        self.chunks = chunks
+        self.budget = budget
+        self.tokens = 0
+        self.candidates = 0
+        self.duplicates = 0
+        self.truncated = 0
+        self.dropped = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "chunks_used": len(self.chunks),
+            "chunks_retrieved": self.candidates,
+            "duplicates_removed": self.duplicates,
+            "truncated": self.truncated,
+            "dropped_for_budget": self.dropped
+        }
+
+
+def context_budget(provider: str, model: str) -> int:
+    """Context token budget for a model, from LLM_CONTEXT_BUDGETS ("provider:model" or provider)"""
+    budgets = settings.LLM_CONTEXT_BUDGETS
+    return budgets.get(f"{provider}:{model}") or budgets.get(provider) or settings.LLM_CONTEXT_DEFAULT_BUDGET
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split()).lower()
+
+
+def _as_chunk(document: Union[str, ContextChunk]) -> ContextChunk:
+    return document if isinstance(document, ContextChunk) else ContextChunk(document)
+
+
+def _overlap(earlier: List[str], later: List[str]) -> Tuple[int, int]:
+    """
+    Lines of ``earlier`` and of ``later`` that can go because the other chunk
+    repeats them, where the leading lines of ``later`` repeat the tail of
+    ``earlier``. The split can fall inside a line, so the first overlapping
+    line of ``later`` may be only the end of a line of ``earlier``, and the
+    last overlapping line of ``earlier`` only the start of one in ``later``;
+    a partial line is never counted against the complete one.
+    """
+    for count in range(min(len(earlier), len(later)), 0, -1):
+        tail = earlier[-count:]
+        head = later[:count]
+        first_partial = last_partial = False
+        for index, (before, after) in enumerate(zip(tail, head)):
+            if before == after:
+                continue
+            if index == 0 and before.endswith(after):
+                first_partial = True
+                continue
+            if index == count - 1 and after.startswith(before):
+                last_partial = True
+                continue
+            break
+        else:
+            if sum(len(line) for line in head) >= _MIN_OVERLAP_CHARS:
+                return count - first_partial, count - last_partial
+    return 0, 0
+
+
+def _drop_overlap(lines: List[str], chunk: ContextChunk,
+                  included: List[Tuple[Optional[int], List[str]]]) -> List[str]:
+    """Remove the lines ``chunk`` shares with included neighbours from its own document"""
+    for position, other in included:
+        keys = [_normalize(line) for line in lines]
+        if not keys:
+            break
+        other_keys = [_normalize(line) for line in other]
+        if chunk.position is None or position is None or position < chunk.position:
+            # Follows the included chunk: drop its leading lines
+            leading = _overlap(other_keys, keys)[1]
+            if leading:
+                lines = lines[leading:]
+                continue
+        if chunk.position is None or position is None or position > chunk.position:
+            # Precedes the included chunk: drop its trailing lines
+            trailing = _overlap(keys, other_keys)[0]
+            if trailing:
+                lines = lines[:len(lines) - trailing]
+    return lines
+
+
+def pack_context(documents: List[Union[str, ContextChunk]], budget: int) -> PackedContext:
+    """
+    Choose and trim chunks to fit ``budget`` tokens. Scored chunks are taken
+    highest score first; unscored ones keep their given order after them.
+    """
+    chunks = [_as_chunk(document) for document in documents if document]
+    order = sorted(
+        range(len(chunks)),
+        key=lambda index: (chunks[index].score is None, -(chunks[index].score or 0.0), index)
+    )
+
+    packed = PackedContext([], budget)
+    packed.candidates = len(chunks)
+    # Lines already packed per document, with the chunk's position
+    included: Dict[str, List[Tuple[Optional[int], List[str]]]] = {}
+
+    for index in order:
+        chunk = chunks[index]
+        lines = [line.strip() for line in chunk.text.splitlines()]
+        lines = [line for line in lines if line and not _FILLER_LINE.match(line)]
+        total = len(lines)
+
+        new_lines = lines
+        if chunk.document_id is not None:
+            new_lines = _drop_overlap(lines, chunk, included.get(chunk.document_id, []))
+
+        # A chunk that is mostly lines already included is an overlap duplicate
+        if not new_lines or (total and len(new_lines) / total < settings.LLM_CONTEXT_MIN_NOVELTY):
+            packed.duplicates += 1
+            continue
+
+        remaining = budget - packed.tokens
+        text = "\n".join(new_lines)
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            if remaining < settings.LLM_CONTEXT_MIN_CHUNK_TOKENS:
+                packed.dropped += 1
+                continue
+            new_lines = _truncate(new_lines, remaining)
+            if not new_lines:
+                packed.dropped += 1
+                continue
+            text = "\n".join(new_lines)
+            tokens = estimate_tokens(text)
+            packed.truncated += 1
+
+        packed.chunks.append(text)
+        packed.tokens += tokens
+        if chunk.document_id is not None:
+            included.setdefault(chunk.document_id, []).append((chunk.position, new_lines))
+
+    if packed.duplicates or packed.dropped or packed.truncated:
+        logger.debug(
+            f"Packed {len(packed.chunks)}/{packed.candidates} chunks into {packed.tokens}/{budget} tokens "
+            f"({packed.duplicates} duplicates, {packed.truncated} truncated, {packed.dropped} dropped)"
+        )
+    return packed
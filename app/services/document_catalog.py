@@ -0,0 +1,333 @@
+"""
+Document catalog backed by the ``documents`` table
+
+Every upload is recorded here with its path, size, digest, content type and
+index state, so listings and lookups are indexed SQL queries instead of
+directory scans. On startup ``backfill`` fills an empty catalog from the
+documents uploaded before it existed. ``reconcile`` repairs drift between
+the catalog and DOCUMENTS_DIR and can be run from the command line:
+
+    python -m app.services.document_catalog [--dry-run]
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import mimetypes
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from sqlalchemy import select, update, delete, func, tuple_
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import DocumentRecord, ProcessingJob
+from app.models.document import DocumentResponse
+
+logger = logging.getLogger(__name__)
+
+INDEX_STATES = ("pending", "indexed", "failed", "cancelled")
+
+SORT_COLUMNS = {
+    "uploaded_at": DocumentRecord.uploaded_at,
+    "filename": DocumentRecord.filename,
+    "file_size": DocumentRecord.file_size,
+}
+
+
+def encode_cursor(sort_value: Any, document_id: str) -> str:
+    """Encode the last row's sort key as an opaque cursor"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, document_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        sort_value, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if sort == "uploaded_at" and sort_value is not None:
+        sort_value = datetime.fromisoformat(sort_value)
+    return sort_value, document_id
+
+
+class DocumentCatalog:
+    """Indexed catalog of uploaded documents"""
+
+    async def add_many(self, documents: List[DocumentResponse]):
+        """Record uploaded documents in a single transaction"""
+        async with AsyncSessionLocal() as session:
+            try:
+                session.add_all([
+                    DocumentRecord(
+                        id=document.id,
+                        filename=document.filename,
+                        file_path=document.file_path,
+                        file_size=document.file_size,
+                        content_type=document.content_type,
+                        content_digest=document.content_digest,
+                        uploaded_at=document.uploaded_at,
+                        index_state="indexed" if document.indexed else "pending"
+                    )
+                    for document in documents
+                ])
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to add documents to catalog: {e}")
+                raise
+
+    async def add(self, document: DocumentResponse):
+        """Record a single uploaded document"""
+        await self.add_many([document])
+
+    async def get(self, document_id: str) -> Optional[DocumentRecord]:
+        """Look up a document by ID"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(DocumentRecord).where(DocumentRecord.id == document_id)
+            )
+            return result.scalars().first()
+
+    async def remove(self, document_id: str):
+        """Remove a document from the catalog"""
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    delete(DocumentRecord).where(DocumentRecord.id == document_id)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to remove document {document_id} from catalog: {e}")
+                raise
+
+    async def set_index_state(self, document_id: str, index_state: str):
+        """Update the index state of a document"""
+        await self.set_index_state_many([document_id], index_state)
+
+    async def set_index_state_many(self, document_ids: List[str], index_state: str):
+        """Update the index state of several documents in one statement"""
+        if index_state not in INDEX_STATES:
+            raise ValueError(f"Invalid index state: {index_state}")
+        if not document_ids:
+            return
+
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    update(DocumentRecord)
+                    .where(DocumentRecord.id.in_(document_ids))
+                    .values(
+                        index_state=index_state,
+                        indexed_at=datetime.utcnow() if index_state == "indexed" else None
+                    )
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to update index state for {document_ids}: {e}")
+
+    async def list_documents(self,
+                             limit: int = 50,
+                             cursor: Optional[str] = None,
+                             sort: str = "uploaded_at",
+                             order: str = "desc",
+                             filename: Optional[str] = None,
+                             content_type: Optional[str] = None,
+                             index_state: Optional[str] = None,
+                             uploaded_after: Optional[datetime] = None,
+                             uploaded_before: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        List documents one page at a time using keyset pagination on
+        ``(sort column, id)``. Pass the returned ``next_cursor`` to get the
+        following page.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Invalid sort field. Must be one of: {list(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("Invalid order. Must be 'asc' or 'desc'")
+
+        column = SORT_COLUMNS[sort]
+        query = select(DocumentRecord)
+
+        if filename:
+            query = query.where(DocumentRecord.filename.ilike(f"%{filename}%"))
+        if content_type:
+            query = query.where(DocumentRecord.content_type == content_type)
+        if index_state:
+            query = query.where(DocumentRecord.index_state == index_state)
+        if uploaded_after:
+            query = query.where(DocumentRecord.uploaded_at >= uploaded_after)
+        if uploaded_before:
+            query = query.where(DocumentRecord.uploaded_at < uploaded_before)
+
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor, sort)
+            key = tuple_(column, DocumentRecord.id)
+            query = query.where(key < (sort_value, last_id) if order == "desc" else key > (sort_value, last_id))
+
+        if order == "desc":
+            query = query.order_by(column.desc(), DocumentRecord.id.desc())
+        else:
+            query = query.order_by(column.asc(), DocumentRecord.id.asc())
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(query.limit(limit + 1))
+            records = result.scalars().all()
+
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            last = records[-1]
+            next_cursor = encode_cursor(getattr(last, sort), last.id)
+
+        return {
+            "documents": [record.to_dict() for record in records],
+            "count": len(records),
+            "next_cursor": next_cursor
+        }
+
+    async def backfill(self) -> Optional[Dict[str, Any]]:
+        """
+        Catalog the files in DOCUMENTS_DIR when the catalog is empty, so
+        documents uploaded before it existed are listed without a manual
+        reconcile. Returns the reconcile report, or None if nothing was done.
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(func.count()).select_from(DocumentRecord))
+            if result.scalar():
+                return None
+
+        if not settings.DOCUMENTS_DIR.exists() or not any(
+            path.is_file() for path in settings.DOCUMENTS_DIR.iterdir()
+        ):
+            return None
+
+        logger.info("Document catalog is empty; backfilling it from the documents directory")
+        return await self.reconcile()
+
+    async def reconcile(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Repair drift between DOCUMENTS_DIR and the catalog.
+
+        Files on disk without a catalog row are added, rows whose file is gone
+        are removed and rows whose size changed are updated.
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(DocumentRecord.id, DocumentRecord.file_path, DocumentRecord.file_size)
+            )
+            catalog = {row.file_path: row for row in result.all()}
+
+        on_disk = {}
+        for file_path in settings.DOCUMENTS_DIR.iterdir():
+            if file_path.is_file() and "_" in file_path.name:
+                on_disk[str(file_path)] = file_path
+
+        missing_rows = [row for path, row in catalog.items() if path not in on_disk]
+        untracked = [path for key, path in on_disk.items() if key not in catalog]
+        resized = []
+        for key, row in catalog.items():
+            if key in on_disk:
+                size = on_disk[key].stat().st_size
+                if size != row.file_size:
+                    resized.append((row.id, size))
+
+        report = {
+            "added": [path.name for path in untracked],
+            "removed": [row.id for row in missing_rows],
+            "resized": [document_id for document_id, _ in resized],
+            "dry_run": dry_run
+        }
+
+        if dry_run or not (untracked or missing_rows or resized):
+            return report
+
+        added_records = [await asyncio.to_thread(self._record_from_file, path) for path in untracked]
+
+        async with AsyncSessionLocal() as session:
+            try:
+                # Recover index state from completed processing jobs
+                if added_records:
+                    result = await session.execute(
+                        select(ProcessingJob.document_id)
+                        .where(ProcessingJob.document_id.in_([record.id for record in added_records]))
+                        .where(ProcessingJob.status == "completed")
+                    )
+                    indexed_ids = set(result.scalars().all())
+                    for record in added_records:
+                        if record.id in indexed_ids:
+                            record.index_state = "indexed"
+                    session.add_all(added_records)
+
+                if missing_rows:
+                    await session.execute(
+                        delete(DocumentRecord).where(DocumentRecord.id.in_([row.id for row in missing_rows]))
+                    )
+
+                for document_id, size in resized:
+                    await session.execute(
+                        update(DocumentRecord)
+                        .where(DocumentRecord.id == document_id)
+                        .values(file_size=size)
+                    )
+
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Catalog reconciliation failed: {e}")
+                raise
+
+        logger.info(
+            f"Catalog reconciled: {len(untracked)} added, {len(missing_rows)} removed, {len(resized)} resized"
+        )
+        return report
+
+    def _record_from_file(self, file_path: Path) -> DocumentRecord:
+        """Build a catalog row for a file found on disk"""
+        document_id, filename = file_path.name.split("_", 1)
+        stat = file_path.stat()
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as source:
+            for chunk in iter(lambda: source.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+        return DocumentRecord(
+            id=document_id,
+            filename=filename,
+            file_path=str(file_path),
+            file_size=stat.st_size,
+            content_type=mimetypes.guess_type(filename)[0],
+            content_digest=digest.hexdigest(),
+            uploaded_at=datetime.fromtimestamp(stat.st_ctime),
+            index_state="pending"
+        )
+
+
+# Global document catalog instance
+document_catalog = DocumentCatalog()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Reconcile the document catalog with DOCUMENTS_DIR")
+    arg_parser.add_argument("--dry-run", action="store_true", help="Report drift without changing anything")
+    args = arg_parser.parse_args()
+
+    async def main():
+        from app.db.database import create_tables
+
+        await create_tables()
+        return await document_catalog.reconcile(dry_run=args.dry_run)
+
+    print(json.dumps(asyncio.run(main()), indent=2))
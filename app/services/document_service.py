@@ -1,29 +1,76 @@
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, Settings
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core.node_parser import SentenceSplitter
-from llama_index.llms.openai import OpenAI
-import chromadb
+"""
+Document indexing, search and financial queries over ChromaDB
+
+llama_index and chromadb are imported inside the methods that use them, so
+importing this module (every router does) stays cheap and the cost is paid
+when the service is constructed during startup.
+"""
+
+from contextlib import aclosing
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 import json
 import logging
+import uuid
 from datetime import datetime
 
 from app.core.config import settings as app_settings
+from app.core.instrumentation import record_external_call, record_tokens, estimate_tokens, time_stage
+from app.core.retry import with_retries
 from app.models.document import DocumentResponse, SearchResult
 from app.services.financial_parser import FinancialDocumentParser
-from app.services.llm_service import llm_service, LLMProvider
+from app.services.llm_service import llm_service, LLMProvider, LLMResponse
+from app.services.llm_cache import llm_response_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.context_packer import ContextChunk
+from app.services.rate_governor import rate_governor, estimate_request_tokens
+from app.services.storage_service import blob_store
+from app.services.document_catalog import document_catalog
+from app.services.ingestion_executor import ingestion_executor
+from app.services.embedding_migration import (
+    EmbeddingMigration, configured_embedding, stored_embedding, same_embedding, create_embed_model,
+    drop_retired_collections
+)
 
 logger = logging.getLogger(__name__)
 
+# Node metadata that identifies an upload rather than describing its content
+PER_UPLOAD_METADATA = ("document_id", "filename", "file_size", "uploaded_at")
+
+# Enhanced system prompt for financial context
+FINANCIAL_CONTEXT = """
+            You are a financial analysis assistant for a home renovation expense tracking system.
+            You have access to invoices, receipts, and bills for home renovation projects.
+            
+            When analyzing financial data, please:
+            1. Look for specific dollar amounts and totals
+            2. Consider date ranges when asked about time periods
+            3. Group expenses by categories (materials, labor, permits, etc.)
+            4. Consider project associations when asked about specific renovations
+            5. Provide specific details and calculations when possible
+            6. If no relevant information is found, clearly state this
+            
+            Format your response to be helpful and specific, including:
+            - Direct answers to the user's question
+            - Relevant financial details from the documents
+            - Calculations or summaries when appropriate
+            """
+
+NO_DOCUMENTS_QUERY = (
+    "No relevant financial documents were found for the query: '{query}'. "
+    "Please explain this to the user and suggest they might need to upload relevant documents."
+)
+
 class DocumentService:
     def __init__(self):
         self.chroma_client = None
         self.collection = None
         self.index = None
         self.query_engine = None
+        self.retriever = None
         self.financial_parser = None
+        self.embedding = None
+        self.embedding_migration = None
         self.llm_service = llm_service
         self._initialize_llm()
         self._initialize_chroma()
@@ -33,6 +80,9 @@ class DocumentService:
         """Initialize the LLM with OpenAI and LLM service"""
         # Initialize traditional LlamaIndex LLM (still needed for query engine)
         if app_settings.OPENAI_API_KEY:
+            from llama_index.core import Settings
+            from llama_index.llms.openai import OpenAI
+            
             llm = OpenAI(
                 api_key=app_settings.OPENAI_API_KEY,
                 model=app_settings.OPENAI_MODEL,
@@ -44,85 +94,150 @@ class DocumentService:
         # This will be done in the first query call
     
     def _initialize_chroma(self):
-        """Initialize ChromaDB client and collection"""
+        """
+        Open the ChromaDB collection and check its embedding model locally.
+        
+        The model and dimension are recorded in the collection metadata when
+        it is created. If they differ from the configured model, the existing
+        vectors keep being served with the model that produced them and a
+        background migration is prepared (see ``start_embedding_migration``).
+        """
+        import chromadb
+        from llama_index.core import Settings
+        
         try:
             # Initialize ChromaDB client
             self.chroma_client = chromadb.PersistentClient(path=app_settings.CHROMA_DB_PATH)
+            configured = configured_embedding()
             
-            # Handle collection with potential embedding dimension mismatch
             try:
-                # Try to get existing collection
-                self.collection = self.chroma_client.get_collection(
-                    name=app_settings.COLLECTION_NAME
-                )
-                # Test if we can add embeddings (this will fail if dimensions don't match)
-                if app_settings.OPENAI_API_KEY:
-                    test_embed = OpenAIEmbedding(api_key=app_settings.OPENAI_API_KEY)
-                    # Try a test embedding to see if dimensions match
-                    test_embedding = test_embed.get_text_embedding("test")
-                    if self.collection.count() > 0:
-                        # Collection exists and has data, check if dimensions match
-                        try:
-                            self.collection.add(
-                                embeddings=[test_embedding],
-                                documents=["test"],
-                                ids=["test_dimension_check"]
-                            )
-                            # If successful, remove the test document
-                            self.collection.delete(ids=["test_dimension_check"])
-                        except Exception as dim_error:
-                            if "dimension" in str(dim_error).lower():
-                                print(f"Dimension mismatch detected: {dim_error}")
-                                print("Recreating collection with correct dimensions...")
-                                self.chroma_client.delete_collection(name=app_settings.COLLECTION_NAME)
-                                self.collection = self.chroma_client.create_collection(
-                                    name=app_settings.COLLECTION_NAME
-                                )
-                            else:
-                                raise
+                self.collection = self.chroma_client.get_collection(name=app_settings.COLLECTION_NAME)
             except Exception:
-                # Collection doesn't exist or other error, create new one
-                try:
-                    self.collection = self.chroma_client.create_collection(
-                        name=app_settings.COLLECTION_NAME
-                    )
-                except:
-                    # If collection already exists, get it
-                    self.collection = self.chroma_client.get_collection(
-                        name=app_settings.COLLECTION_NAME
-                    )
-            
-            # Set up embedding model
-            if app_settings.OPENAI_API_KEY:
-                embed_model = OpenAIEmbedding(api_key=app_settings.OPENAI_API_KEY)
-                Settings.embed_model = embed_model
+                self.collection = self.chroma_client.create_collection(
+                    name=app_settings.COLLECTION_NAME,
+                    metadata=configured
+                )
             
-            # Initialize vector store
-            vector_store = ChromaVectorStore(chroma_collection=self.collection)
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+            stored = stored_embedding(self.collection)
+            if not stored or same_embedding(stored, configured):
+                self.embedding = configured
+                if stored.get("inferred") or not (self.collection.metadata or {}).get("embedding_model"):
+                    # Created before the model was recorded: record it once
+                    self.collection.modify(metadata={**(self.collection.metadata or {}), **configured})
+            else:
+                logger.warning(
+                    f"Collection {app_settings.COLLECTION_NAME} was embedded with "
+                    f"{stored.get('embedding_model') or 'an unknown model'} ({stored.get('embedding_dimension')} dimensions), "
+                    f"configured model is {configured['embedding_model']} ({configured['embedding_dimension']}); "
+                    f"a background re-embed is required"
+                )
+                self.embedding = stored
+                self.embedding_migration = EmbeddingMigration(
+                    self.chroma_client,
+                    app_settings.COLLECTION_NAME,
+                    configured,
+                    on_complete=self._switch_collection
+                )
             
-            # Create or load index
-            try:
-                # Try to load existing index
-                self.index = VectorStoreIndex.from_vector_store(
-                    vector_store=vector_store,
-                    storage_context=storage_context
+            # Query with the model that produced the stored vectors
+            if app_settings.OPENAI_API_KEY:
+                Settings.embed_model = create_embed_model(
+                    self.embedding.get("embedding_model") or configured["embedding_model"],
+                    self.embedding.get("embedding_dimension")
                 )
-            except Exception as e:
-                print(f"Failed to load existing index, creating new one: {e}")
-                # Create new index if none exists or there's a dimension mismatch
-                self.index = VectorStoreIndex([], storage_context=storage_context)
-            
-            # Initialize query engine
-            self.query_engine = self.index.as_query_engine(
-                similarity_top_k=10,
-                response_mode="compact"
-            )
+            
+            self._open_index()
             
         except Exception as e:
             print(f"Error initializing ChromaDB: {e}")
             raise
     
+    def _open_index(self):
+        """Build the vector index and query engine over the current collection"""
+        from llama_index.core import VectorStoreIndex, StorageContext
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+        
+        vector_store = ChromaVectorStore(chroma_collection=self.collection)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+        
+        # Create or load index
+        try:
+            # Try to load existing index
+            self.index = VectorStoreIndex.from_vector_store(
+                vector_store=vector_store,
+                storage_context=storage_context
+            )
+        except Exception as e:
+            print(f"Failed to load existing index, creating new one: {e}")
+            self.index = VectorStoreIndex([], storage_context=storage_context)
+        
+        # Initialize query engine
+        self.query_engine = self.index.as_query_engine(
+            similarity_top_k=10,
+            response_mode="compact"
+        )
+        # Retrieval only: financial queries generate their answer through the LLM service
+        self.retriever = self.index.as_retriever(similarity_top_k=10)
+    
+    def start_embedding_migration(self):
+        """Start re-embedding the collection in the background if the model changed"""
+        try:
+            drop_retired_collections(self.chroma_client, app_settings.COLLECTION_NAME)
+        except Exception as e:
+            logger.warning(f"Failed to drop retired collections: {e}")
+        if self.embedding_migration and self.embedding_migration.status == "pending":
+            self.embedding_migration.start()
+    
+    async def _switch_collection(self, collection):
+        """Serve the re-embedded collection once the migration has caught up"""
+        self._use_collection(collection, configured_embedding())
+        await llm_response_cache.invalidate_corpus()
+    
+    def refresh_collection(self) -> bool:
+        """
+        Reopen the collection if another process swapped it in under the same
+        name (a completed embedding migration). Called before every write, so
+        worker processes never keep writing to a retired collection. Returns
+        whether the collection changed.
+        """
+        if self.chroma_client is None or self.collection is None:
+            return False
+        try:
+            current = self.chroma_client.get_collection(name=app_settings.COLLECTION_NAME)
+        except Exception as e:
+            logger.warning(f"Failed to look up collection {app_settings.COLLECTION_NAME}: {e}")
+            return False
+        if current.id == self.collection.id:
+            return False
+        
+        if self.embedding_migration and not self.embedding_migration.running:
+            # Another process ran the migration
+            self.embedding_migration = None
+        self._use_collection(current, stored_embedding(current) or configured_embedding())
+        return True
+    
+    def _use_collection(self, collection, embedding: Dict[str, Any]):
+        """Serve ``collection`` and embed with the model that produced it"""
+        from llama_index.core import Settings
+        
+        self.collection = collection
+        self.embedding = embedding
+        if app_settings.OPENAI_API_KEY:
+            Settings.embed_model = create_embed_model(
+                self.embedding["embedding_model"], self.embedding["embedding_dimension"]
+            )
+        self._open_index()
+        logger.info(f"Switched to collection embedded with {self.embedding['embedding_model']}")
+    
+    def get_embedding_status(self) -> Dict[str, Any]:
+        """Embedding model in use, configured model and migration progress"""
+        return {
+            "active": {key: value for key, value in (self.embedding or {}).items() if key != "inferred"},
+            "configured": configured_embedding(),
+            "migration": self.embedding_migration.get_status() if self.embedding_migration else None,
+            "cache": embedding_cache.get_stats()
+        }
+    
     def _initialize_financial_parser(self):
         """Initialize the financial document parser"""
         try:
@@ -134,16 +249,29 @@ class DocumentService:
             print(f"Error initializing financial parser: {e}")
             self.financial_parser = None
     
-    async def index_document(self, document: DocumentResponse):
-        """Index a single document with enhanced financial parsing"""
+    async def index_document(self,
+                             document: DocumentResponse,
+                             financial_data: Optional[Dict[str, Any]] = None,
+                             parse_missing: bool = True):
+        """
+        Index a single document with enhanced financial parsing.
+        
+        Pass the ``financial_data`` artifact from an earlier parse to avoid
+        parsing the document again; set ``parse_missing=False`` when the caller
+        already attempted parsing and it produced nothing.
+        """
+        from llama_index.core import SimpleDirectoryReader
+        from llama_index.core.node_parser import SentenceSplitter
+        
         try:
+            self.refresh_collection()
             file_path = Path(document.file_path)
             if not file_path.exists():
                 raise FileNotFoundError(f"Document file not found: {file_path}")
             
-            # Parse financial data if possible
-            financial_data = None
-            if self.financial_parser and self._is_financial_document(document):
+            # Parse financial data if possible and not already provided
+            if (financial_data is None and parse_missing and
+                    self.financial_parser and self._is_financial_document(document)):
                 try:
                     financial_data = await self.financial_parser.parse_document(document)
                 except Exception as e:
@@ -182,26 +310,79 @@ class DocumentService:
                             base_metadata["document_type"] = str(financial_doc.get('document_type'))
                 
                 doc.metadata.update(base_metadata)
+                # Per-upload fields stay out of the embedded text, so identical
+                # content from different uploads shares cached vectors
+                doc.excluded_embed_metadata_keys = list(PER_UPLOAD_METADATA)
                 
                 # Set the document ID to our custom ID to ensure consistency
                 doc.doc_id = document.id
             
             # Parse into nodes with chunking
-            parser = SentenceSplitter(
-                chunk_size=app_settings.CHUNK_SIZE,
-                chunk_overlap=app_settings.CHUNK_OVERLAP
-            )
-            nodes = parser.get_nodes_from_documents(documents)
-            
-            # Add nodes to index
-            self.index.insert_nodes(nodes)
-            
+            with time_stage("chunk", bytes_in=sum(len(doc.get_content().encode()) for doc in documents)) as timer:
+                parser = SentenceSplitter(
+                    chunk_size=app_settings.CHUNK_SIZE,
+                    chunk_overlap=app_settings.CHUNK_OVERLAP
+                )
+                nodes = parser.get_nodes_from_documents(documents)
+                timer.items = len(nodes)
+            
+            # Embed explicitly so embedding and ChromaDB writes have separate concurrency limits
+            if app_settings.OPENAI_API_KEY and nodes:
+                with time_stage("embed") as timer:
+                    timer.bytes_in = await self._embed_nodes(nodes)
+                    timer.items = len(nodes)
+            
+            # Add nodes to index (already embedded nodes are not embedded again)
+            with time_stage("index") as timer:
+                async with ingestion_executor.stage("index"):
+                    self.index.insert_nodes(nodes)
+                timer.items = len(nodes)
+            
+            await llm_response_cache.invalidate_corpus()
             return True
             
         except Exception as e:
             print(f"Error indexing document {document.id}: {e}")
             raise
     
+    async def _embed_nodes(self, nodes: List[Any]) -> int:
+        """
+        Embed nodes the way the index would on insert, reusing cached vectors
+        for text embedded before and sending the rest in token-packed
+        batches. Returns the number of bytes of text embedded.
+        """
+        from llama_index.core import Settings
+        from llama_index.core.schema import MetadataMode
+        
+        embed_model = Settings.embed_model
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        model = self.embedding.get("embedding_model") or app_settings.EMBEDDING_MODEL
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            tokens = sum(estimate_tokens(text) for text in batch)
+            record_tokens(tokens)
+            
+            async def embed():
+                # Hold the embed slot per attempt, not while backing off
+                async with ingestion_executor.stage("embed"):
+                    await rate_governor.acquire("openai", model, tokens)
+                    record_external_call("openai_embedding")
+                    return await embed_model.aget_text_embedding_batch(batch)
+            
+            return await with_retries(embed, stage="embed")
+        
+        embeddings = await embedding_cache.embed(
+            texts,
+            model,
+            self.embedding.get("embedding_dimension"),
+            embed_batch
+        )
+        
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        
+        return sum(len(text.encode()) for text in texts)
+    
     async def search_documents(self, query: str, limit: int = 5) -> List[SearchResult]:
         """Search documents using vector similarity"""
         try:
@@ -246,27 +427,24 @@ class DocumentService:
     async def delete_document(self, document_id: str) -> bool:
         """Delete a document from both disk and ChromaDB"""
         try:
-            # Find the document file
-            document_files = list(app_settings.DOCUMENTS_DIR.glob(f"{document_id}_*"))
+            # Look up the document in the catalog
+            record = await document_catalog.get(document_id)
             
-            if not document_files:
+            if not record:
                 raise FileNotFoundError(f"Document with ID {document_id} not found")
             
-            file_path = document_files[0]
+            file_path = Path(record.file_path)
             
             # Delete from ChromaDB using metadata filter
-            if self.collection:
-                # Get all documents with this document_id
-                results = self.collection.get(
-                    where={"document_id": document_id}
-                )
-                
-                if results['ids']:
-                    # Delete all chunks/nodes for this document
-                    self.collection.delete(ids=results['ids'])
+            await self.delete_document_vectors(document_id)
             
-            # Delete the file from disk
-            file_path.unlink()
+            # Delete the file from disk and the catalog
+            file_path.unlink(missing_ok=True)
+            await document_catalog.remove(document_id)
+            
+            # Drop this document's reference to its content-addressed blob
+            if record.content_digest:
+                await blob_store.release(record.content_digest, document_id)
             
             return True
             
@@ -274,6 +452,89 @@ class DocumentService:
             print(f"Error deleting document {document_id}: {e}")
             raise
 
+    async def delete_document_vectors(self, document_id: str) -> int:
+        """Remove every indexed chunk of a document from ChromaDB"""
+        if not self.collection:
+            return 0
+        self.refresh_collection()
+        
+        # Get all documents with this document_id
+        results = self.collection.get(
+            where={"document_id": document_id}
+        )
+        
+        if results['ids']:
+            # Delete all chunks/nodes for this document
+            self.collection.delete(ids=results['ids'])
+            if self.embedding_migration and self.embedding_migration.running:
+                self.embedding_migration.delete(results['ids'])
+            await llm_response_cache.invalidate_corpus()
+        return len(results['ids'])
+
+    async def clone_document_vectors(self, source_document_id: str, document: DocumentResponse) -> int:
+        """Copy the indexed chunks of an identical document under a new document ID without re-embedding"""
+        if not self.collection:
+            return 0
+        self.refresh_collection()
+        
+        results = self.collection.get(
+            where={"document_id": source_document_id},
+            include=["embeddings", "documents", "metadatas"]
+        )
+        
+        if not results['ids']:
+            return 0
+        
+        ids = []
+        metadatas = []
+        for source_metadata in results['metadatas']:
+            node_id = str(uuid.uuid4())
+            ids.append(node_id)
+            metadatas.append(self._relink_node_metadata(
+                source_metadata, source_document_id, document, node_id
+            ))
+        
+        self.collection.add(
+            ids=ids,
+            embeddings=results['embeddings'],
+            documents=results['documents'],
+            metadatas=metadatas
+        )
+        
+        await llm_response_cache.invalidate_corpus()
+        return len(ids)
+    
+    def _relink_node_metadata(self,
+                              metadata: Dict[str, Any],
+                              source_document_id: str,
+                              document: DocumentResponse,
+                              node_id: str) -> Dict[str, Any]:
+        """Rewrite a stored node's metadata so it belongs to another document"""
+        document_fields = {
+            "document_id": document.id,
+            "filename": document.filename,
+            "uploaded_at": document.uploaded_at.isoformat()
+        }
+        
+        metadata = dict(metadata)
+        metadata.update(document_fields)
+        for key in ("doc_id", "ref_doc_id", "document_id"):
+            if metadata.get(key) == source_document_id:
+                metadata[key] = document.id
+        
+        # LlamaIndex keeps a serialized copy of the node alongside the vector
+        node_content = metadata.get("_node_content")
+        if node_content:
+            node = json.loads(node_content)
+            node["id_"] = node_id
+            node.setdefault("metadata", {}).update(document_fields)
+            for relationship in node.get("relationships", {}).values():
+                if isinstance(relationship, dict) and relationship.get("node_id") == source_document_id:
+                    relationship["node_id"] = document.id
+            metadata["_node_content"] = json.dumps(node)
+        
+        return metadata
+    
     async def get_document_count(self) -> int:
         """Get total number of indexed documents"""
         try:
@@ -363,93 +624,44 @@ class DocumentService:
     async def query_financial_data(self, 
                                   query: str, 
                                   filters: Optional[Dict[str, Any]] = None,
-                                  provider: Optional[LLMProvider] = None) -> Dict[str, Any]:
-        """Enhanced query method for financial data with natural language support using multiple LLM providers"""
+                                  provider: Optional[LLMProvider] = None,
+                                  cache_ttl: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Enhanced query method for financial data with natural language support using multiple LLM providers.
+        
+        With ``cache_ttl`` the answer is reused from the LLM response cache
+        for that many seconds, until the document corpus changes.
+        """
         try:
             # Initialize LLM service if not already done
             if not self.llm_service._initialized:
                 await self.llm_service.initialize()
             
             # Get relevant documents using vector search
-            relevant_docs = []
-            sources_info = []
-            seen_sources = set()  # Track documents we've already included as sources
-            
-            if self.query_engine:
-                # Use LlamaIndex for document retrieval
-                retrieval_response = self.query_engine.query(query)
-                
-                if hasattr(retrieval_response, 'source_nodes'):
-                    for node in retrieval_response.source_nodes:
-                        if hasattr(node, 'text') and node.text is not None:
-                            relevant_docs.append(node.text)
-                            
-                            # Collect source information (deduplicated by document_id)
-                            if hasattr(node, 'metadata'):
-                                metadata = node.metadata
-                                document_id = metadata.get("document_id")
-                                
-                                # Skip if we've already included this document as a source
-                                if document_id and document_id not in seen_sources:
-                                    seen_sources.add(document_id)
-                                    content_preview = node.text[:200] + "..." if len(node.text) > 200 else node.text
-                                    
-                                    sources_info.append({
-                                        "document_id": document_id,
-                                        "filename": metadata.get("filename"),
-                                        "vendor": metadata.get("vendor_name"),
-                                        "amount": metadata.get("total_amount"),
-                                        "date": metadata.get("issue_date"),
-                                        "content_preview": content_preview
-                                    })
-            
-            # Enhanced system prompt for financial context
-            financial_context = """
-            You are a financial analysis assistant for a home renovation expense tracking system.
-            You have access to invoices, receipts, and bills for home renovation projects.
-            
-            When analyzing financial data, please:
-            1. Look for specific dollar amounts and totals
-            2. Consider date ranges when asked about time periods
-            3. Group expenses by categories (materials, labor, permits, etc.)
-            4. Consider project associations when asked about specific renovations
-            5. Provide specific details and calculations when possible
-            6. If no relevant information is found, clearly state this
-            
-            Format your response to be helpful and specific, including:
-            - Direct answers to the user's question
-            - Relevant financial details from the documents
-            - Calculations or summaries when appropriate
-            """
-            
-            # Determine which provider to use
-            selected_provider = provider
-            if selected_provider is None:
-                # Use provider specified in filters, or default
-                if filters and 'llm_provider' in filters:
-                    selected_provider = LLMProvider(filters['llm_provider'])
-                else:
-                    # Use default provider from settings
-                    provider_name = app_settings.DEFAULT_LLM_PROVIDER
-                    selected_provider = LLMProvider.OPENAI if provider_name == "openai" else LLMProvider.CLAUDE
+            relevant_docs, sources_info = await self._retrieve_financial_context(query)
+            selected_provider = self._select_provider(filters, provider)
             
             # Generate response using selected LLM provider
             if relevant_docs:
                 response = await self.llm_service.generate_response_with_context(
                     query=query,
                     context_documents=relevant_docs,
-                    system_prompt=financial_context,
+                    system_prompt=FINANCIAL_CONTEXT,
                     provider=selected_provider,
                     temperature=app_settings.LLM_TEMPERATURE,
-                    max_tokens=app_settings.LLM_MAX_TOKENS
+                    max_tokens=app_settings.LLM_MAX_TOKENS,
+                    cache_ttl=cache_ttl,
+                    corpus_scoped=True
                 )
             else:
                 # No relevant documents found
                 response = await self.llm_service.generate_response(
-                    query=f"No relevant financial documents were found for the query: '{query}'. Please explain this to the user and suggest they might need to upload relevant documents.",
-                    system_prompt=financial_context,
+                    query=NO_DOCUMENTS_QUERY.format(query=query),
+                    system_prompt=FINANCIAL_CONTEXT,
                     provider=selected_provider,
-                    temperature=app_settings.LLM_TEMPERATURE
+                    temperature=app_settings.LLM_TEMPERATURE,
+                    cache_ttl=cache_ttl,
+                    corpus_scoped=True
                 )
             
             # Calculate financial summary from sources
@@ -462,7 +674,9 @@ class DocumentService:
                 "financial_summary": financial_summary,
                 "llm_provider": response.provider.value,
                 "model_used": response.model,
-                "usage": response.usage
+                "usage": response.usage,
+                "context_tokens": response.metadata.get("context", {}).get("tokens", 0),
+                "cached": response.metadata.get("cached", False)
             }
             
             return result
@@ -471,6 +685,118 @@ class DocumentService:
             logger.error(f"Error querying financial data: {e}")
             return {"error": f"Query failed: {str(e)}"}
     
+    async def stream_financial_query(self,
+                                     query: str,
+                                     filters: Optional[Dict[str, Any]] = None,
+                                     provider: Optional[LLMProvider] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming form of ``query_financial_data``. Yields a ``sources`` event
+        as soon as retrieval finishes, a ``delta`` event per chunk of answer
+        text, then a ``done`` event with the full answer, usage and the
+        provider's time to first token. Errors are raised to the caller.
+        """
+        if not self.llm_service._initialized:
+            await self.llm_service.initialize()
+        
+        relevant_docs, sources_info = await self._retrieve_financial_context(query)
+        yield {
+            "event": "sources",
+            "sources": sources_info,
+            "financial_summary": self._calculate_financial_summary(sources_info)
+        }
+        
+        if relevant_docs:
+            stream = self.llm_service.stream_response(
+                query=query,
+                system_prompt=FINANCIAL_CONTEXT,
+                context_documents=relevant_docs,
+                provider=self._select_provider(filters, provider),
+                temperature=app_settings.LLM_TEMPERATURE,
+                max_tokens=app_settings.LLM_MAX_TOKENS
+            )
+        else:
+            stream = self.llm_service.stream_response(
+                query=NO_DOCUMENTS_QUERY.format(query=query),
+                system_prompt=FINANCIAL_CONTEXT,
+                provider=self._select_provider(filters, provider),
+                temperature=app_settings.LLM_TEMPERATURE
+            )
+        
+        async with aclosing(stream):
+            async for item in stream:
+                if isinstance(item, LLMResponse):
+                    yield {
+                        "event": "done",
+                        "answer": item.content,
+                        "llm_provider": item.provider.value,
+                        "model_used": item.model,
+                        "usage": item.usage,
+                        "context_tokens": item.metadata.get("context", {}).get("tokens", 0),
+                        "ttft_ms": item.metadata.get("ttft_ms")
+                    }
+                elif item:
+                    yield {"event": "delta", "content": item}
+    
+    async def _retrieve_financial_context(self, query: str) -> Tuple[List[ContextChunk], List[Dict[str, Any]]]:
+        """Retrieved chunks with their scores, and source information deduplicated by document"""
+        relevant_docs = []
+        sources_info = []
+        seen_sources = set()  # Track documents we've already included as sources
+        
+        if self.retriever:
+            # Use LlamaIndex for document retrieval only; the answer comes from the LLM service
+            if app_settings.OPENAI_API_KEY:
+                # Retrieval embeds the query
+                await rate_governor.acquire(
+                    "openai",
+                    self.embedding.get("embedding_model") or app_settings.EMBEDDING_MODEL,
+                    estimate_request_tokens([query], 0)
+                )
+            source_nodes = await self.retriever.aretrieve(query)
+            
+            for node in source_nodes or []:
+                if hasattr(node, 'text') and node.text is not None:
+                    inner = getattr(node, 'node', node)
+                    relevant_docs.append(ContextChunk(
+                        node.text,
+                        score=getattr(node, 'score', None),
+                        document_id=(getattr(node, 'metadata', None) or {}).get("document_id"),
+                        position=getattr(inner, 'start_char_idx', None)
+                    ))
+                    
+                    # Collect source information (deduplicated by document_id)
+                    if hasattr(node, 'metadata'):
+                        metadata = node.metadata
+                        document_id = metadata.get("document_id")
+                        
+                        # Skip if we've already included this document as a source
+                        if document_id and document_id not in seen_sources:
+                            seen_sources.add(document_id)
+                            content_preview = node.text[:200] + "..." if len(node.text) > 200 else node.text
+                            
+                            sources_info.append({
+                                "document_id": document_id,
+                                "filename": metadata.get("filename"),
+                                "vendor": metadata.get("vendor_name"),
+                                "amount": metadata.get("total_amount"),
+                                "date": metadata.get("issue_date"),
+                                "content_preview": content_preview
+                            })
+        
+        return relevant_docs, sources_info
+    
+    def _select_provider(self,
+                         filters: Optional[Dict[str, Any]],
+                         provider: Optional[LLMProvider]) -> LLMProvider:
+        """Explicit provider, else the one named in the filters, else the configured default"""
+        if provider is not None:
+            return provider
+        if filters and 'llm_provider' in filters:
+            return LLMProvider(filters['llm_provider'])
+        # Use default provider from settings
+        provider_name = app_settings.DEFAULT_LLM_PROVIDER
+        return LLMProvider.OPENAI if provider_name == "openai" else LLMProvider.CLAUDE
+    
     def _calculate_financial_summary(self, sources_info: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calculate financial summary from source information"""
         total_amount = 0
@@ -502,7 +828,8 @@ class DocumentService:
                                    start_date: Optional[str] = None,
                                    end_date: Optional[str] = None,
                                    project: Optional[str] = None,
-                                   category: Optional[str] = None) -> Dict[str, Any]:
+                                   category: Optional[str] = None,
+                                   cache_ttl: Optional[int] = None) -> Dict[str, Any]:
         """Get financial summary with optional filters"""
         try:
             # Build query based on filters
@@ -524,7 +851,7 @@ class DocumentService:
             
             query = " ".join(query_parts)
             
-            return await self.query_financial_data(query)
+            return await self.query_financial_data(query, cache_ttl=cache_ttl)
             
         except Exception as e:
             print(f"Error getting financial summary: {e}")
@@ -533,24 +860,22 @@ class DocumentService:
     async def extract_financial_data(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Extract structured financial data for a specific document"""
         try:
-            # Find the document file
-            document_files = list(app_settings.DOCUMENTS_DIR.glob(f"{document_id}_*"))
+            # Look up the document in the catalog
+            record = await document_catalog.get(document_id)
             
-            if not document_files:
+            if not record:
                 return None
             
-            file_path = document_files[0]
-            filename = file_path.name.split("_", 1)[1]
-            
             # Create DocumentResponse object
             document = DocumentResponse(
-                id=document_id,
-                filename=filename,
-                file_path=str(file_path),
-                content_type="application/pdf",  # Default, could be detected
-                file_size=file_path.stat().st_size,
-                uploaded_at=datetime.fromtimestamp(file_path.stat().st_ctime),
-                indexed=True
+                id=record.id,
+                filename=record.filename,
+                file_path=record.file_path,
+                content_type=record.content_type or "application/pdf",
+                file_size=record.file_size,
+                uploaded_at=record.uploaded_at,
+                indexed=record.index_state == "indexed",
+                content_digest=record.content_digest
             )
             
             if self.financial_parser:
@@ -0,0 +1,234 @@
+"""
+Persistent cache for text embeddings
+
+Vectors are keyed by the embedding model and dimension plus the SHA-256 of
+the exact text that was embedded, so re-indexing a document, rebuilding the
+Chroma collection or migrating back to a model used before costs no
+embedding calls, and duplicate chunks are embedded once. Texts that miss are
+packed into provider-sized batches by token count. Vectors are stored as
+float32, the precision the provider returns. Total size is bounded; least
+recently used entries are evicted first.
+"""
+
+import hashlib
+from array import array
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Iterable
+import logging
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.sqlite import insert
+
+from app.core.config import settings
+from app.core.instrumentation import estimate_tokens
+from app.db.database import AsyncSessionLocal
+from app.db.models import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Keys per IN (...) clause, well under SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def model_key(model: str, dimension: Optional[int] = None) -> str:
+    """Cache namespace for an embedding model at a given output dimension"""
+    return f"{model}:{dimension or 'native'}"
+
+
+def pack_batches(texts: List[str],
+                 max_tokens: Optional[int] = None,
+                 max_inputs: Optional[int] = None) -> List[List[str]]:
+    """
+    Split texts into request-sized batches: each batch holds at most
+    ``max_inputs`` texts and ``max_tokens`` tokens. A single text larger than
+    the token budget goes in a batch of its own.
+    """
+    max_tokens = max_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS
+    max_inputs = max_inputs or settings.EMBEDDING_BATCH_MAX_INPUTS
+
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    batch_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class EmbeddingCache:
+    """Size-bounded, SQLite-backed cache of embedding vectors"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = settings.EMBEDDING_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    async def get_many(self, namespace: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for the given text hashes, keyed by hash"""
+        if not settings.EMBEDDING_CACHE_ENABLED or not hashes:
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        async with AsyncSessionLocal() as session:
+            try:
+                for chunk in _chunks(hashes, _LOOKUP_CHUNK):
+                    result = await session.execute(
+                        select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector).where(
+                            EmbeddingCacheEntry.model_key == namespace,
+                            EmbeddingCacheEntry.text_hash.in_(chunk)
+                        )
+                    )
+                    for key, vector in result.all():
+                        found[key] = array("f", vector).tolist()
+
+                for chunk in _chunks(list(found), _LOOKUP_CHUNK):
+                    await session.execute(
+                        update(EmbeddingCacheEntry)
+                        .where(
+                            EmbeddingCacheEntry.model_key == namespace,
+                            EmbeddingCacheEntry.text_hash.in_(chunk)
+                        )
+                        .values(last_accessed_at=datetime.utcnow())
+                    )
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Embedding cache lookup failed: {e}")
+                return {}
+
+        return found
+
+    async def put_many(self, namespace: str, vectors: Dict[str, List[float]]):
+        """Store vectors keyed by text hash, then enforce the size bound"""
+        if not settings.EMBEDDING_CACHE_ENABLED or not vectors:
+            return
+
+        rows = []
+        for key, vector in vectors.items():
+            packed = array("f", vector).tobytes()
+            rows.append({
+                "model_key": namespace,
+                "text_hash": key,
+                "dimension": len(vector),
+                "vector": packed,
+                "size_bytes": len(packed),
+                "last_accessed_at": datetime.utcnow()
+            })
+
+        async with AsyncSessionLocal() as session:
+            try:
+                statement = insert(EmbeddingCacheEntry)
+                await session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[EmbeddingCacheEntry.model_key, EmbeddingCacheEntry.text_hash],
+                        set_={"last_accessed_at": statement.excluded.last_accessed_at}
+                    ),
+                    rows
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to store embeddings: {e}")
+                return
+
+        await self.evict()
+
+    async def embed(self,
+                    texts: List[str],
+                    model: str,
+                    dimension: Optional[int],
+                    embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]]) -> List[List[float]]:
+        """
+        Vectors for ``texts`` in order. Cached vectors are reused, each
+        distinct missing text is embedded once, and the misses are sent to
+        ``embed_batch`` in token-packed batches; every batch is cached as soon
+        as it returns.
+        """
+        namespace = model_key(model, dimension)
+        hashes = [text_hash(text) for text in texts]
+        vectors = await self.get_many(namespace, list(dict.fromkeys(hashes)))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        for batch in pack_batches(list(missing.values())):
+            embeddings = await embed_batch(batch)
+            self.batches += 1
+            embedded = {text_hash(text): embedding for text, embedding in zip(batch, embeddings)}
+            vectors.update(embedded)
+            await self.put_many(namespace, embedded)
+
+        return [vectors[key] for key in hashes]
+
+    async def evict(self) -> int:
+        """Delete least recently used vectors until the cache fits in max_bytes"""
+        async with AsyncSessionLocal() as session:
+            try:
+                total = (await session.execute(
+                    select(func.coalesce(func.sum(EmbeddingCacheEntry.size_bytes), 0))
+                )).scalar()
+                if total <= self.max_bytes:
+                    return 0
+
+                # Find the access time that frees enough space, then drop everything at or before it
+                result = await session.execute(
+                    select(EmbeddingCacheEntry.last_accessed_at, EmbeddingCacheEntry.size_bytes)
+                    .order_by(EmbeddingCacheEntry.last_accessed_at.asc())
+                )
+                cutoff = None
+                for last_accessed_at, size_bytes in result.all():
+                    if total <= self.max_bytes:
+                        break
+                    cutoff = last_accessed_at
+                    total -= size_bytes
+
+                deleted = await session.execute(
+                    delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.last_accessed_at <= cutoff)
+                )
+                evicted = deleted.rowcount or 0
+
+                await session.commit()
+                logger.info(f"Evicted {evicted} cached embeddings")
+                return evicted
+
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Embedding cache eviction failed: {e}")
+                return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process, counted per text"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.EMBEDDING_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "batches_sent": self.batches,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Global embedding cache instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,306 @@
+"""
+Embedding model bookkeeping and background re-embedding for the Chroma collection
+
+The collection records the embedding model and dimension it was built with
+in its metadata, so opening it only compares two local values instead of
+embedding a probe string. When the configured model differs, the existing
+vectors keep being served with the model that produced them while
+``EmbeddingMigration`` re-embeds every chunk into a side collection. When it
+has caught up, the side collection takes over the collection name. Worker
+processes reopen the collection by name before writing, so the old one is
+kept for ``EMBEDDING_RETIRE_GRACE_SECONDS``; chunks they wrote to it in that
+time are copied over before it is dropped.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+import logging
+
+from app.core.config import settings
+from app.core.instrumentation import record_external_call, record_tokens, estimate_tokens
+from app.core.retry import with_retries
+from app.services.embedding_cache import embedding_cache
+from app.services.rate_governor import rate_governor, set_bulk_priority
+
+logger = logging.getLogger(__name__)
+
+# Native output dimensions of the supported OpenAI embedding models
+EMBEDDING_MODEL_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+MIGRATION_SUFFIX = "__migration"
+RETIRED_SUFFIX = "__retired_"
+RETIRED_TIMESTAMP = "%Y%m%d%H%M%S"
+
+
+def configured_embedding() -> Dict[str, Any]:
+    """Embedding model and dimension the settings ask for"""
+    model = settings.EMBEDDING_MODEL
+    dimension = settings.EMBEDDING_DIMENSIONS or EMBEDDING_MODEL_DIMENSIONS.get(model)
+    return {"embedding_model": model, "embedding_dimension": dimension}
+
+
+def stored_embedding(collection) -> Dict[str, Any]:
+    """
+    Embedding model and dimension a collection was built with; empty for a
+    new or empty collection. Collections created before the metadata was
+    recorded are identified from the length of one stored vector, which is a
+    local read.
+    """
+    metadata = collection.metadata or {}
+    if metadata.get("embedding_model"):
+        return {
+            "embedding_model": metadata["embedding_model"],
+            "embedding_dimension": metadata.get("embedding_dimension")
+        }
+
+    if collection.count() == 0:
+        return {}
+
+    sample = collection.get(limit=1, include=["embeddings"])
+    dimension = len(sample["embeddings"][0])
+    model = next((name for name, size in EMBEDDING_MODEL_DIMENSIONS.items() if size == dimension), None)
+    return {"embedding_model": model, "embedding_dimension": dimension, "inferred": True}
+
+
+def same_embedding(stored: Dict[str, Any], configured: Dict[str, Any]) -> bool:
+    """Whether vectors from ``stored`` can be queried with ``configured``"""
+    if stored.get("embedding_dimension") and configured.get("embedding_dimension"):
+        if stored["embedding_dimension"] != configured["embedding_dimension"]:
+            return False
+    # A legacy collection only tells us its dimension
+    return stored.get("inferred") or stored.get("embedding_model") == configured["embedding_model"]
+
+
+def drop_retired_collections(chroma_client, collection_name: str) -> List[str]:
+    """
+    Delete collections retired by an earlier migration whose grace period has
+    passed, e.g. when the process stopped before dropping them. Returns their names.
+    """
+    prefix = f"{collection_name}{RETIRED_SUFFIX}"
+    dropped = []
+    for collection in chroma_client.list_collections():
+        name = collection if isinstance(collection, str) else collection.name
+        if not name.startswith(prefix):
+            continue
+        try:
+            retired_at = datetime.strptime(name[len(prefix):], RETIRED_TIMESTAMP)
+        except ValueError:
+            continue
+        if (datetime.utcnow() - retired_at).total_seconds() >= settings.EMBEDDING_RETIRE_GRACE_SECONDS:
+            chroma_client.delete_collection(name=name)
+            dropped.append(name)
+            logger.info(f"Dropped retired collection {name}")
+    return dropped
+
+
+def create_embed_model(model: Optional[str] = None, dimension: Optional[int] = None):
+    """OpenAI embedding model for a recorded or configured model name"""
+    from llama_index.embeddings.openai import OpenAIEmbedding
+
+    model = model or settings.EMBEDDING_MODEL
+    # Batches are packed by token count before they reach the model, so let each go out as one request
+    kwargs = {"api_key": settings.OPENAI_API_KEY, "model": model, "embed_batch_size": settings.EMBEDDING_BATCH_MAX_INPUTS}
+    if dimension and dimension != EMBEDDING_MODEL_DIMENSIONS.get(model):
+        # Shortened text-embedding-3 vectors
+        kwargs["dimensions"] = dimension
+    return OpenAIEmbedding(**kwargs)
+
+
+class EmbeddingMigration:
+    """Re-embeds a collection into a side collection, then swaps it in"""
+
+    def __init__(self,
+                 chroma_client,
+                 collection_name: str,
+                 signature: Dict[str, Any],
+                 on_complete: Callable[[Any], Awaitable[None]],
+                 batch_size: Optional[int] = None):
+        self.chroma_client = chroma_client
+        self.collection_name = collection_name
+        self.target_name = f"{collection_name}{MIGRATION_SUFFIX}"
+        self.signature = signature
+        self.on_complete = on_complete
+        self.batch_size = batch_size or settings.EMBEDDING_MIGRATION_BATCH_SIZE
+
+        self.target = None
+        self.status = "pending"
+        self.total = 0
+        self.migrated = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Run the migration in a background task"""
+        if self.running:
+            return
+        if not settings.OPENAI_API_KEY:
+            self.status = "blocked"
+            self.error = "OPENAI_API_KEY is required to re-embed the collection"
+            logger.warning(f"Embedding migration blocked: {self.error}")
+            return
+        self._task = asyncio.create_task(self._run(), name="embedding-migration")
+
+    async def stop(self):
+        """Cancel the migration; it resumes from the side collection next time"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def delete(self, ids: List[str]):
+        """Mirror a delete from the live collection so removed chunks do not come back"""
+        if self.target is not None and ids:
+            self.target.delete(ids=ids)
+
+    async def _run(self):
+        # Re-embedding yields to interactive queries under the rate limits
+        set_bulk_priority()
+        self.status = "running"
+        self.started_at = datetime.utcnow()
+        try:
+            source = self.chroma_client.get_collection(name=self.collection_name)
+            try:
+                # Resume a migration interrupted by a restart
+                self.target = self.chroma_client.get_collection(name=self.target_name)
+            except Exception:
+                self.target = self.chroma_client.create_collection(name=self.target_name, metadata=self.signature)
+
+            embed_model = create_embed_model(self.signature["embedding_model"], self.signature["embedding_dimension"])
+            self.total = source.count()
+            logger.info(
+                f"Re-embedding collection {self.collection_name} with {self.signature['embedding_model']} "
+                f"({self.total} chunks)"
+            )
+
+            # Copy page by page, then catch up with chunks written meanwhile
+            offset = 0
+            while True:
+                page = source.get(limit=self.batch_size, offset=offset, include=["documents", "metadatas"])
+                if not page["ids"]:
+                    break
+                await self._copy(page, embed_model)
+                offset += len(page["ids"])
+            await self._catch_up(source, embed_model)
+
+            retired_name = f"{self.collection_name}{RETIRED_SUFFIX}{datetime.utcnow():{RETIRED_TIMESTAMP}}"
+            source.modify(name=retired_name)
+            self.target.modify(name=self.collection_name, metadata=self.signature)
+            await self.on_complete(self.target)
+            await self._retire(retired_name, embed_model)
+
+            self.status = "completed"
+            logger.info(f"Embedding migration of {self.collection_name} completed: {self.migrated} chunks")
+
+        except asyncio.CancelledError:
+            self.status = "interrupted"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"Embedding migration of {self.collection_name} failed: {e}")
+        finally:
+            self.finished_at = datetime.utcnow()
+
+    async def _retire(self, retired_name: str, embed_model):
+        """
+        Drop the old collection once no process is still writing to it.
+        Worker processes switch at their next write, so until the grace period
+        ends chunks may still land in the old collection; those written after
+        the swap are copied over before it is deleted. Chunks already present
+        at the swap are not copied again, so documents deleted meanwhile stay deleted.
+        """
+        retired = self.chroma_client.get_collection(name=retired_name)
+        # Chunks the old collection took between the catch-up and the swap
+        await self._catch_up(retired, embed_model)
+        known = set(retired.get(include=[])["ids"])
+
+        self.status = "retiring"
+        await asyncio.sleep(settings.EMBEDDING_RETIRE_GRACE_SECONDS)
+
+        late = [chunk_id for chunk_id in retired.get(include=[])["ids"] if chunk_id not in known]
+        for start in range(0, len(late), self.batch_size):
+            page = retired.get(ids=late[start:start + self.batch_size], include=["documents", "metadatas"])
+            await self._copy(page, embed_model)
+        if late:
+            logger.info(f"Copied {len(late)} chunks written to {retired_name} after the swap")
+        self.chroma_client.delete_collection(name=retired_name)
+
+    async def _catch_up(self, source, embed_model):
+        source_ids = source.get(include=[])["ids"]
+        self.total = len(source_ids)
+        target_ids = set(self.target.get(include=[])["ids"])
+        missing = [chunk_id for chunk_id in source_ids if chunk_id not in target_ids]
+        for start in range(0, len(missing), self.batch_size):
+            page = source.get(ids=missing[start:start + self.batch_size], include=["documents", "metadatas"])
+            await self._copy(page, embed_model)
+
+    async def _copy(self, page: Dict[str, Any], embed_model):
+        existing = set(self.target.get(ids=page["ids"], include=[])["ids"])
+        rows = [
+            (chunk_id, document, metadata)
+            for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+            if chunk_id not in existing
+        ]
+        if not rows:
+            return
+
+        texts = [self._embedding_text(document, metadata) for _, document, metadata in rows]
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            tokens = sum(estimate_tokens(text) for text in batch)
+            record_tokens(tokens)
+            
+            async def embed():
+                await rate_governor.acquire("openai", self.signature["embedding_model"], tokens)
+                record_external_call("openai_embedding")
+                return await embed_model.aget_text_embedding_batch(batch)
+            
+            return await with_retries(embed, stage="embed")
+        
+        embeddings = await embedding_cache.embed(
+            texts,
+            self.signature["embedding_model"],
+            self.signature["embedding_dimension"],
+            embed_batch
+        )
+        self.target.upsert(
+            ids=[chunk_id for chunk_id, _, _ in rows],
+            embeddings=embeddings,
+            documents=[document for _, document, _ in rows],
+            metadatas=[metadata for _, _, metadata in rows]
+        )
+        self.migrated += len(rows)
+
+    @staticmethod
+    def _embedding_text(document: Optional[str], metadata: Dict[str, Any]) -> str:
+        """The text LlamaIndex embedded for a stored node: content plus embed-visible metadata"""
+        try:
+            from llama_index.core.schema import MetadataMode
+            from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+            return metadata_dict_to_node(metadata, text=document).get_content(metadata_mode=MetadataMode.EMBED)
+        except Exception:
+            return document or ""
+
+    def get_status(self) -> Dict[str, Any]:
+        """Progress of the migration"""
+        return {
+            "status": self.status,
+            "target": self.signature,
+            "total_chunks": self.total,
+            "migrated_chunks": self.migrated,
+            "error": self.error,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
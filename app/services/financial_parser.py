@@ -1,17 +1,69 @@
-from llama_parse import LlamaParse
-from llama_index.core import Document
 from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
 import json
 import re
 from datetime import datetime
 from pathlib import Path
 
 from app.core.config import settings
+from app.core.instrumentation import record_external_call, record_tokens, estimate_tokens
+from app.core.retry import is_transient_error
 from app.models.financial import (
     FinancialDocument, LineItem, Vendor, Project,
     ExpenseCategory, DocumentType, PaymentMethod
 )
 from app.models.document import DocumentResponse
+from app.services.parse_cache import parse_cache, make_fingerprint
+from app.services.rate_governor import rate_governor, estimate_request_tokens
+
+
+# Model and prompt used to structure parsed content; both are part of the
+# parse cache fingerprint, so changing either invalidates cached extractions
+EXTRACTION_MODEL = "gpt-3.5-turbo"
+
+EXTRACTION_PROMPT_TEMPLATE = """
+            Extract structured financial information from this document content and return it as JSON:
+
+            Document Content:
+            {content}
+
+            Extract and return a JSON object with this exact structure:
+            {{
+                "document_type": "invoice|receipt|estimate|bill",
+                "document_number": "string or null",
+                "issue_date": "YYYY-MM-DD or null",
+                "due_date": "YYYY-MM-DD or null",
+                "vendor": {{
+                    "name": "string",
+                    "address": "string or null",
+                    "phone": "string or null",
+                    "email": "string or null"
+                }},
+                "line_items": [
+                    {{
+                        "description": "string",
+                        "quantity": number,
+                        "unit_price": number,
+                        "total_price": number,
+                        "category": "materials|labor|equipment|supplies|other"
+                    }}
+                ],
+                "financial_summary": {{
+                    "subtotal": number,
+                    "tax_amount": number,
+                    "total_amount": number,
+                    "currency": "USD"
+                }},
+                "project_info": {{
+                    "project_name": "string or null",
+                    "work_order": "string or null",
+                    "location": "string or null"
+                }}
+            }}
+
+            Only return valid JSON. If information is not available, use null values.
+            """
 
 
 class FinancialDocumentParser:
@@ -21,11 +73,14 @@ class FinancialDocumentParser:
         if not settings.LLAMA_CLOUD_API_KEY:
             raise ValueError("LLAMA_CLOUD_API_KEY is required for LlamaParse")
         
+        from llama_parse import LlamaParse
+        
         self.parser = LlamaParse(
             api_key=settings.LLAMA_CLOUD_API_KEY,
             result_type="markdown",  # Can be "markdown" or "text"
             verbose=True,
             language="en",
+            ignore_errors=False,  # Surface provider errors so transient ones are retried
         )
         
         # Enhanced parsing instructions for financial documents
@@ -75,36 +130,128 @@ class FinancialDocumentParser:
 
         Extract all monetary amounts with their associated descriptions. Preserve the exact structure and formatting of tables when present.
         """
+        
+        # Identifies the parser configuration for cached artifacts
+        self.fingerprint = make_fingerprint(
+            self.parser.parsing_instruction,
+            self.parser.result_type,
+            self.parser.language,
+            EXTRACTION_PROMPT_TEMPLATE,
+            EXTRACTION_MODEL if settings.OPENAI_API_KEY else "patterns"
+        )
 
-    async def parse_document(self, document: DocumentResponse) -> Dict[str, Any]:
-        """Parse a document and extract structured financial data"""
+    async def parse_document(self, document: DocumentResponse, use_cache: bool = True) -> Dict[str, Any]:
+        """Parse a document and extract structured financial data, reusing cached artifacts when possible"""
         try:
             file_path = Path(document.file_path)
             if not file_path.exists():
                 raise FileNotFoundError(f"Document file not found: {file_path}")
 
-            # Parse document with LlamaParse
-            documents = await self.parser.aload_data([str(file_path)])
-            
-            if not documents:
-                raise ValueError("No content extracted from document")
+            cached = await self.load_cached(document) if use_cache else None
+            if cached and cached.get("extracted_data") is not None:
+                return cached
+
+            parsed_content = cached["parsed_content"] if cached else await self.parse_content(document)
+            metadata, extracted_data, cacheable = await self.extract_content(parsed_content, document)
+
+            if use_cache and cacheable:
+                await self.store_cached(document, parsed_content, metadata, extracted_data)
 
-            # Extract structured data from parsed content
-            parsed_content = documents[0].text
-            metadata = await self._extract_financial_metadata(parsed_content, document)
-            
             return {
                 "document_id": document.id,
                 "parsed_content": parsed_content,
                 "metadata": metadata,
-                "extracted_data": await self._structure_financial_data(metadata, document)
+                "extracted_data": extracted_data,
+                "cache_hit": False
             }
 
         except Exception as e:
             print(f"Error parsing document {document.id}: {e}")
             raise
 
-    async def _extract_financial_metadata(self, content: str, document: DocumentResponse) -> Dict[str, Any]:
+    async def parse_content(self, document: DocumentResponse) -> str:
+        """Run LlamaParse on a document and return its markdown"""
+        file_path = Path(document.file_path)
+        if not file_path.exists():
+            raise FileNotFoundError(f"Document file not found: {file_path}")
+
+        record_external_call("llamaparse")
+        documents = await self.parser.aload_data([str(file_path)])
+
+        if not documents:
+            raise ValueError("No content extracted from document")
+
+        return documents[0].text
+
+    async def extract_content(self, parsed_content: str, document: DocumentResponse):
+        """
+        Extract structured financial data from parsed content.
+
+        Returns ``(metadata, extracted_data, cacheable)``; pattern-matching
+        fallbacks after an LLM error are returned but flagged as not cacheable.
+        Transient provider errors are raised so the caller can retry them.
+        """
+        cacheable = True
+        try:
+            metadata = await self._extract_financial_metadata(parsed_content, document, fallback=False)
+        except Exception as e:
+            if is_transient_error(e):
+                # Let the caller retry rate limits and timeouts
+                raise
+            print(f"Error extracting financial metadata: {e}")
+            metadata = await self._extract_with_patterns(parsed_content)
+            cacheable = False
+
+        extracted_data = await self._structure_financial_data(metadata, document)
+        return metadata, extracted_data, cacheable
+
+    async def load_cached(self, document: DocumentResponse) -> Optional[Dict[str, Any]]:
+        """
+        Look up cached artifacts for a document's content. The result may hold
+        only ``parsed_content`` if extraction has not completed yet.
+        """
+        content_digest = await self._content_digest(document)
+        cached = await parse_cache.get(content_digest, self.fingerprint)
+        if not cached:
+            return None
+
+        extracted_data = cached.get("extracted_data")
+        if extracted_data is not None:
+            extracted_data = dict(extracted_data, document_id=document.id)
+
+        return {
+            "document_id": document.id,
+            "parsed_content": cached["parsed_content"],
+            "metadata": cached["metadata"],
+            "extracted_data": extracted_data,
+            "cache_hit": True
+        }
+
+    async def store_cached(self,
+                           document: DocumentResponse,
+                           parsed_content: str,
+                           metadata: Optional[Dict[str, Any]] = None,
+                           extracted_data: Optional[Dict[str, Any]] = None):
+        """Store parse artifacts for a document's content"""
+        content_digest = await self._content_digest(document)
+        await parse_cache.put(content_digest, self.fingerprint, parsed_content, metadata, extracted_data)
+
+    async def _content_digest(self, document: DocumentResponse) -> str:
+        """Digest of a document's file, hashing it once if the upload did not record one"""
+        if not document.content_digest:
+            document.content_digest = await asyncio.to_thread(self._hash_file, Path(document.file_path))
+        return document.content_digest
+
+    @staticmethod
+    def _hash_file(file_path: Path) -> str:
+        """SHA-256 of a file's contents, read in chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as source:
+            for chunk in iter(lambda: source.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def _extract_financial_metadata(self, content: str, document: DocumentResponse, fallback: bool = True) -> Dict[str, Any]:
         """Extract structured metadata from parsed content using LLM"""
         try:
             # Use OpenAI to structure the extracted content
@@ -114,52 +261,16 @@ class FinancialDocumentParser:
                 # Fallback to pattern matching if no LLM available
                 return await self._extract_with_patterns(content)
             
-            llm = OpenAI(api_key=settings.OPENAI_API_KEY, model="gpt-3.5-turbo")
+            llm = OpenAI(api_key=settings.OPENAI_API_KEY, model=EXTRACTION_MODEL)
             
-            prompt = f"""
-            Extract structured financial information from this document content and return it as JSON:
-
-            Document Content:
-            {content}
-
-            Extract and return a JSON object with this exact structure:
-            {{
-                "document_type": "invoice|receipt|estimate|bill",
-                "document_number": "string or null",
-                "issue_date": "YYYY-MM-DD or null",
-                "due_date": "YYYY-MM-DD or null",
-                "vendor": {{
-                    "name": "string",
-                    "address": "string or null",
-                    "phone": "string or null",
-                    "email": "string or null"
-                }},
-                "line_items": [
-                    {{
-                        "description": "string",
-                        "quantity": number,
-                        "unit_price": number,
-                        "total_price": number,
-                        "category": "materials|labor|equipment|supplies|other"
-                    }}
-                ],
-                "financial_summary": {{
-                    "subtotal": number,
-                    "tax_amount": number,
-                    "total_amount": number,
-                    "currency": "USD"
-                }},
-                "project_info": {{
-                    "project_name": "string or null",
-                    "work_order": "string or null",
-                    "location": "string or null"
-                }}
-            }}
-
-            Only return valid JSON. If information is not available, use null values.
-            """
+            prompt = EXTRACTION_PROMPT_TEMPLATE.format(content=content)
 
+            grant = await rate_governor.acquire("openai", EXTRACTION_MODEL, estimate_request_tokens([prompt]))
+            record_external_call("openai_extraction")
             response = await llm.acomplete(prompt)
+            usage_tokens = self._usage_tokens(response)
+            await grant.settle(usage_tokens)
+            record_tokens(usage_tokens or estimate_tokens(prompt) + estimate_tokens(response.text))
             extracted_json = response.text.strip()
             
             # Clean up the response to extract JSON
@@ -171,10 +282,21 @@ class FinancialDocumentParser:
             return json.loads(extracted_json)
 
         except Exception as e:
+            if not fallback:
+                raise
             print(f"Error extracting financial metadata: {e}")
             # Fallback to pattern matching
             return await self._extract_with_patterns(content)
 
+    @staticmethod
+    def _usage_tokens(response) -> Optional[int]:
+        """Total tokens reported by the provider for an LLM response, if available"""
+        raw = getattr(response, "raw", None)
+        usage = raw.get("usage") if isinstance(raw, dict) else getattr(raw, "usage", None)
+        if usage is None:
+            return None
+        return usage.get("total_tokens") if isinstance(usage, dict) else getattr(usage, "total_tokens", None)
+
     async def _extract_with_patterns(self, content: str) -> Dict[str, Any]:
         """Fallback extraction using regex patterns"""
         patterns = {
@@ -256,7 +378,10 @@ class FinancialDocumentParser:
                     Return only the category name.
                     """
                     
+                    grant = await rate_governor.acquire("openai", "gpt-3.5-turbo", estimate_request_tokens([prompt]))
+                    record_external_call("openai_categorization")
                     response = await llm.acomplete(prompt)
+                    await grant.settle(self._usage_tokens(response))
                     category_name = response.text.strip()
                     
                     try:
@@ -0,0 +1,520 @@
+"""
+Bounded ingestion executor for document processing jobs
+
+A fixed pool of worker tasks pulls job IDs from a queue. The durable copy of
+the queue is the ``processing_jobs`` table itself: every job is written as
+``pending`` before it is submitted, and on startup all pending jobs are
+re-enqueued. Each pipeline stage (parse, extract, embed, index) has its own
+concurrency limit, so a burst of uploads cannot fan out into an unbounded
+number of LlamaParse, LLM or embedding calls.
+
+Cancelling a queued job drops it from the queue. Cancelling a running job
+flags it, so the pipeline stops at its next stage boundary, and cancels its
+task, which aborts whatever provider request it is awaiting.
+
+Before a job runs, a worker claims it with a single conditional UPDATE that
+moves it from ``pending`` to ``processing`` and takes a lease
+(``lease_owner``/``lease_expires_at``), so several processes can share the
+table without running a job twice. A heartbeat task renews the leases with
+an UPDATE conditional on still holding them; if the process dies, the lease
+runs out and the job can be recovered by any other process. A worker that
+stalled past its lease finds the renewal refused and stops the job rather
+than taking it back from its new owner. A job running under another process's lease is never
+finalized from outside: cancelling it only records ``cancel_requested_at``,
+and the heartbeat of the owning process picks the request up and cancels
+the job here, so the worker that writes its chunks is also the one that
+removes them.
+
+In the API process the executor is fed by ``submit``. Standalone worker
+processes (``python -m app.worker``) start it with ``poll=True`` instead and
+claim pending jobs from the table as workers become free.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Callable, Awaitable, Iterable
+import logging
+
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.instrumentation import record_stage_wait
+from app.db.database import AsyncSessionLocal
+from app.db.models import ProcessingJob
+from app.services.progress_writer import job_progress_writer
+from app.services.rate_governor import set_bulk_priority
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("parse", "extract", "embed", "index")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the ingestion queue is too deep to accept more work"""
+
+    def __init__(self, queue_depth: int, retry_after: int):
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        super().__init__(f"Ingestion queue is full ({queue_depth} jobs waiting)")
+
+
+class JobCancelledError(asyncio.CancelledError):
+    """Raised inside a job at a stage boundary after it was cancelled"""
+
+
+class IngestionExecutor:
+    """Worker pool with per-stage concurrency limits and a bounded queue"""
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 stage_limits: Optional[Dict[str, int]] = None,
+                 max_queue_depth: Optional[int] = None):
+        self.worker_count = workers or settings.INGEST_WORKERS
+        self.stage_limits = stage_limits or {
+            "parse": settings.INGEST_PARSE_CONCURRENCY,
+            "extract": settings.INGEST_EXTRACT_CONCURRENCY,
+            "embed": settings.INGEST_EMBED_CONCURRENCY,
+            "index": settings.INGEST_INDEX_CONCURRENCY,
+        }
+        self.max_queue_depth = max_queue_depth or settings.INGEST_MAX_QUEUE_DEPTH
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Job writes from this process only land while it holds the job's lease
+        job_progress_writer.lease_owner = self.worker_id
+
+        self._stage_semaphores = {stage: asyncio.Semaphore(max(1, limit)) for stage, limit in self.stage_limits.items()}
+        self._stage_in_flight = {stage: 0 for stage in self.stage_limits}
+        self._stage_waiting = {stage: 0 for stage in self.stage_limits}
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: set = set()
+        self._claimed: set = set()
+        self.running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: set = set()
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._slot_free: Optional[asyncio.Event] = None
+        self._handler: Optional[Callable[[str], Awaitable[None]]] = None
+        self.completed_count = 0
+        self.cancelled_count = 0
+        self.claimed_count = 0
+        self.lost_claims = 0
+        self.lost_leases = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queued)
+
+    @property
+    def polling(self) -> bool:
+        return self._poller is not None
+
+    async def start(self, handler: Callable[[str], Awaitable[None]], poll: bool = False):
+        """
+        Start the worker pool. With ``poll`` the workers claim pending jobs
+        from the database as they become free; otherwise all pending jobs are
+        re-enqueued now and further jobs arrive through ``submit``.
+        """
+        if self.started:
+            return
+
+        self._handler = handler
+        self._queue = asyncio.Queue()
+
+        pending = []
+        if not poll:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(ProcessingJob.id)
+                    .where(ProcessingJob.status == "pending", ProcessingJob.duplicate_of.is_(None))
+                    .order_by(ProcessingJob.created_at)
+                )
+                pending = result.scalars().all()
+
+        for job_id in pending:
+            self._enqueue(job_id)
+
+        self._workers = [
+            asyncio.create_task(self._worker(index), name=f"ingestion-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+        self._heartbeat = asyncio.create_task(self._renew_leases(), name="ingestion-heartbeat")
+        if poll:
+            self._slot_free = asyncio.Event()
+            self._poller = asyncio.create_task(self._poll_pending(), name="ingestion-poller")
+            logger.info(f"Ingestion worker {self.worker_id} started with {self.worker_count} workers, claiming from the database")
+        else:
+            logger.info(f"Ingestion executor started with {self.worker_count} workers, {len(pending)} pending jobs")
+
+    async def stop(self):
+        """
+        Stop the worker pool. Jobs this process had claimed go back to
+        pending so another worker can resume them straight away.
+        """
+        claimed = list(self._claimed | set(self.running))
+        tasks = [task for task in [self._poller, *self._workers, self._heartbeat, *self.running.values()] if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+        self._poller = None
+
+        self._claimed.clear()
+        self._queued.clear()
+        if claimed:
+            try:
+                # Let progress from the interrupted jobs land before releasing them
+                await job_progress_writer.flush_soon()
+                await self._release(claimed)
+            except Exception as e:
+                logger.error(f"Failed to release claimed jobs on shutdown: {e}")
+        logger.info("Ingestion executor stopped")
+
+    def is_saturated(self, incoming: int = 1) -> bool:
+        """Whether accepting ``incoming`` more jobs would exceed the queue limit"""
+        return self.queue_depth + incoming > self.max_queue_depth
+
+    async def check_capacity(self, incoming: int = 1):
+        """
+        Raise QueueFullError if the queue cannot take ``incoming`` more jobs.
+
+        When this process does not run the workers (API-only mode) the queue
+        is the set of pending rows that worker processes have yet to claim.
+        """
+        queue_depth = self.queue_depth
+        if not self.started or self.polling:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(func.count()).select_from(ProcessingJob).where(ProcessingJob.status == "pending")
+                )
+                queue_depth = result.scalar_one()
+
+        if queue_depth + incoming > self.max_queue_depth:
+            raise QueueFullError(queue_depth, settings.INGEST_RETRY_AFTER_SECONDS)
+
+    def submit(self, job_id: str):
+        """Queue a job that has already been written as pending"""
+        self._enqueue(job_id)
+
+    def submit_many(self, job_ids: Iterable[str]):
+        """Queue several pending jobs"""
+        for job_id in job_ids:
+            self._enqueue(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job owned by this executor.
+
+        Returns "queued" if the job was removed before it started, "running"
+        if a running job was signalled, or None if the job is not here.
+        """
+        if job_id in self._queued:
+            # The worker that dequeues it will skip it
+            self._queued.discard(job_id)
+            self._claimed.discard(job_id)
+            self.cancelled_count += 1
+            return "queued"
+
+        task = self.running.get(job_id)
+        if task:
+            self._cancel_requested.add(job_id)
+            task.cancel()
+            self.cancelled_count += 1
+            return "running"
+
+        return None
+
+    def mark_cancelled(self, job_id: str):
+        """Flag a running job so it stops at its next stage boundary, without interrupting it"""
+        if job_id in self.running:
+            self._cancel_requested.add(job_id)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        """Whether cancellation was requested for a running job"""
+        return job_id in self._cancel_requested
+
+    def raise_if_cancelled(self, job_id: str):
+        """Stage boundary check: stop the job if it was cancelled"""
+        if job_id in self._cancel_requested:
+            raise JobCancelledError(f"Job {job_id} was cancelled")
+
+    def _enqueue(self, job_id: str):
+        if job_id in self._queued or job_id in self.running:
+            return
+        if self._queue is None:
+            # Not started yet: the job stays pending and is picked up on start
+            return
+        self._queued.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Hold one of the concurrency slots for a pipeline stage"""
+        semaphore = self._stage_semaphores[name]
+        self._stage_waiting[name] += 1
+        waiting_since = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            self._stage_waiting[name] -= 1
+            record_stage_wait((time.perf_counter() - waiting_since) * 1000)
+        self._stage_in_flight[name] += 1
+        try:
+            yield
+        finally:
+            self._stage_in_flight[name] -= 1
+            semaphore.release()
+
+    async def _worker(self, index: int):
+        # Jobs started from here inherit bulk priority for LLM rate limiting
+        set_bulk_priority()
+        while True:
+            job_id = await self._queue.get()
+            if job_id not in self._queued:
+                # Removed from the queue after it was enqueued
+                self._queue.task_done()
+                continue
+            self._queued.discard(job_id)
+
+            if job_id in self._claimed:
+                self._claimed.discard(job_id)
+            elif not await self._claim_one(job_id):
+                # Cancelled, finished or claimed by another worker meanwhile
+                self._queue.task_done()
+                continue
+
+            task = asyncio.create_task(self._handler(job_id), name=f"ingestion-job-{job_id}")
+            self.running[job_id] = task
+            try:
+                # wait() does not propagate the job's own cancellation or errors
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self.running.pop(job_id, None)
+                self._cancel_requested.discard(job_id)
+                self.completed_count += 1
+                self._queue.task_done()
+                if self._slot_free:
+                    self._slot_free.set()
+
+            if task.cancelled():
+                logger.info(f"Ingestion job {job_id} was cancelled")
+            elif task.exception():
+                logger.error(f"Ingestion job {job_id} raised: {task.exception()}")
+
+    async def claim(self, job_ids: Optional[List[str]] = None, limit: int = 1) -> List[str]:
+        """
+        Atomically move up to ``limit`` pending jobs (oldest first, optionally
+        restricted to ``job_ids``) to processing under this worker's lease.
+        Returns the IDs this worker won; a job can only be won once.
+        """
+        # Duplicates wait for the job processing their content (see resolve_duplicate_jobs)
+        candidates = select(ProcessingJob.id).where(
+            ProcessingJob.status == "pending",
+            ProcessingJob.duplicate_of.is_(None)
+        )
+        if job_ids:
+            candidates = candidates.where(ProcessingJob.id.in_(job_ids))
+        candidates = candidates.order_by(ProcessingJob.created_at).limit(limit)
+
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    update(ProcessingJob)
+                    .where(ProcessingJob.id.in_(candidates.scalar_subquery()))
+                    .where(ProcessingJob.status == "pending")
+                    .values(
+                        status="processing",
+                        current_step="Claimed by worker",
+                        lease_owner=self.worker_id,
+                        lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                        heartbeat_at=now
+                    )
+                    .returning(ProcessingJob.id)
+                    .execution_options(synchronize_session=False)
+                )
+                claimed = list(result.scalars().all())
+                await session.commit()
+            except OperationalError as e:
+                await session.rollback()
+                if "locked" not in str(e):
+                    raise
+                # Another process holds the write lock; try again on the next round
+                logger.debug(f"Database locked while claiming jobs: {e}")
+                return []
+
+        self.claimed_count += len(claimed)
+        return claimed
+
+    async def _claim_one(self, job_id: str) -> bool:
+        try:
+            claimed = await self.claim([job_id])
+        except Exception as e:
+            logger.error(f"Failed to claim ingestion job {job_id}: {e}")
+            claimed = []
+        if not claimed:
+            self.lost_claims += 1
+        return bool(claimed)
+
+    async def _release(self, job_ids: List[str]):
+        """Hand claimed jobs that this worker did not finish back to the queue"""
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    update(ProcessingJob)
+                    .where(ProcessingJob.id.in_(job_ids))
+                    .where(ProcessingJob.status == "processing")
+                    .where(ProcessingJob.lease_owner == self.worker_id)
+                    .values(
+                        status="pending",
+                        current_step="Released by stopping worker",
+                        lease_owner=None,
+                        lease_expires_at=None
+                    )
+                )
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        logger.info(f"Released {len(job_ids)} claimed jobs")
+
+    async def _poll_pending(self):
+        """Claim pending jobs from the database whenever workers are free"""
+        while True:
+            free = self.worker_count - len(self.running) - self.queue_depth
+            if free > 0:
+                try:
+                    claimed = await self.claim(limit=free)
+                except Exception as e:
+                    logger.error(f"Failed to claim pending jobs: {e}")
+                    claimed = []
+                for job_id in claimed:
+                    self._claimed.add(job_id)
+                    self._enqueue(job_id)
+
+            # Check again when a job finishes, or after the poll interval
+            self._slot_free.clear()
+            try:
+                await asyncio.wait_for(self._slot_free.wait(), settings.INGEST_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _renew(self, job_ids: List[str]) -> List[str]:
+        """
+        Extend this worker's lease on jobs it still holds. Returns the jobs
+        renewed; a job missing from the result was finished, cancelled, or
+        recovered and claimed by another worker after the lease ran out.
+        """
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    update(ProcessingJob)
+                    .where(ProcessingJob.id.in_(job_ids))
+                    .where(ProcessingJob.lease_owner == self.worker_id)
+                    .where(ProcessingJob.status == "processing")
+                    .values(
+                        lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                        heartbeat_at=now
+                    )
+                    .returning(ProcessingJob.id)
+                    .execution_options(synchronize_session=False)
+                )
+                renewed = list(result.scalars().all())
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        return renewed
+
+    def _abandon(self, job_id: str):
+        """Stop work on a job whose lease this worker lost, leaving the job to its new owner"""
+        task = self.running.get(job_id)
+        if task and task.done():
+            return
+        self._queued.discard(job_id)
+        self._claimed.discard(job_id)
+        if task:
+            # Not a user cancellation: the job is neither finalized nor cleaned up here
+            task.cancel()
+        self.lost_leases += 1
+        logger.warning(f"Lost the lease on ingestion job {job_id}, stopping it here")
+
+    async def _renew_leases(self):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+            owned = [*self.running, *self._claimed]
+            if not owned:
+                continue
+
+            # Cancellation requested by another process (the API in API-only
+            # mode). Claimed jobs that have not started see the request when
+            # they load the job, so only running ones are cancelled here.
+            running = [job_id for job_id in owned if job_id in self.running]
+            try:
+                renewed = set(await self._renew(owned))
+                cancelled = []
+                if running:
+                    async with AsyncSessionLocal() as session:
+                        result = await session.execute(
+                            select(ProcessingJob.id)
+                            .where(ProcessingJob.id.in_(running))
+                            .where(or_(
+                                ProcessingJob.cancel_requested_at.isnot(None),
+                                ProcessingJob.status == "cancelled"
+                            ))
+                        )
+                        cancelled = result.scalars().all()
+            except Exception as e:
+                logger.error(f"Failed to renew job leases: {e}")
+                continue
+            for job_id in cancelled:
+                if self.cancel(job_id):
+                    logger.info(f"Ingestion job {job_id} was cancelled by another process")
+            for job_id in owned:
+                if job_id not in renewed and job_id not in cancelled and (
+                        job_id in self._claimed or job_id in self.running):
+                    self._abandon(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight counts and limits"""
+        return {
+            "started": self.started,
+            "polling": self.polling,
+            "worker_id": self.worker_id,
+            "workers": self.worker_count,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "running_jobs": len(self.running),
+            "completed_jobs": self.completed_count,
+            "cancelled_jobs": self.cancelled_count,
+            "claimed_jobs": self.claimed_count,
+            "lost_claims": self.lost_claims,
+            "lost_leases": self.lost_leases,
+            "stages": {
+                stage: {
+                    "limit": self.stage_limits[stage],
+                    "in_flight": self._stage_in_flight[stage],
+                    "waiting": self._stage_waiting[stage]
+                }
+                for stage in self.stage_limits
+            }
+        }
+
+
+# Global ingestion executor instance
+ingestion_executor = IngestionExecutor()
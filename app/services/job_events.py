@@ -0,0 +1,163 @@
+"""
+In-process publisher for job progress events
+
+``update_job_progress`` and ``complete_job`` publish every state change here
+after it is written, and API clients subscribe to one job, one batch or all
+jobs. Subscribers are served entirely from memory: the publisher keeps the
+latest event per job, and a slow subscriber only ever holds the newest
+pending event for each job rather than an unbounded backlog.
+"""
+
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "processing")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "dead_letter")
+
+
+class JobSubscription:
+    """A subscriber's view of the event stream, coalesced per job"""
+
+    def __init__(self, job_id: Optional[str] = None, batch_id: Optional[str] = None):
+        self.job_id = job_id
+        self.batch_id = batch_id
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        """Whether an event belongs to this subscription"""
+        if self.job_id and event["job_id"] != self.job_id:
+            return False
+        if self.batch_id and event.get("batch_id") != self.batch_id:
+            return False
+        return True
+
+    def push(self, event: Dict[str, Any]):
+        """Queue an event, replacing any undelivered event for the same job"""
+        self._pending.pop(event["job_id"], None)
+        self._pending[event["job_id"]] = event
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next event; returns None on timeout"""
+        if not self._pending:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        _, event = self._pending.popitem(last=False)
+        return event
+
+
+class JobEventPublisher:
+    """Fan-out of job progress events to in-process subscribers"""
+
+    def __init__(self, max_tracked_jobs: int = 5000):
+        self.max_tracked_jobs = max_tracked_jobs
+        self._latest: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._batches: Dict[str, Optional[str]] = {}
+        self._subscribers: Set[JobSubscription] = set()
+        self.published_count = 0
+
+    def register_job(self, job_id: str, batch_id: Optional[str] = None):
+        """Remember which batch a job belongs to so its events can be routed"""
+        self._batches[job_id] = batch_id
+
+    def publish(self, job_id: str, status: str, progress: float, current_step: Optional[str],
+                stage: Optional[str] = None, error_message: Optional[str] = None,
+                result: Optional[Dict[str, Any]] = None):
+        """Record the job's latest state and deliver it to matching subscribers"""
+        previous = self._latest.pop(job_id, {})
+        event = {
+            "job_id": job_id,
+            "batch_id": self._batches.get(job_id),
+            "status": status,
+            "progress": progress,
+            "current_step": current_step,
+            "current_stage": stage or previous.get("current_stage"),
+            "error_message": error_message,
+            "result": result,
+            "completed": status in TERMINAL_STATUSES,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+        self._latest[job_id] = event
+        while len(self._latest) > self.max_tracked_jobs:
+            evicted, _ = self._latest.popitem(last=False)
+            self._batches.pop(evicted, None)
+
+        self.published_count += 1
+        for subscription in self._subscribers:
+            if subscription.matches(event):
+                subscription.push(event)
+
+    def seed(self, job: Dict[str, Any]):
+        """Start tracking a job from its stored state without notifying subscribers"""
+        if job["id"] in self._latest:
+            return
+        self._batches[job["id"]] = job.get("batch_id")
+        self._latest[job["id"]] = {
+            "job_id": job["id"],
+            "batch_id": job.get("batch_id"),
+            "status": job["status"],
+            "progress": job["progress"],
+            "current_step": job.get("current_step"),
+            "current_stage": job.get("current_stage"),
+            "error_message": job.get("error_message"),
+            "result": job.get("result"),
+            "completed": job["status"] in TERMINAL_STATUSES,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def latest(self, job_id: Optional[str] = None, batch_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent event for every tracked job matching the filter"""
+        if job_id:
+            event = self._latest.get(job_id)
+            return [event] if event else []
+        return [
+            event for event in self._latest.values()
+            if batch_id is None or event.get("batch_id") == batch_id
+        ]
+
+    def subscribe(self, job_id: Optional[str] = None, batch_id: Optional[str] = None,
+                  replay: bool = True) -> JobSubscription:
+        """
+        Subscribe to one job, one batch or (with no filter) all jobs.
+
+        With ``replay`` the current state of matching jobs is queued first,
+        so a late subscriber does not miss progress that already happened.
+        """
+        subscription = JobSubscription(job_id=job_id, batch_id=batch_id)
+        if replay:
+            for event in self.latest(job_id=job_id, batch_id=batch_id):
+                subscription.push(event)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription):
+        """Stop delivering events to a subscription"""
+        subscription.closed = True
+        self._subscribers.discard(subscription)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Subscriber and event counters"""
+        return {
+            "subscribers": len(self._subscribers),
+            "tracked_jobs": len(self._latest),
+            "published_events": self.published_count
+        }
+
+
+# Global job event publisher instance
+job_events = JobEventPublisher()
@@ -0,0 +1,217 @@
+"""
+Job metrics computed with aggregate queries
+
+Counts per status and per stage come from GROUP BY over indexed columns,
+throughput from a range scan on the indexed ``completed_at`` column, and
+stage duration percentiles from the ``job_stage_metrics`` histogram, which
+the progress writer updates incrementally as stages finish. The histogram is
+kept per JOB_METRICS_PERIOD_SECONDS period so it can be summed over a time
+window. None of these load job rows, so the cost does not grow with job
+history.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from sqlalchemy import select, func
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import ProcessingJob, JobStageMetric
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the stage duration buckets, in milliseconds
+STAGE_BUCKETS_MS = (
+    50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000,
+    60_000, 120_000, 300_000, 600_000, 1_800_000, 2_147_483_647
+)
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_for(duration_ms: float) -> int:
+    """Histogram bucket holding a duration"""
+    for bound in STAGE_BUCKETS_MS:
+        if duration_ms <= bound:
+            return bound
+    return STAGE_BUCKETS_MS[-1]
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def period_for(moment: datetime) -> datetime:
+    """Start of the histogram period containing ``moment`` (naive UTC)"""
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % settings.JOB_METRICS_PERIOD_SECONDS)
+
+
+def percentile_from_buckets(buckets: List[Tuple[int, int]], percentile: float) -> Optional[float]:
+    """
+    Estimate a percentile from ``(bucket_ms, count)`` pairs sorted by bucket,
+    interpolating linearly inside the bucket that contains it.
+    """
+    total = sum(count for _, count in buckets)
+    if total == 0:
+        return None
+
+    rank = percentile / 100 * total
+    seen = 0
+    lower = 0
+    for bound, count in buckets:
+        if count and seen + count >= rank:
+            if bound == STAGE_BUCKETS_MS[-1]:
+                # Open-ended overflow bucket: report its lower edge
+                return float(lower)
+            return lower + (bound - lower) * (rank - seen) / count
+        seen += count
+        lower = bound
+    return float(lower)
+
+
+class JobMetricsService:
+    """Aggregate statistics over processing jobs"""
+
+    async def get_status_counts(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ProcessingJob.status, func.count())
+                .group_by(ProcessingJob.status)
+            )
+            return dict(result.all())
+
+    async def get_stage_counts(self) -> Dict[str, int]:
+        """Number of processing jobs currently in each pipeline stage"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ProcessingJob.current_stage, func.count())
+                .where(ProcessingJob.status == "processing")
+                .group_by(ProcessingJob.current_stage)
+            )
+            return {stage or "preparing": count for stage, count in result.all()}
+
+    async def get_throughput(self, window_minutes: int = 60) -> Dict[str, Any]:
+        """Jobs finished in the last ``window_minutes``, by outcome"""
+        since = datetime.utcnow() - timedelta(minutes=window_minutes)
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ProcessingJob.status, func.count())
+                .where(ProcessingJob.completed_at >= since)
+                .group_by(ProcessingJob.status)
+            )
+            finished = dict(result.all())
+
+        completed = finished.get("completed", 0)
+        return {
+            "window_minutes": window_minutes,
+            "finished": finished,
+            "completed": completed,
+            "completed_per_minute": round(completed / window_minutes, 3) if window_minutes else None
+        }
+
+    async def get_stage_histograms(self,
+                                   window_minutes: Optional[int] = None,
+                                   stage: Optional[str] = None) -> Dict[str, List[Tuple[int, int, float]]]:
+        """
+        ``(bucket_ms, count, total_ms)`` rows per stage, sorted by bucket,
+        summed over the periods that overlap the last ``window_minutes``
+        (all history if None)
+        """
+        query = (
+            select(
+                JobStageMetric.stage,
+                JobStageMetric.bucket_ms,
+                func.sum(JobStageMetric.count),
+                func.sum(JobStageMetric.total_ms)
+            )
+            .group_by(JobStageMetric.stage, JobStageMetric.bucket_ms)
+            .order_by(JobStageMetric.stage, JobStageMetric.bucket_ms)
+        )
+        if window_minutes:
+            query = query.where(
+                JobStageMetric.period_start >= period_for(datetime.utcnow() - timedelta(minutes=window_minutes))
+            )
+        if stage:
+            query = query.where(JobStageMetric.stage == stage)
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(query)
+            histograms: Dict[str, List[Tuple[int, int, float]]] = {}
+            for stage, bucket_ms, count, total_ms in result.all():
+                histograms.setdefault(stage, []).append((bucket_ms, count, total_ms))
+            return histograms
+
+    async def get_stage_durations(self, window_minutes: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Count, mean and p50/p95/p99 duration per stage"""
+        durations = {}
+        for stage, rows in (await self.get_stage_histograms(window_minutes)).items():
+            count = sum(row[1] for row in rows)
+            total_ms = sum(row[2] for row in rows)
+            buckets = [(bucket_ms, bucket_count) for bucket_ms, bucket_count, _ in rows]
+            durations[stage] = {
+                "count": count,
+                "mean_ms": round(total_ms / count, 1) if count else None,
+                **{
+                    f"p{percentile}_ms": self._round(percentile_from_buckets(buckets, percentile))
+                    for percentile in PERCENTILES
+                }
+            }
+        return durations
+
+    async def get_metrics(self, window_minutes: int = 60) -> Dict[str, Any]:
+        """Everything /jobs/stats reports"""
+        by_status = await self.get_status_counts()
+        return {
+            "total_jobs": sum(by_status.values()),
+            "by_status": by_status,
+            "by_stage": await self.get_stage_counts(),
+            "throughput": await self.get_throughput(window_minutes),
+            "stage_durations": await self.get_stage_durations(window_minutes),
+            "last_updated": datetime.utcnow().isoformat()
+        }
+
+    async def get_latency_histograms(self,
+                                     window_minutes: int = 60,
+                                     stage: Optional[str] = None) -> Dict[str, Any]:
+        """Per-stage latency histograms with cumulative counts, Prometheus style"""
+        stages = {}
+        for stage_name, rows in (await self.get_stage_histograms(window_minutes, stage)).items():
+            counts = {bucket_ms: count for bucket_ms, count, _ in rows}
+            cumulative = 0
+            buckets = []
+            for bound in STAGE_BUCKETS_MS:
+                cumulative += counts.get(bound, 0)
+                buckets.append({
+                    "le_ms": "+Inf" if bound == STAGE_BUCKETS_MS[-1] else bound,
+                    "count": counts.get(bound, 0),
+                    "cumulative": cumulative
+                })
+            total_ms = sum(row[2] for row in rows)
+            stages[stage_name] = {
+                "count": cumulative,
+                "sum_ms": round(total_ms, 1),
+                "buckets": buckets,
+                **{
+                    f"p{percentile}_ms": self._round(percentile_from_buckets(
+                        [(bucket_ms, count) for bucket_ms, count, _ in rows], percentile
+                    ))
+                    for percentile in PERCENTILES
+                }
+            }
+
+        return {
+            "window_minutes": window_minutes,
+            "period_seconds": settings.JOB_METRICS_PERIOD_SECONDS,
+            "stages": stages
+        }
+
+    @staticmethod
+    def _round(value: Optional[float]) -> Optional[float]:
+        return round(value, 1) if value is not None else None
+
+
+# Global job metrics service instance
+job_metrics = JobMetricsService()
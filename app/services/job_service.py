@@ -1,25 +1,66 @@
 """
-Background job service using APScheduler for document processing
+Background job service for document processing
+
+Jobs are persisted in the processing_jobs table and executed by the bounded
+ingestion executor; APScheduler remains available for periodic maintenance.
+
+The service runs in one of three roles (``settings.INGEST_MODE``):
+
+- ``inline``: the API process also runs the ingestion workers
+- ``api``: the API process only creates jobs; worker processes claim them,
+  and their progress is relayed to event subscribers from the database
+- ``worker``: a standalone worker process (``python -m app.worker``)
 """
 
 import asyncio
+import json
 import uuid
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pathlib import Path
 import logging
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func, or_, and_, tuple_, type_coerce, String
 
 from app.db.database import AsyncSessionLocal, SYNC_DATABASE_URL
-from app.db.models import ProcessingJob, DocumentMetadata
+from app.core.config import settings
+from app.core.instrumentation import track_external_calls, track_stage_timings, time_stage, ExternalCallCounter
+from app.core.retry import with_retries, RetryExhaustedError
+from app.db.models import ProcessingJob, DocumentMetadata, DocumentBlob
 from app.models.document import DocumentResponse
+from app.services.storage_service import blob_store
+from app.services.document_catalog import document_catalog, encode_cursor, decode_cursor
+from app.services.container import service_container
+from app.services.ingestion_executor import ingestion_executor
+from app.services.job_events import job_events, ACTIVE_STATUSES
+from app.services.progress_writer import job_progress_writer
+from app.services.rate_governor import rate_governor
 
 logger = logging.getLogger(__name__)
 
+# Columns returned by job listings in "summary" mode: everything a job list
+# shows, without the result, error and timing JSON
+JOB_SUMMARY_COLUMNS = (
+    ProcessingJob.id,
+    ProcessingJob.document_id,
+    ProcessingJob.batch_id,
+    ProcessingJob.filename,
+    ProcessingJob.file_size,
+    ProcessingJob.status,
+    ProcessingJob.progress,
+    ProcessingJob.current_step,
+    ProcessingJob.current_stage,
+    ProcessingJob.failed_stage,
+    ProcessingJob.created_at,
+    ProcessingJob.started_at,
+    ProcessingJob.completed_at,
+)
+
+# created_at exactly as stored, so cursors compare against the indexed text
+# (rows defaulted by SQLite have no fractional seconds)
+JOB_CURSOR_KEY = type_coerce(ProcessingJob.created_at, String)
+
 # Global scheduler instance (separate from service class)
 scheduler = None
 
@@ -29,6 +70,9 @@ async def initialize_global_scheduler():
     if scheduler is not None and scheduler.running:
         return scheduler
     
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+    
     try:
         # Configure job store to use SQLite
         jobstores = {
@@ -62,53 +106,84 @@ async def shutdown_global_scheduler():
         scheduler = None
 
 
-async def update_job_progress(job_id: str, progress: float, current_step: str, status: str = "processing"):
-    """Update job progress - standalone function for serialization"""
-    async with AsyncSessionLocal() as session:
-        try:
-            await session.execute(
-                update(ProcessingJob)
-                .where(ProcessingJob.id == job_id)
-                .values(
-                    progress=progress,
-                    current_step=current_step,
-                    status=status,
-                    started_at=datetime.utcnow() if status == "processing" else None
-                )
-            )
-            await session.commit()
-            logger.debug(f"Updated job {job_id}: {progress}% - {current_step}")
-            
-        except Exception as e:
-            await session.rollback()
-            logger.error(f"Failed to update job progress: {e}")
+async def update_job_progress(job_id: str, progress: float, current_step: str, status: str = "processing",
+                              stage: Optional[str] = None):
+    """Record job progress; the progress writer persists it in its next batch"""
+    values = {
+        "progress": progress,
+        "current_step": current_step,
+        "status": status
+    }
+    if stage:
+        values["current_stage"] = stage
+    
+    job_progress_writer.record(job_id, **values)
+    logger.debug(f"Updated job {job_id}: {progress}% - {current_step}")
+    
+    job_events.publish(job_id, status, progress, current_step, stage=stage)
 
 
-async def complete_job(job_id: str, success: bool, result: Dict[str, Any] = None, error_message: str = None):
-    """Mark job as completed or failed - standalone function for serialization"""
-    async with AsyncSessionLocal() as session:
-        try:
-            status = "completed" if success else "failed"
-            progress = 100.0 if success else 0.0
-            
-            await session.execute(
-                update(ProcessingJob)
-                .where(ProcessingJob.id == job_id)
-                .values(
-                    status=status,
-                    progress=progress,
-                    completed_at=datetime.utcnow(),
-                    result=result,
-                    error_message=error_message,
-                    current_step="Completed" if success else "Failed"
-                )
-            )
-            await session.commit()
-            logger.info(f"Job {job_id} {'completed' if success else 'failed'}")
-            
-        except Exception as e:
-            await session.rollback()
-            logger.error(f"Failed to complete job: {e}")
+async def complete_job(job_id: str, success: bool, result: Dict[str, Any] = None, error_message: str = None,
+                       external_calls: Dict[str, int] = None) -> bool:
+    """
+    Mark job as completed or failed, waiting until the terminal state is committed.
+    Returns False if it was not recorded, because the job had already finished
+    (been cancelled, usually) or the write failed.
+    """
+    status = "completed" if success else "failed"
+    progress = 100.0 if success else 0.0
+    
+    try:
+        recorded = await job_progress_writer.write_now(
+            job_id,
+            status=status,
+            progress=progress,
+            completed_at=datetime.utcnow(),
+            result=result,
+            error_message=error_message,
+            current_step="Completed" if success else "Failed",
+            external_calls=external_calls
+        )
+        if not recorded:
+            logger.info(f"Job {job_id} had already finished, not marking it {status}")
+            return False
+        logger.info(f"Job {job_id} {'completed' if success else 'failed'}")
+        
+        job_events.publish(
+            job_id, status, progress, "Completed" if success else "Failed",
+            error_message=error_message, result=result
+        )
+        return True
+        
+    except Exception as e:
+        logger.error(f"Failed to complete job: {e}")
+        return False
+
+
+async def dead_letter_job(job_id: str, stage: str, error_message: str, external_calls: Dict[str, int] = None):
+    """Park a job whose stage exhausted its retries so it can be re-driven later"""
+    try:
+        recorded = await job_progress_writer.write_now(
+            job_id,
+            status="dead_letter",
+            failed_stage=stage,
+            completed_at=datetime.utcnow(),
+            error_message=error_message,
+            current_step=f"Retries exhausted at {stage}",
+            external_calls=external_calls
+        )
+        if not recorded:
+            logger.info(f"Job {job_id} had already finished, not dead-lettering it")
+            return
+        
+        latest = job_events.latest(job_id=job_id)
+        job_events.publish(
+            job_id, "dead_letter", latest[0]["progress"] if latest else 0.0,
+            f"Retries exhausted at {stage}", stage=stage, error_message=error_message
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to dead-letter job: {e}")
 
 
 async def store_financial_metadata(document_id: str, financial_data: Dict[str, Any]):
@@ -170,8 +245,289 @@ async def store_financial_metadata(document_id: str, financial_data: Dict[str, A
             logger.error(f"Failed to store financial metadata: {e}")
 
 
+async def copy_financial_metadata(source_document_id: str, document: DocumentResponse) -> bool:
+    """Copy stored financial metadata from an identical document - standalone function"""
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                select(DocumentMetadata).where(DocumentMetadata.document_id == source_document_id)
+            )
+            source = result.scalars().first()
+            if not source:
+                return False
+            
+            columns = {
+                column.name: getattr(source, column.name)
+                for column in DocumentMetadata.__table__.columns
+                if column.name not in ("id", "document_id", "filename", "created_at", "updated_at")
+            }
+            session.add(DocumentMetadata(
+                id=str(uuid.uuid4()),
+                document_id=document.id,
+                filename=document.filename,
+                **columns
+            ))
+            await session.commit()
+            return True
+            
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to copy financial metadata from {source_document_id}: {e}")
+            return False
+
+
+async def link_duplicate_document(job_id: str, source_document_id: str, document: DocumentResponse, document_service) -> bool:
+    """
+    Complete a job by linking to the artifacts of an already processed document
+    with identical content, instead of parsing, extracting and embedding again.
+    Returns False if the source artifacts are gone and full processing is needed.
+    """
+    try:
+        node_count = await document_service.clone_document_vectors(source_document_id, document)
+        if node_count == 0:
+            logger.info(f"No vectors found for source document {source_document_id}, processing job {job_id} from scratch")
+            return False
+        
+        financial_data_extracted = await copy_financial_metadata(source_document_id, document)
+        
+        job_progress_writer.record(
+            job_id,
+            started_at=datetime.utcnow(),
+            financial_data_extracted=financial_data_extracted,
+            indexed_in_chroma=True
+        )
+        
+        result = {
+            "document_id": document.id,
+            "filename": document.filename,
+            "financial_data_extracted": financial_data_extracted,
+            "indexed": True,
+            "deduplicated_from": source_document_id,
+            "nodes_linked": node_count
+        }
+        await document_catalog.set_index_state(document.id, "indexed")
+        if not await complete_job(job_id, True, result, external_calls={"total": 0}):
+            await discard_if_cancelled(job_id)
+            return True
+        logger.info(f"Job {job_id} linked to existing artifacts of document {source_document_id}")
+        return True
+        
+    except Exception as e:
+        logger.warning(f"Failed to link job {job_id} to document {source_document_id}: {e}")
+        return False
+
+
 async def process_document_job(job_id: str):
-    """Standalone job function for processing documents - can be serialized by APScheduler"""
+    """Standalone job function for processing documents, run by the ingestion executor"""
+    def on_stage(stage: str, wall_ms: float):
+        # Feed the latency histogram and keep the job's timing record current
+        job_progress_writer.observe_stage(stage, wall_ms)
+        job_progress_writer.record(job_id, stage_timings=timings.to_dict())
+    
+    with track_external_calls() as external_calls, track_stage_timings(on_stage) as timings:
+        try:
+            await _run_document_pipeline(job_id, external_calls)
+            await resolve_duplicate_jobs(job_id)
+        except asyncio.CancelledError:
+            if not ingestion_executor.is_cancel_requested(job_id):
+                # Shutdown rather than a user cancellation: leave the job resumable
+                raise
+            logger.info(f"Document processing job {job_id} cancelled")
+            if not await finalize_cancelled_jobs([job_id], external_calls=external_calls.to_dict(), remove_vectors=True):
+                # Already marked cancelled elsewhere while this run may still have been writing chunks
+                await discard_if_cancelled(job_id)
+
+
+async def finalize_cancelled_jobs(job_ids: List[str], external_calls: Dict[str, int] = None,
+                                  remove_vectors: bool = False) -> List[str]:
+    """
+    Mark jobs cancelled, durably, and drop any chunks they already indexed.
+    
+    The update is a compare-and-set: it only moves jobs that are pending, or
+    processing with no live lease held by another process (those are asked
+    to stop with ``request_job_cancellation`` instead). Returns the jobs it
+    cancelled; only their chunks are removed.
+    """
+    if not job_ids:
+        return []
+    
+    now = datetime.utcnow()
+    values = {"status": "cancelled", "completed_at": now, "current_step": "Cancelled"}
+    if external_calls is not None:
+        values["external_calls"] = external_calls
+    
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                update(ProcessingJob)
+                .where(ProcessingJob.id.in_(job_ids))
+                .where(or_(
+                    ProcessingJob.status == "pending",
+                    and_(
+                        ProcessingJob.status == "processing",
+                        or_(
+                            ProcessingJob.lease_owner == ingestion_executor.worker_id,
+                            ProcessingJob.lease_expires_at.is_(None),
+                            ProcessingJob.lease_expires_at < now
+                        )
+                    )
+                ))
+                .values(**values)
+                .returning(ProcessingJob.id, ProcessingJob.document_id)
+                .execution_options(synchronize_session=False)
+            )
+            document_ids = dict(result.all())
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to mark jobs cancelled: {e}")
+            return []
+    
+    job_ids = [job_id for job_id in job_ids if job_id in document_ids]
+    for job_id in job_ids:
+        latest = job_events.latest(job_id=job_id)
+        job_events.publish(job_id, "cancelled", latest[0]["progress"] if latest else 0.0, "Cancelled")
+    
+    if remove_vectors:
+        document_service = await service_container.get_document_service()
+        for document_id in document_ids.values():
+            try:
+                removed = await document_service.delete_document_vectors(document_id)
+                if removed:
+                    logger.info(f"Removed {removed} partial chunks of cancelled document {document_id}")
+            except Exception as e:
+                logger.warning(f"Failed to remove chunks of cancelled document {document_id}: {e}")
+    
+    await document_catalog.set_index_state_many(list(document_ids.values()), "cancelled")
+    
+    for job_id in job_ids:
+        await resolve_duplicate_jobs(job_id)
+    return job_ids
+
+
+async def request_job_cancellation(job_ids: List[str]) -> List[str]:
+    """
+    Ask the processes running these jobs to cancel them. Their heartbeat
+    picks the request up, and the job finalizes itself and removes its own
+    chunks. Returns the jobs that were still processing.
+    """
+    if not job_ids:
+        return []
+    
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await session.execute(
+                update(ProcessingJob)
+                .where(ProcessingJob.id.in_(job_ids))
+                .where(ProcessingJob.status == "processing")
+                .values(cancel_requested_at=datetime.utcnow())
+                .returning(ProcessingJob.id)
+                .execution_options(synchronize_session=False)
+            )
+            requested = list(result.scalars().all())
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to request cancellation of jobs: {e}")
+            return []
+    
+    if requested:
+        logger.info(f"Requested cancellation of {len(requested)} jobs running in other processes")
+    return requested
+
+
+async def discard_if_cancelled(job_id: str) -> bool:
+    """
+    Clean up after a run whose completion was refused because the job was
+    cancelled meanwhile: the canceller may have removed the document's chunks
+    before this run wrote them.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(ProcessingJob.status, ProcessingJob.document_id).where(ProcessingJob.id == job_id)
+        )
+        job = result.first()
+    if not job or job.status != "cancelled":
+        return False
+    document_id = job.document_id
+    
+    try:
+        document_service = await service_container.get_document_service()
+        removed = await document_service.delete_document_vectors(document_id)
+        if removed:
+            logger.info(f"Removed {removed} chunks written by cancelled job {job_id}")
+    except Exception as e:
+        logger.warning(f"Failed to remove chunks of cancelled document {document_id}: {e}")
+    await document_catalog.set_index_state(document_id, "cancelled")
+    return True
+
+
+async def _document_for_job(job: ProcessingJob) -> DocumentResponse:
+    """The document a job processes, with catalog details where recorded"""
+    record = await document_catalog.get(job.document_id)
+    return DocumentResponse(
+        id=job.document_id,
+        filename=job.filename,
+        file_path=job.file_path,
+        content_type=(record.content_type if record else None) or "application/pdf",
+        file_size=job.file_size,
+        uploaded_at=record.uploaded_at if record else datetime.utcnow(),
+        indexed=False,
+        content_digest=job.content_digest
+    )
+
+
+async def resolve_duplicate_jobs(job_id: str):
+    """
+    Settle the jobs waiting on ``job_id`` because they hold identical content.
+    Once it has completed they link to its artifacts; if it failed or was
+    cancelled, or linking is not possible, they are released to process on
+    their own.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(ProcessingJob.status, ProcessingJob.document_id).where(ProcessingJob.id == job_id)
+        )
+        source = result.first()
+        result = await session.execute(
+            select(ProcessingJob).where(
+                ProcessingJob.duplicate_of == job_id,
+                ProcessingJob.status == "pending"
+            )
+        )
+        waiting = result.scalars().all()
+    
+    if not waiting or (source and source.status in ("pending", "processing")):
+        return
+    
+    released = []
+    for job in waiting:
+        if source and source.status == "completed":
+            document_service = await service_container.get_document_service()
+            document = await _document_for_job(job)
+            if await link_duplicate_document(job.id, source.document_id, document, document_service):
+                continue
+        released.append(job.id)
+    
+    if released:
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    update(ProcessingJob)
+                    .where(ProcessingJob.id.in_(released))
+                    .values(duplicate_of=None)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to release duplicates of job {job_id}: {e}")
+                return
+        ingestion_executor.submit_many(released)
+        logger.info(f"Released {len(released)} jobs that were waiting on job {job_id}")
+
+
+async def _run_document_pipeline(job_id: str, external_calls: ExternalCallCounter):
+    """Parse, extract and index a document exactly once, counting external calls"""
     try:
         logger.info(f"Starting document processing job {job_id}")
         
@@ -186,6 +542,22 @@ async def process_document_job(job_id: str):
                 logger.error(f"Job {job_id} not found")
                 return
         
+        job_events.register_job(job_id, job.batch_id)
+        
+        if job.cancel_requested_at:
+            # Cancelled from another process while it was claimed, released or recovered
+            ingestion_executor.mark_cancelled(job_id)
+            ingestion_executor.raise_if_cancelled(job_id)
+        
+        # A job that ran before (recovered after a crash or re-driven) resumes
+        # after its last completed stage; parse and extract results come back
+        # from the parse cache
+        resumed = job.started_at is not None
+        if resumed:
+            logger.info(f"Resuming job {job_id} after stage {job.last_completed_stage or 'none'}")
+        else:
+            job_progress_writer.record(job_id, started_at=datetime.utcnow())
+        
         # Step 1: Validate file exists
         await update_job_progress(job_id, 10.0, "Validating file")
         
@@ -193,102 +565,237 @@ async def process_document_job(job_id: str):
         if not file_path.exists():
             await complete_job(
                 job_id, False, 
-                error_message=f"File not found: {job.file_path}"
+                error_message=f"File not found: {job.file_path}",
+                external_calls=external_calls.to_dict()
             )
             return
         
         # Step 2: Create DocumentResponse object
+        ingestion_executor.raise_if_cancelled(job_id)
         await update_job_progress(job_id, 25.0, "Preparing document")
         
-        document = DocumentResponse(
-            id=job.document_id,
-            filename=job.filename,
-            file_path=job.file_path,
-            content_type="application/pdf",  # Default, could be improved
-            file_size=job.file_size,
-            uploaded_at=datetime.utcnow(),
-            indexed=False
-        )
+        document = await _document_for_job(job)
         
         # Step 3: Parse financial data (if available)
         financial_data = None
         try:
-            from app.services.financial_parser import FinancialDocumentParser
-            financial_parser = FinancialDocumentParser()
+            financial_parser = service_container.financial_parser
+            if financial_parser is None:
+                raise ValueError("Financial parser not available")
             
-            await update_job_progress(job_id, 40.0, "Parsing financial data with LlamaParse")
+            ingestion_executor.raise_if_cancelled(job_id)
+            await update_job_progress(job_id, 40.0, "Parsing financial data with LlamaParse", stage="parse")
             
-            financial_data = await financial_parser.parse_document(document)
+            # Reuse cached artifacts for this content; otherwise parse and
+            # extract under the executor's per-stage concurrency limits
+            financial_data = await financial_parser.load_cached(document)
+            if financial_data and financial_data.get("extracted_data") is not None:
+                job_progress_writer.record(job_id, last_completed_stage="extract")
+            else:
+                if financial_data:
+                    parsed_content = financial_data["parsed_content"]
+                else:
+                    async def parse():
+                        async with ingestion_executor.stage("parse"):
+                            return await financial_parser.parse_content(document)
+                    
+                    with time_stage("parse", bytes_in=document.file_size) as timer:
+                        parsed_content = await with_retries(parse, stage="parse")
+                        timer.bytes_out = len(parsed_content.encode())
+                    await financial_parser.store_cached(document, parsed_content)
+                job_progress_writer.record(job_id, last_completed_stage="parse")
+                
+                ingestion_executor.raise_if_cancelled(job_id)
+                await update_job_progress(job_id, 55.0, "Extracting financial data", stage="extract")
+                async def extract():
+                    async with ingestion_executor.stage("extract"):
+                        return await financial_parser.extract_content(parsed_content, document)
+                
+                with time_stage("extract", bytes_in=len(parsed_content.encode())) as timer:
+                    metadata, extracted_data, cacheable = await with_retries(extract, stage="extract")
+                    timer.bytes_out = len(json.dumps(metadata, default=str).encode())
+                if cacheable:
+                    await financial_parser.store_cached(document, parsed_content, metadata, extracted_data)
+                    job_progress_writer.record(job_id, last_completed_stage="extract")
+                
+                financial_data = {
+                    "document_id": document.id,
+                    "parsed_content": parsed_content,
+                    "metadata": metadata,
+                    "extracted_data": extracted_data
+                }
             
             # Update job with LlamaParse job ID if available
             if financial_data and financial_data.get('llamaparse_job_id'):
-                async with AsyncSessionLocal() as session:
-                    await session.execute(
-                        update(ProcessingJob)
-                        .where(ProcessingJob.id == job_id)
-                        .values(llamaparse_job_id=financial_data['llamaparse_job_id'])
-                    )
-                    await session.commit()
+                job_progress_writer.record(job_id, llamaparse_job_id=financial_data['llamaparse_job_id'])
             
             # Store financial metadata
             if financial_data and financial_data.get('extracted_data'):
                 await store_financial_metadata(job.document_id, financial_data['extracted_data'])
-                
-                async with AsyncSessionLocal() as session:
-                    await session.execute(
-                        update(ProcessingJob)
-                        .where(ProcessingJob.id == job_id)
-                        .values(financial_data_extracted=True)
-                    )
-                    await session.commit()
+                job_progress_writer.record(job_id, financial_data_extracted=True)
             
+        except RetryExhaustedError:
+            raise
         except Exception as e:
             logger.warning(f"Financial parsing failed for job {job_id}: {e}")
             # Continue with indexing even if financial parsing fails
         
         # Step 4: Index document in ChromaDB
-        await update_job_progress(job_id, 75.0, "Indexing document in vector database")
+        ingestion_executor.raise_if_cancelled(job_id)
+        await update_job_progress(job_id, 75.0, "Indexing document in vector database", stage="index")
         
         try:
-            from app.services.document_service import DocumentService
-            document_service = DocumentService()
-            await document_service.index_document(document)
-            
-            async with AsyncSessionLocal() as session:
-                await session.execute(
-                    update(ProcessingJob)
-                    .where(ProcessingJob.id == job_id)
-                    .values(indexed_in_chroma=True)
+            if job.last_completed_stage == "index":
+                logger.info(f"Job {job_id} already indexed before it was interrupted")
+            else:
+                document_service = await service_container.get_document_service()
+                
+                if resumed:
+                    # Drop chunks from an insert that was cut short so indexing stays idempotent
+                    await document_service.delete_document_vectors(document.id)
+                
+                # Reuse the parse from step 3 instead of parsing a second time
+                await document_service.index_document(
+                    document,
+                    financial_data=financial_data,
+                    parse_missing=False
                 )
-                await session.commit()
             
+            job_progress_writer.record(job_id, indexed_in_chroma=True, last_completed_stage="index")
+            
+        except RetryExhaustedError:
+            raise
         except Exception as e:
             logger.error(f"Document indexing failed for job {job_id}: {e}")
+            await document_catalog.set_index_state(job.document_id, "failed")
             await complete_job(
                 job_id, False,
-                error_message=f"Document indexing failed: {str(e)}"
+                error_message=f"Document indexing failed: {str(e)}",
+                external_calls=external_calls.to_dict()
             )
             return
         
         # Step 5: Complete successfully
+        ingestion_executor.raise_if_cancelled(job_id)
         await update_job_progress(job_id, 100.0, "Processing completed")
         
         result = {
             "document_id": job.document_id,
             "filename": job.filename,
             "financial_data_extracted": financial_data is not None,
-            "indexed": True
+            "indexed": True,
+            "external_calls": external_calls.to_dict()
         }
         
-        await complete_job(job_id, True, result)
+        await document_catalog.set_index_state(job.document_id, "indexed")
+        if not await complete_job(job_id, True, result, external_calls=external_calls.to_dict()):
+            await discard_if_cancelled(job_id)
+            return
+        
+        # Later uploads with the same content can reuse this document's artifacts
+        if job.content_digest:
+            await blob_store.set_source_document(job.content_digest, job.document_id)
+        
         logger.info(f"Document processing job {job_id} completed successfully")
         
+    except RetryExhaustedError as e:
+        logger.error(f"Document processing job {job_id} dead-lettered at stage {e.stage}: {e}")
+        await dead_letter_job(job_id, e.stage, str(e), external_calls=external_calls.to_dict())
     except Exception as e:
         logger.error(f"Document processing job {job_id} failed: {e}")
         await complete_job(
             job_id, False,
-            error_message=f"Processing failed: {str(e)}"
+            error_message=f"Processing failed: {str(e)}",
+            external_calls=external_calls.to_dict()
+        )
+
+
+async def recover_orphaned_jobs(include_unleased: bool = False) -> List[str]:
+    """
+    Return processing jobs whose worker stopped renewing its lease to the
+    queue. They resume after their last completed stage. With
+    ``include_unleased`` (used at startup) jobs that never recorded a lease
+    are recovered too.
+    """
+    stale = ProcessingJob.lease_expires_at < datetime.utcnow()
+    if include_unleased:
+        stale = or_(stale, ProcessingJob.lease_expires_at.is_(None))
+    
+    async with AsyncSessionLocal() as session:
+        try:
+            # The lease is checked in the UPDATE itself, so a renewal that
+            # lands first keeps the job with its worker
+            result = await session.execute(
+                update(ProcessingJob)
+                .where(ProcessingJob.status == "processing")
+                .where(stale)
+                # Never take back a job this process is still running
+                .where(ProcessingJob.id.notin_(list(ingestion_executor.running)))
+                .values(
+                    status="pending",
+                    current_step="Recovered after worker stopped",
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    recovery_count=func.coalesce(ProcessingJob.recovery_count, 0) + 1
+                )
+                .returning(ProcessingJob.id, ProcessingJob.last_completed_stage)
+                .execution_options(synchronize_session=False)
+            )
+            orphaned = list(result.all())
+            await session.commit()
+            
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Failed to recover orphaned jobs: {e}")
+            return []
+    
+    if not orphaned:
+        return []
+    
+    for job_id, stage in orphaned:
+        job_events.publish(job_id, "pending", 0.0, "Recovered after worker stopped", stage=stage)
+    ingestion_executor.submit_many([job_id for job_id, _ in orphaned])
+    
+    logger.info(f"Recovered {len(orphaned)} orphaned jobs")
+    return [job_id for job_id, _ in orphaned]
+
+
+async def relay_worker_events(since: datetime) -> datetime:
+    """
+    Publish progress made by worker processes to this process's subscribers.
+    
+    One query per call covers every unfinished job plus those finished since
+    ``since``; only jobs whose state changed are published. Returns the
+    watermark for the next call.
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(
+                ProcessingJob.id,
+                ProcessingJob.batch_id,
+                ProcessingJob.status,
+                ProcessingJob.progress,
+                ProcessingJob.current_step,
+                ProcessingJob.current_stage,
+                ProcessingJob.error_message,
+                ProcessingJob.result
+            )
+            .where(or_(
+                ProcessingJob.status.in_(("pending", "processing")),
+                ProcessingJob.completed_at >= since
+            ))
         )
+        rows = result.all()
+    
+    for job_id, batch_id, status, progress, current_step, stage, error_message, job_result in rows:
+        latest = job_events.latest(job_id=job_id)
+        if latest and (latest[0]["status"], latest[0]["progress"], latest[0]["current_step"]) == (status, progress, current_step):
+            continue
+        job_events.register_job(job_id, batch_id)
+        job_events.publish(job_id, status, progress, current_step, stage=stage,
+                           error_message=error_message, result=job_result)
+    return now
 
 
 class JobService:
@@ -297,27 +804,65 @@ class JobService:
     def __init__(self):
         self.document_service = None
         self.financial_parser = None
+        self.role = None
+        self._tasks: List[asyncio.Task] = []
+        self._init_lock = asyncio.Lock()
         self._initialized = False
     
-    async def initialize(self):
-        """Initialize the job service and scheduler"""
-        if self._initialized:
-            return
+    async def initialize(self, role: Optional[str] = None):
+        """Initialize the job service for ``role`` (defaults to settings.INGEST_MODE)"""
+        async with self._init_lock:
+            if not self._initialized:
+                await self._initialize(role)
+    
+    async def _initialize(self, role: Optional[str]):
+        role = role or settings.INGEST_MODE
+        if role not in ("inline", "api", "worker"):
+            raise ValueError(f"Unknown ingestion mode: {role}")
+        self.role = role
+        if role != "inline":
+            # The API and worker processes share one provider key: enforce rate limits together
+            rate_governor.use_shared_ledger()
         
         try:
-            # Initialize global scheduler
-            await initialize_global_scheduler()
+            # Jobs share the process-wide services, warmed up before any job runs
+            await service_container.start()
+            self.document_service = service_container.document_service
+            self.financial_parser = service_container.financial_parser
+            if self.financial_parser is None:
+                logger.warning("Financial parser not available")
             
-            # Initialize services
-            from app.services.document_service import DocumentService
-            self.document_service = DocumentService()
+            # Start the single writer for job progress, then the worker pool
+            await job_progress_writer.start()
             
-            try:
-                from app.services.financial_parser import FinancialDocumentParser
-                self.financial_parser = FinancialDocumentParser()
-            except Exception as e:
-                logger.warning(f"Financial parser not available: {e}")
-                self.financial_parser = None
+            if role == "inline":
+                # Initialize global scheduler
+                await initialize_global_scheduler()
+                
+                # Jobs left in processing by a process that died go back to the
+                # queue before the workers start, then get re-checked periodically
+                await recover_orphaned_jobs(include_unleased=True)
+                scheduler.add_job(
+                    recover_orphaned_jobs,
+                    'interval',
+                    seconds=settings.JOB_LEASE_SECONDS,
+                    id="recover_orphaned_jobs",
+                    replace_existing=True
+                )
+                
+                # Start the ingestion worker pool, re-enqueueing pending jobs
+                await ingestion_executor.start(process_document_job)
+            
+            elif role == "worker":
+                # Several worker processes may run at once, so recovery runs on
+                # a plain timer here rather than in the shared APScheduler job store
+                await recover_orphaned_jobs(include_unleased=True)
+                self._tasks.append(asyncio.create_task(self._recover_periodically(), name="job-recovery"))
+                await ingestion_executor.start(process_document_job, poll=True)
+            
+            else:
+                # Jobs run elsewhere: only relay their progress to subscribers
+                self._tasks.append(asyncio.create_task(self._relay_worker_events(), name="job-event-relay"))
             
             self._initialized = True
             logger.info("Job service initialized successfully")
@@ -328,8 +873,31 @@ class JobService:
     
     async def shutdown(self):
         """Shutdown the job service"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await ingestion_executor.stop()
+        await job_progress_writer.stop()
         await shutdown_global_scheduler()
     
+    async def _recover_periodically(self):
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS)
+            await recover_orphaned_jobs()
+    
+    async def _relay_worker_events(self):
+        since = datetime.utcnow()
+        while True:
+            await asyncio.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
+            if not job_events.has_subscribers:
+                since = datetime.utcnow()
+                continue
+            try:
+                since = await relay_worker_events(since)
+            except Exception as e:
+                logger.error(f"Failed to relay worker job events: {e}")
+    
     async def create_processing_job(self, document: DocumentResponse) -> str:
         """Create a new document processing job"""
         job_id = str(uuid.uuid4())
@@ -343,6 +911,7 @@ class JobService:
                     filename=document.filename,
                     file_path=document.file_path,
                     file_size=document.file_size,
+                    content_digest=document.content_digest,
                     status="pending",
                     progress=0.0,
                     current_step="Queued for processing"
@@ -351,18 +920,18 @@ class JobService:
                 session.add(job)
                 await session.commit()
                 
-                # Schedule the processing job using standalone function and global scheduler
-                global scheduler
-                if scheduler is None:
-                    raise RuntimeError("Scheduler not initialized")
+                job_events.register_job(job_id)
+                job_events.publish(job_id, "pending", 0.0, "Queued for processing")
                 
-                scheduler.add_job(
-                    process_document_job,
-                    'date',  # Run once immediately
-                    args=[job_id],
-                    id=f"process_doc_{job_id}",
-                    replace_existing=True
-                )
+                # Identical content already processed: link to its artifacts instead
+                if document.content_digest:
+                    blob = await blob_store.get(document.content_digest)
+                    if blob and blob.source_document_id and blob.source_document_id != document.id:
+                        if await link_duplicate_document(job_id, blob.source_document_id, document, self.document_service):
+                            return job_id
+                
+                # Hand the job to the bounded ingestion executor
+                ingestion_executor.submit(job_id)
                 
                 logger.info(f"Created processing job {job_id} for document {document.id}")
                 return job_id
@@ -372,57 +941,362 @@ class JobService:
                 logger.error(f"Failed to create processing job: {e}")
                 raise
     
-    async def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
-        """Get the status of a processing job"""
+    async def create_batch_jobs(self, documents: List[DocumentResponse], batch_id: str) -> List[str]:
+        """
+        Create processing jobs for a batch of documents in a single transaction.
+        
+        Members whose content was processed before link to its artifacts.
+        Members that repeat content earlier in the same batch wait for that
+        member's job and then link to it (see ``resolve_duplicate_jobs``).
+        """
         async with AsyncSessionLocal() as session:
             try:
-                result = await session.execute(
-                    select(ProcessingJob).where(ProcessingJob.id == job_id)
-                )
-                job = result.scalars().first()
+                # Look up all known digests at once
+                digests = {document.content_digest for document in documents if document.content_digest}
+                sources = {}
+                if digests:
+                    result = await session.execute(
+                        select(DocumentBlob.digest, DocumentBlob.source_document_id)
+                        .where(DocumentBlob.digest.in_(digests))
+                        .where(DocumentBlob.source_document_id.is_not(None))
+                    )
+                    sources = dict(result.all())
                 
-                if job:
-                    return job.to_dict()
-                return None
+                jobs = []
+                first_jobs = {}  # digest -> job processing it for this batch
+                for document in documents:
+                    job = ProcessingJob(
+                        id=str(uuid.uuid4()),
+                        document_id=document.id,
+                        batch_id=batch_id,
+                        filename=document.filename,
+                        file_path=document.file_path,
+                        file_size=document.file_size,
+                        content_digest=document.content_digest,
+                        status="pending",
+                        progress=0.0,
+                        current_step="Queued for processing"
+                    )
+                    digest = document.content_digest
+                    if digest and digest not in sources:
+                        if digest in first_jobs:
+                            job.duplicate_of = first_jobs[digest]
+                            job.current_step = "Waiting for identical document"
+                        else:
+                            first_jobs[digest] = job.id
+                    jobs.append(job)
+                
+                session.add_all(jobs)
+                await session.commit()
+                
+                for job in jobs:
+                    job_events.register_job(job.id, batch_id)
+                    job_events.publish(job.id, "pending", 0.0, job.current_step)
                 
             except Exception as e:
-                logger.error(f"Failed to get job status: {e}")
-                return None
+                await session.rollback()
+                logger.error(f"Failed to create batch jobs: {e}")
+                raise
+        
+        # Identical content already processed: link to its artifacts instead
+        queued = []
+        for job, document in zip(jobs, documents):
+            if job.duplicate_of:
+                continue
+            source_document_id = sources.get(document.content_digest)
+            if source_document_id and source_document_id != document.id:
+                if await link_duplicate_document(job.id, source_document_id, document, self.document_service):
+                    continue
+            queued.append(job.id)
+        
+        # Hand the rest to the bounded ingestion executor
+        ingestion_executor.submit_many(queued)
+        
+        logger.info(f"Created batch {batch_id} with {len(jobs)} processing jobs")
+        return [job.id for job in jobs]
     
-    async def get_jobs_by_status(self, status: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get jobs by status"""
+    async def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a pending or processing job.
+        
+        Queued jobs are removed and marked cancelled at once. Running jobs are
+        signalled; they stop at the next stage boundary (aborting any in-flight
+        provider call), remove their partial chunks and mark themselves cancelled.
+        Jobs running in another process get a cancel request, which that
+        process acts on at its next heartbeat.
+        """
+        job = await self.get_job_status(job_id)
+        if not job:
+            return None
+        if job["status"] not in ACTIVE_STATUSES:
+            raise ValueError(f"Cannot cancel job in status: {job['status']}")
+        
+        outcome = ingestion_executor.cancel(job_id)
+        if outcome == "running":
+            return {"job_id": job_id, "status": "cancelling"}
+        
+        # Queued here, or not owned by any live worker
+        if await finalize_cancelled_jobs([job_id], remove_vectors=job["status"] == "processing"):
+            return {"job_id": job_id, "status": "cancelled"}
+        if await request_job_cancellation([job_id]):
+            return {"job_id": job_id, "status": "cancelling"}
+        
+        # Finished between the status check and the cancel
+        job = await self.get_job_status(job_id)
+        raise ValueError(f"Cannot cancel job in status: {job['status'] if job else 'unknown'}")
+    
+    async def cancel_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel every unfinished job in a batch"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ProcessingJob.id, ProcessingJob.status).where(ProcessingJob.batch_id == batch_id)
+            )
+            jobs = result.all()
+        
+        if not jobs:
+            return None
+        
+        signalled = []
+        pending = []
+        processing = []
+        for job_id, status in jobs:
+            if status not in ACTIVE_STATUSES:
+                continue
+            if ingestion_executor.cancel(job_id) == "running":
+                signalled.append(job_id)
+            elif status == "pending":
+                pending.append(job_id)
+            else:
+                processing.append(job_id)
+        
+        cancelled = await finalize_cancelled_jobs(pending)
+        cancelled += await finalize_cancelled_jobs(processing, remove_vectors=True)
+        
+        # Whatever is left is running in another process, or has just finished
+        signalled += await request_job_cancellation(
+            [job_id for job_id in pending + processing if job_id not in cancelled]
+        )
+        
+        logger.info(f"Cancelled batch {batch_id}: {len(cancelled)} queued, {len(signalled)} running")
+        return {
+            "batch_id": batch_id,
+            "cancelled": len(cancelled),
+            "cancelling": len(signalled),
+            "already_finished": len(jobs) - len(cancelled) - len(signalled)
+        }
+    
+    async def redrive_dead_letter_jobs(self,
+                                       job_ids: Optional[List[str]] = None,
+                                       batch_id: Optional[str] = None,
+                                       stage: Optional[str] = None,
+                                       limit: int = 500) -> Dict[str, Any]:
+        """
+        Re-queue dead-lettered jobs. Each job resumes at its failed stage:
+        artifacts of the stages that already succeeded are read back from the
+        parse cache instead of calling the providers again.
+        """
+        query = select(ProcessingJob.id, ProcessingJob.failed_stage).where(ProcessingJob.status == "dead_letter")
+        if job_ids:
+            query = query.where(ProcessingJob.id.in_(job_ids))
+        if batch_id:
+            query = query.where(ProcessingJob.batch_id == batch_id)
+        if stage:
+            query = query.where(ProcessingJob.failed_stage == stage)
+        
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(query.order_by(ProcessingJob.created_at).limit(limit))
+            jobs = result.all()
+        
+        if not jobs:
+            return {"redriven": 0, "job_ids": [], "by_stage": {}}
+        
+        await ingestion_executor.check_capacity(len(jobs))
+        
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    update(ProcessingJob)
+                    .where(ProcessingJob.id.in_([job_id for job_id, _ in jobs]))
+                    .where(ProcessingJob.status == "dead_letter")
+                    .values(
+                        status="pending",
+                        progress=0.0,
+                        current_step="Queued for re-drive",
+                        completed_at=None,
+                        error_message=None,
+                        cancel_requested_at=None,
+                        redrive_count=func.coalesce(ProcessingJob.redrive_count, 0) + 1
+                    )
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to re-drive dead-lettered jobs: {e}")
+                raise
+        
+        by_stage: Dict[str, int] = {}
+        for job_id, failed_stage in jobs:
+            by_stage[failed_stage] = by_stage.get(failed_stage, 0) + 1
+            job_events.publish(job_id, "pending", 0.0, "Queued for re-drive", stage=failed_stage)
+        
+        ingestion_executor.submit_many([job_id for job_id, _ in jobs])
+        
+        logger.info(f"Re-drove {len(jobs)} dead-lettered jobs: {by_stage}")
+        return {
+            "redriven": len(jobs),
+            "job_ids": [job_id for job_id, _ in jobs],
+            "by_stage": by_stage
+        }
+    
+    async def get_batch_progress(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Get aggregate progress for all jobs in a batch"""
         async with AsyncSessionLocal() as session:
             try:
                 result = await session.execute(
-                    select(ProcessingJob)
-                    .where(ProcessingJob.status == status)
-                    .order_by(ProcessingJob.created_at.desc())
-                    .limit(limit)
+                    select(
+                        ProcessingJob.status,
+                        func.count(ProcessingJob.id),
+                        func.sum(ProcessingJob.progress)
+                    )
+                    .where(ProcessingJob.batch_id == batch_id)
+                    .group_by(ProcessingJob.status)
                 )
-                jobs = result.scalars().all()
+                rows = result.all()
+                
+                if not rows:
+                    return None
                 
-                return [job.to_dict() for job in jobs]
+                by_status = {status: count for status, count, _ in rows}
+                total_jobs = sum(by_status.values())
+                progress_sum = sum(progress or 0.0 for _, _, progress in rows)
+                finished = sum(by_status.get(status, 0) for status in ("completed", "failed", "cancelled", "dead_letter"))
+                
+                return {
+                    "batch_id": batch_id,
+                    "total_jobs": total_jobs,
+                    "by_status": by_status,
+                    "progress": round(progress_sum / total_jobs, 2),
+                    "completed": finished == total_jobs
+                }
                 
             except Exception as e:
-                logger.error(f"Failed to get jobs by status: {e}")
-                return []
+                logger.error(f"Failed to get batch progress: {e}")
+                return None
     
-    async def get_recent_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
-        """Get recent processing jobs"""
+    async def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the status of a processing job"""
         async with AsyncSessionLocal() as session:
             try:
                 result = await session.execute(
-                    select(ProcessingJob)
-                    .order_by(ProcessingJob.created_at.desc())
-                    .limit(limit)
+                    select(ProcessingJob).where(ProcessingJob.id == job_id)
                 )
-                jobs = result.scalars().all()
+                job = result.scalars().first()
                 
-                return [job.to_dict() for job in jobs]
+                if job:
+                    job_dict = job.to_dict()
+                    # Include progress that is recorded but not yet flushed
+                    for key, value in job_progress_writer.pending_values(job_id).items():
+                        job_dict[key] = value.isoformat() if isinstance(value, datetime) else value
+                    return job_dict
+                return None
                 
             except Exception as e:
-                logger.error(f"Failed to get recent jobs: {e}")
-                return []
+                logger.error(f"Failed to get job status: {e}")
+                return None
+    
+    async def list_jobs(self,
+                        limit: int = 50,
+                        cursor: Optional[str] = None,
+                        order: str = "desc",
+                        status: Optional[str] = None,
+                        document_id: Optional[str] = None,
+                        batch_id: Optional[str] = None,
+                        created_after: Optional[datetime] = None,
+                        created_before: Optional[datetime] = None,
+                        fields: str = "summary") -> Dict[str, Any]:
+        """
+        List jobs one page at a time using keyset pagination on
+        ``(created_at, id)``. Pass the returned ``next_cursor`` to get the
+        following page. ``fields="summary"`` selects only the columns a job
+        list needs; ``fields="full"`` returns complete job records.
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError("Invalid order. Must be 'asc' or 'desc'")
+        if fields not in ("summary", "full"):
+            raise ValueError("Invalid fields. Must be 'summary' or 'full'")
+        
+        if fields == "full":
+            query = select(ProcessingJob, JOB_CURSOR_KEY.label("cursor_key"))
+        else:
+            query = select(*JOB_SUMMARY_COLUMNS, JOB_CURSOR_KEY.label("cursor_key"))
+        
+        if status:
+            query = query.where(ProcessingJob.status == status)
+        if document_id:
+            query = query.where(ProcessingJob.document_id == document_id)
+        if batch_id:
+            query = query.where(ProcessingJob.batch_id == batch_id)
+        if created_after:
+            query = query.where(ProcessingJob.created_at >= created_after)
+        if created_before:
+            query = query.where(ProcessingJob.created_at < created_before)
+        
+        if cursor:
+            created_key, last_id = decode_cursor(cursor, "created_at")
+            key = tuple_(JOB_CURSOR_KEY, ProcessingJob.id)
+            query = query.where(key < (created_key, last_id) if order == "desc" else key > (created_key, last_id))
+        
+        if order == "desc":
+            query = query.order_by(ProcessingJob.created_at.desc(), ProcessingJob.id.desc())
+        else:
+            query = query.order_by(ProcessingJob.created_at.asc(), ProcessingJob.id.asc())
+        
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(query.limit(limit + 1))
+            rows = result.all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last.cursor_key, last.id if fields == "summary" else last[0].id)
+        
+        if fields == "full":
+            jobs = [job.to_dict() for job, _ in rows]
+        else:
+            jobs = [self._summary_dict(row) for row in rows]
+        
+        return {
+            "jobs": jobs,
+            "count": len(jobs),
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    def _summary_dict(row) -> Dict[str, Any]:
+        job = {column.key: row._mapping[column.key] for column in JOB_SUMMARY_COLUMNS}
+        for key in ("created_at", "started_at", "completed_at"):
+            if job[key]:
+                job[key] = job[key].isoformat()
+        return job
+    
+    async def get_jobs_by_status(self, status: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get jobs by status"""
+        try:
+            page = await self.list_jobs(limit=limit, status=status, fields="full")
+            return page["jobs"]
+        except Exception as e:
+            logger.error(f"Failed to get jobs by status: {e}")
+            return []
+    
+    async def get_recent_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get recent processing jobs"""
+        try:
+            page = await self.list_jobs(limit=limit, fields="full")
+            return page["jobs"]
+        except Exception as e:
+            logger.error(f"Failed to get recent jobs: {e}")
+            return []
     
 
 
@@ -0,0 +1,222 @@
+"""
+Persistent cache for LLM responses
+
+Completions are keyed by provider, model, temperature, max_tokens, any extra
+request parameters and a hash of the messages with whitespace normalized, so
+byte-for-byte repeats of a prompt (dashboard analytics, summaries) are served
+from SQLite instead of calling the provider. Caching is opt-in per call: an
+entry lives for the TTL the caller passes. Entries built on retrieved
+documents are marked corpus-scoped and dropped whenever a document is
+indexed or removed. Total size is bounded; least recently used entries are
+evicted first. Hits only read the database; their access times are written
+in batches (see ``cache_access``).
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from sqlalchemy import select, delete, func, or_
+from sqlalchemy.dialects.sqlite import insert
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import LLMResponseCacheEntry
+from app.services.cache_access import CacheAccessLog
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_content(content: str) -> str:
+    """Collapse whitespace so indentation and line-wrapping changes do not change the key"""
+    return " ".join(content.split())
+
+
+class LLMResponseCache:
+    """Size-bounded, SQLite-backed cache of LLM completions"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = settings.LLM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.accesses = CacheAccessLog(LLMResponseCacheEntry)
+
+    @staticmethod
+    def cache_key(provider: str,
+                  model: str,
+                  temperature: float,
+                  max_tokens: Optional[int],
+                  messages: List[Tuple[str, str]],
+                  params: Optional[Dict[str, Any]] = None) -> str:
+        """Hash of everything that determines the completion"""
+        raw = json.dumps({
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": [[role, normalize_content(content)] for role, content in messages],
+            "params": params or {}
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached, unexpired response, if present"""
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    select(LLMResponseCacheEntry).where(
+                        LLMResponseCacheEntry.cache_key == key,
+                        LLMResponseCacheEntry.expires_at > datetime.utcnow()
+                    )
+                )
+                entry = result.scalars().first()
+
+                if not entry:
+                    self.misses += 1
+                    return None
+
+            except Exception as e:
+                logger.error(f"LLM cache lookup failed: {e}")
+                return None
+
+        self.hits += 1
+        self.accesses.record(key)
+        if self.accesses.due:
+            await self.accesses.flush()
+        return {
+            "content": entry.content,
+            "provider": entry.provider,
+            "model": entry.model,
+            "usage": entry.usage or {},
+            "metadata": entry.response_metadata or {},
+            "cached_at": entry.created_at.isoformat() if entry.created_at else None
+        }
+
+    async def put(self,
+                  key: str,
+                  provider: str,
+                  model: str,
+                  content: str,
+                  ttl: int,
+                  usage: Optional[Dict[str, Any]] = None,
+                  metadata: Optional[Dict[str, Any]] = None,
+                  corpus_scoped: bool = False):
+        """Store a response for ``ttl`` seconds, replacing any existing entry, then enforce the size bound"""
+        if not settings.LLM_CACHE_ENABLED or ttl <= 0:
+            return
+
+        size_bytes = len(content.encode()) + len(json.dumps(usage or {})) + len(json.dumps(metadata or {}))
+        values = {
+            "provider": provider,
+            "model": model,
+            "content": content,
+            "usage": usage,
+            "response_metadata": metadata,
+            "corpus_scoped": corpus_scoped,
+            "size_bytes": size_bytes,
+            "hit_count": 0,
+            "created_at": datetime.utcnow(),
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+            "last_accessed_at": datetime.utcnow()
+        }
+
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    insert(LLMResponseCacheEntry)
+                    .values(cache_key=key, **values)
+                    .on_conflict_do_update(index_elements=[LLMResponseCacheEntry.cache_key], set_=values)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to store LLM response: {e}")
+                return
+
+        await self.evict()
+
+    async def evict(self) -> int:
+        """Delete expired entries, then least recently used ones until the cache fits in max_bytes"""
+        await self.accesses.flush()
+        async with AsyncSessionLocal() as session:
+            try:
+                expired = await session.execute(
+                    delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.expires_at <= datetime.utcnow())
+                )
+                evicted_count = expired.rowcount or 0
+
+                total = (await session.execute(
+                    select(func.coalesce(func.sum(LLMResponseCacheEntry.size_bytes), 0))
+                )).scalar()
+                if total > self.max_bytes:
+                    result = await session.execute(
+                        select(LLMResponseCacheEntry.cache_key, LLMResponseCacheEntry.size_bytes)
+                        .order_by(LLMResponseCacheEntry.last_accessed_at.asc())
+                    )
+                    evicted = []
+                    for cache_key, size_bytes in result.all():
+                        if total <= self.max_bytes:
+                            break
+                        evicted.append(cache_key)
+                        total -= size_bytes
+
+                    await session.execute(
+                        delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.cache_key.in_(evicted))
+                    )
+                    evicted_count += len(evicted)
+
+                await session.commit()
+                if evicted_count:
+                    logger.info(f"Evicted {evicted_count} cached LLM responses")
+                return evicted_count
+
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"LLM cache eviction failed: {e}")
+                return 0
+
+    async def invalidate_corpus(self):
+        """Drop every response that was built on retrieved documents"""
+        if not settings.LLM_CACHE_ENABLED:
+            return
+
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    delete(LLMResponseCacheEntry).where(
+                        or_(
+                            LLMResponseCacheEntry.corpus_scoped.is_(True),
+                            LLMResponseCacheEntry.expires_at <= datetime.utcnow()
+                        )
+                    )
+                )
+                await session.commit()
+                if result.rowcount:
+                    self.invalidations += result.rowcount
+                    logger.info(f"Invalidated {result.rowcount} cached LLM responses after a corpus change")
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to invalidate cached LLM responses: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidated": self.invalidations,
+            "pending_access_updates": self.accesses.pending,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Global LLM response cache instance
+llm_response_cache = LLMResponseCache()
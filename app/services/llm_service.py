@@ -7,13 +7,21 @@ functionality and error handling.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Union, AsyncIterator, Tuple
 from enum import Enum
 import logging
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.instrumentation import record_external_call, LatencyWindow
+from app.services.llm_cache import llm_response_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.embedding_migration import EMBEDDING_MODEL_DIMENSIONS, configured_embedding
+from app.services.context_packer import ContextChunk, PackedContext, pack_context, context_budget
+from app.services.rate_governor import rate_governor, estimate_request_tokens, is_bulk
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +107,24 @@ class BaseLLMProvider(ABC):
         """Generate text embedding (if supported)"""
         pass
     
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts; providers with a batch endpoint send them in one request"""
+        return [await self.generate_embedding(text) for text in texts]
+    
+    async def stream_response(self,
+                              messages: List[LLMMessage],
+                              temperature: float = 0.1,
+                              max_tokens: Optional[int] = None,
+                              **kwargs) -> AsyncIterator[Union[str, LLMResponse]]:
+        """
+        Stream a response: yields text deltas as they arrive, then the complete
+        ``LLMResponse`` with usage as the last item. Providers without a
+        streaming API yield the whole answer as one delta.
+        """
+        response = await self.generate_response(messages, temperature=temperature, max_tokens=max_tokens, **kwargs)
+        yield response.content
+        yield response
+    
     def is_available(self) -> bool:
         """Check if the provider is available"""
         return bool(self.api_key and self._client)
@@ -109,7 +135,8 @@ class OpenAIProvider(BaseLLMProvider):
     
     def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", **kwargs):
         super().__init__(api_key, model, **kwargs)
-        self.embedding_model = kwargs.get("embedding_model", "text-embedding-ada-002")
+        self.embedding_model = kwargs.get("embedding_model", settings.EMBEDDING_MODEL)
+        self.embedding_dimension = kwargs.get("embedding_dimension")
     
     async def initialize(self) -> bool:
         """Initialize OpenAI client"""
@@ -156,6 +183,7 @@ class OpenAIProvider(BaseLLMProvider):
             request_params.update(kwargs)
             
             # Make the API call
+            record_external_call("openai_chat")
             response = await self._client.chat.completions.create(**request_params)
             
             # Extract response content
@@ -182,18 +210,81 @@ class OpenAIProvider(BaseLLMProvider):
             logger.error(f"OpenAI generation error: {e}")
             raise
     
+    async def stream_response(self,
+                              messages: List[LLMMessage],
+                              temperature: float = 0.1,
+                              max_tokens: Optional[int] = None,
+                              **kwargs) -> AsyncIterator[Union[str, LLMResponse]]:
+        """Stream a response using OpenAI; usage arrives on the final chunk"""
+        try:
+            if not self._client:
+                raise RuntimeError("OpenAI client not initialized")
+            
+            request_params = {
+                "model": self.model,
+                "messages": [msg.to_openai_format() for msg in messages],
+                "temperature": temperature,
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            }
+            
+            if max_tokens:
+                request_params["max_tokens"] = max_tokens
+            
+            request_params.update(kwargs)
+            
+            record_external_call("openai_chat")
+            stream = await self._client.chat.completions.create(**request_params)
+            
+            parts = []
+            usage = {}
+            response_id = None
+            async for chunk in stream:
+                response_id = response_id or chunk.id
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None):
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens
+                    }
+            
+            yield LLMResponse(
+                content="".join(parts),
+                provider=LLMProvider.OPENAI,
+                model=self.model,
+                usage=usage,
+                metadata={"response_id": response_id}
+            )
+            
+        except Exception as e:
+            logger.error(f"OpenAI streaming error: {e}")
+            raise
+    
     async def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding using OpenAI"""
+        return (await self.generate_embeddings([text]))[0]
+    
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts in one OpenAI request"""
         try:
             if not self._client:
                 raise RuntimeError("OpenAI client not initialized")
             
-            response = await self._client.embeddings.create(
-                model=self.embedding_model,
-                input=text
-            )
+            request_params = {
+                "model": self.embedding_model,
+                "input": texts
+            }
+            if self.embedding_dimension and self.embedding_dimension != EMBEDDING_MODEL_DIMENSIONS.get(self.embedding_model):
+                # Shortened text-embedding-3 vectors
+                request_params["dimensions"] = self.embedding_dimension
+            
+            record_external_call("openai_embedding")
+            response = await self._client.embeddings.create(**request_params)
             
-            return response.data[0].embedding
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
             
         except Exception as e:
             logger.error(f"OpenAI embedding error: {e}")
@@ -262,6 +353,7 @@ class ClaudeProvider(BaseLLMProvider):
             request_params.update(kwargs)
             
             # Make the API call
+            record_external_call("claude_chat")
             response = await self._client.messages.create(**request_params)
             
             # Extract response content
@@ -293,12 +385,92 @@ class ClaudeProvider(BaseLLMProvider):
             logger.error(f"Claude generation error: {e}")
             raise
     
+    async def stream_response(self,
+                              messages: List[LLMMessage],
+                              temperature: float = 0.1,
+                              max_tokens: Optional[int] = None,
+                              **kwargs) -> AsyncIterator[Union[str, LLMResponse]]:
+        """Stream a response using Claude; usage comes from the final message"""
+        try:
+            if not self._client:
+                raise RuntimeError("Claude client not initialized")
+            
+            system_content = "\n\n".join(msg.content for msg in messages if msg.role == "system")
+            request_params = {
+                "model": self.model,
+                "max_tokens": max_tokens or self.max_tokens_default,
+                "temperature": temperature,
+                "messages": [msg.to_claude_format() for msg in messages if msg.role != "system"],
+            }
+            
+            if system_content:
+                request_params["system"] = system_content
+            
+            request_params.update(kwargs)
+            
+            record_external_call("claude_chat")
+            async with self._client.messages.stream(**request_params) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+            
+            content = "".join(block.text for block in message.content if hasattr(block, "text"))
+            yield LLMResponse(
+                content=content,
+                provider=LLMProvider.CLAUDE,
+                model=self.model,
+                usage={
+                    "input_tokens": message.usage.input_tokens,
+                    "output_tokens": message.usage.output_tokens,
+                    "total_tokens": message.usage.input_tokens + message.usage.output_tokens
+                },
+                metadata={"response_id": message.id}
+            )
+            
+        except Exception as e:
+            logger.error(f"Claude streaming error: {e}")
+            raise
+    
     async def generate_embedding(self, text: str) -> List[float]:
         """Claude doesn't support embeddings directly - fallback to OpenAI"""
         logger.warning("Claude doesn't support embeddings. Consider using OpenAI for embeddings.")
         raise NotImplementedError("Claude doesn't support embeddings. Use OpenAI provider for embeddings.")
 
 
+class ProviderHealth:
+    """Rolling latency and error rate of one provider's completions"""
+    
+    def __init__(self, size: Optional[int] = None):
+        size = size or settings.LLM_HEALTH_WINDOW
+        self.latency = LatencyWindow(size)
+        self.outcomes = deque(maxlen=size)  # True for success
+        self.errors = 0
+        self.last_error: Optional[str] = None
+    
+    def record_success(self, latency_ms: float):
+        self.latency.add(latency_ms)
+        self.outcomes.append(True)
+    
+    def record_error(self, error: Exception):
+        self.outcomes.append(False)
+        self.errors += 1
+        self.last_error = str(error)
+    
+    def error_rate(self) -> Optional[float]:
+        if not self.outcomes:
+            return None
+        return self.outcomes.count(False) / len(self.outcomes)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        error_rate = self.error_rate()
+        return {
+            "latency": self.latency.to_dict(),
+            "error_rate": round(error_rate, 3) if error_rate is not None else None,
+            "errors": self.errors,
+            "last_error": self.last_error
+        }
+
+
 class LLMService:
     """Main LLM service that manages multiple providers"""
     
@@ -306,15 +478,23 @@ class LLMService:
         self.providers: Dict[LLMProvider, BaseLLMProvider] = {}
         self.default_provider = default_provider
         self._initialized = False
+        # Time to first streamed token per provider
+        self.ttft: Dict[LLMProvider, LatencyWindow] = {}
+        # Completion latency and errors per provider, used for failover and hedging
+        self.health: Dict[LLMProvider, ProviderHealth] = {}
+        self.routing_stats = {"failovers": 0, "hedges": 0, "hedge_wins": 0}
     
     async def initialize(self):
         """Initialize all available providers"""
         try:
             # Initialize OpenAI if API key is available
             if settings.OPENAI_API_KEY:
+                embedding = configured_embedding()
                 openai_provider = OpenAIProvider(
                     api_key=settings.OPENAI_API_KEY,
-                    model="gpt-3.5-turbo"
+                    model="gpt-3.5-turbo",
+                    embedding_model=embedding["embedding_model"],
+                    embedding_dimension=embedding["embedding_dimension"]
                 )
                 if await openai_provider.initialize():
                     self.providers[LLMProvider.OPENAI] = openai_provider
@@ -363,8 +543,25 @@ class LLMService:
                               provider: Optional[LLMProvider] = None,
                               temperature: float = 0.1,
                               max_tokens: Optional[int] = None,
+                              cache_ttl: Optional[int] = None,
+                              corpus_scoped: bool = False,
+                              routing: Optional[str] = None,
                               **kwargs) -> LLMResponse:
-        """Generate a response using the specified or default provider"""
+        """
+        Generate a response using the specified or default provider.
+        
+        Pass ``cache_ttl`` (seconds) to reuse an identical earlier completion
+        from the response cache; set ``corpus_scoped`` when the prompt was
+        built from retrieved documents so the entry is dropped when the
+        corpus changes.
+        
+        ``routing`` (default ``LLM_ROUTING_POLICY``) decides what happens when
+        the provider is slow or failing: "single" uses it alone, "failover"
+        starts the other provider when it errors or passes
+        ``LLM_FAILOVER_DEADLINE_SECONDS``, and "hedged" additionally starts the
+        other provider for interactive calls once the primary has taken longer
+        than its recent p95 latency. The first successful answer wins.
+        """
         if not self._initialized:
             await self.initialize()
         
@@ -378,45 +575,331 @@ class LLMService:
         
         # Get provider and generate response
         llm_provider = self.get_provider(provider)
-        return await llm_provider.generate_response(
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
+        provider_type = provider or self.default_provider
+        
+        cache_key = None
+        if cache_ttl:
+            cache_key = llm_response_cache.cache_key(
+                provider_type.value,
+                llm_provider.model,
+                temperature,
+                max_tokens,
+                [(message.role, message.content) for message in messages],
+                kwargs
+            )
+            cached = await llm_response_cache.get(cache_key)
+            if cached:
+                return LLMResponse(
+                    content=cached["content"],
+                    provider=LLMProvider(cached["provider"]),
+                    model=cached["model"],
+                    usage=cached["usage"],
+                    metadata={**cached["metadata"], "cached": True, "cached_at": cached["cached_at"]}
+                )
+        
+        response = await self._route(
+            provider_type,
+            routing or settings.LLM_ROUTING_POLICY,
+            messages,
+            temperature,
+            max_tokens,
             **kwargs
         )
+        
+        if cache_key:
+            await llm_response_cache.put(
+                cache_key,
+                provider=response.provider.value,
+                model=response.model,
+                content=response.content,
+                ttl=cache_ttl,
+                usage=response.usage,
+                metadata=response.metadata,
+                corpus_scoped=corpus_scoped
+            )
+        
+        return response
+    
+    def _route_order(self, primary: LLMProvider, policy: str) -> List[LLMProvider]:
+        """Providers to try, best first; the alternate leads when the primary is failing"""
+        if policy == "single":
+            return [primary]
+        alternates = [provider for provider in self.providers if provider != primary]
+        if not alternates:
+            return [primary]
+        alternate = alternates[0]
+        
+        health = self.health.get(primary)
+        if health and len(health.outcomes) >= 5 and health.error_rate() >= settings.LLM_FAILOVER_ERROR_RATE:
+            alternate_health = self.health.get(alternate)
+            if not alternate_health or (alternate_health.error_rate() or 0) < health.error_rate():
+                return [alternate, primary]
+        return [primary, alternate]
+    
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        """Seconds to wait for ``provider`` before hedging: its recent p95 latency"""
+        health = self.health.get(provider)
+        if not health or len(health.latency.samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            delay = settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        else:
+            delay = health.latency.percentile(95) / 1000
+        return min(max(delay, settings.LLM_HEDGE_MIN_DELAY_SECONDS), settings.LLM_FAILOVER_DEADLINE_SECONDS)
+    
+    async def _route(self,
+                     primary: LLMProvider,
+                     policy: str,
+                     messages: List[LLMMessage],
+                     temperature: float,
+                     max_tokens: Optional[int],
+                     **kwargs) -> LLMResponse:
+        """Run a completion under a routing policy; see ``generate_response``"""
+        order = self._route_order(primary, policy)
+        if len(order) == 1:
+            return await self._call_provider(order[0], messages, temperature, max_tokens, **kwargs)
+        first, second = order
+        
+        hedge = policy == "hedged" and not is_bulk()
+        delay = self._hedge_delay(first) if hedge else settings.LLM_FAILOVER_DEADLINE_SECONDS
+        
+        # The deadline measures the provider, not time queued in our own rate governor
+        grant = await self._acquire(first, messages, max_tokens)
+        first_task = asyncio.create_task(
+            self._call_provider(first, messages, temperature, max_tokens, grant=grant, **kwargs)
+        )
+        tasks = {first_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done and first_task.exception() is None:
+                return self._tag_routing(first_task.result(), policy, primary, False)
+            
+            if done:
+                self.routing_stats["failovers"] += 1
+                logger.warning(f"{first.value} failed ({first_task.exception()}), failing over to {second.value}")
+                tasks = set()
+            elif hedge:
+                self.routing_stats["hedges"] += 1
+                logger.info(f"{first.value} slower than {delay:.1f}s, hedging with {second.value}")
+            else:
+                self.routing_stats["failovers"] += 1
+                logger.warning(f"{first.value} passed the {delay:.0f}s deadline, also trying {second.value}")
+            
+            second_task = asyncio.create_task(self._call_provider(second, messages, temperature, max_tokens, **kwargs))
+            tasks.add(second_task)
+            
+            error = first_task.exception() if first_task.done() else None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        response = task.result()
+                        if hedge and task is second_task:
+                            self.routing_stats["hedge_wins"] += 1
+                        return self._tag_routing(response, policy, primary, hedge)
+                    error = error or task.exception()
+            raise error
+        
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    @staticmethod
+    def _tag_routing(response: LLMResponse, policy: str, primary: LLMProvider, hedged: bool) -> LLMResponse:
+        response.metadata["routing"] = {
+            "policy": policy,
+            "requested": primary.value,
+            "served_by": response.provider.value,
+            "hedged": hedged
+        }
+        return response
+    
+    async def _call_provider(self,
+                             provider_type: LLMProvider,
+                             messages: List[LLMMessage],
+                             temperature: float,
+                             max_tokens: Optional[int],
+                             grant=None,
+                             **kwargs) -> LLMResponse:
+        """
+        One rate-limited completion from one provider, recorded in its health.
+        Pass ``grant`` when the rate governor was already acquired for it.
+        """
+        llm_provider = self.get_provider(provider_type)
+        if grant is None:
+            grant = await self._acquire(provider_type, messages, max_tokens)
+        health = self.health.setdefault(provider_type, ProviderHealth())
+        
+        started = time.perf_counter()
+        try:
+            response = await llm_provider.generate_response(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            health.record_error(e)
+            raise
+        
+        health.record_success((time.perf_counter() - started) * 1000)
+        await grant.settle(response.usage.get("total_tokens"))
+        return response
+    
+    async def _acquire(self, provider_type: LLMProvider, messages: List[LLMMessage], max_tokens: Optional[int]):
+        """Wait for the rate governor to admit a completion from ``provider_type``"""
+        return await rate_governor.acquire(
+            provider_type.value,
+            self.get_provider(provider_type).model,
+            estimate_request_tokens([message.content for message in messages], max_tokens)
+        )
     
     async def generate_response_with_context(self,
                                            query: str,
-                                           context_documents: List[str],
+                                           context_documents: List[Union[str, ContextChunk]],
                                            system_prompt: Optional[str] = None,
                                            provider: Optional[LLMProvider] = None,
                                            temperature: float = 0.1,
                                            max_tokens: Optional[int] = None,
                                            **kwargs) -> LLMResponse:
-        """Generate a response with document context"""
+        """
+        Generate a response with document context.
+        
+        The documents are packed into the smallest context token budget among
+        the providers the routing policy may use, so a failover or hedge
+        target gets a prompt that fits it too (see ``context_packer``); pass
+        ``ContextChunk`` objects to have them
+        ranked by retrieval score. ``metadata["context"]`` on the response
+        reports the tokens the context used and what was dropped.
+        """
         if not self._initialized:
             await self.initialize()
         
-        # Build context-aware system prompt
-        context_text = "\n\n".join([f"Document {i+1}:\n{doc}" for i, doc in enumerate(context_documents)])
-        
-        enhanced_system_prompt = system_prompt or ""
-        if context_documents:
-            enhanced_system_prompt += f"\n\nHere are some relevant documents for context:\n\n{context_text}"
+        provider_type = provider or self.default_provider
+        enhanced_system_prompt, packed = self._build_context_prompt(
+            system_prompt, context_documents, provider_type, kwargs.get("routing") or settings.LLM_ROUTING_POLICY
+        )
         
-        return await self.generate_response(
+        response = await self.generate_response(
             query=query,
             system_prompt=enhanced_system_prompt,
-            provider=provider,
+            provider=provider_type,
             temperature=temperature,
             max_tokens=max_tokens,
             **kwargs
         )
+        if packed:
+            response.metadata["context"] = packed.to_dict()
+        return response
+    
+    def _build_context_prompt(self,
+                              system_prompt: Optional[str],
+                              context_documents: List[Union[str, ContextChunk]],
+                              provider_type: LLMProvider,
+                              policy: str) -> Tuple[str, Optional[PackedContext]]:
+        """
+        Append the retrieved documents to the system prompt, packed into the
+        smallest token budget of the providers ``policy`` may route to
+        """
+        enhanced_system_prompt = system_prompt or ""
+        if not context_documents:
+            return enhanced_system_prompt, None
+        
+        budget = min(
+            context_budget(candidate.value, self.get_provider(candidate).model)
+            for candidate in self._route_order(provider_type, policy)
+        )
+        packed = pack_context(context_documents, budget)
+        
+        # Build context-aware system prompt
+        context_text = "\n\n".join([f"Document {i+1}:\n{doc}" for i, doc in enumerate(packed.chunks)])
+        if packed.chunks:
+            enhanced_system_prompt += f"\n\nHere are some relevant documents for context:\n\n{context_text}"
+        return enhanced_system_prompt, packed
+    
+    async def stream_response(self,
+                              query: str,
+                              system_prompt: Optional[str] = None,
+                              provider: Optional[LLMProvider] = None,
+                              temperature: float = 0.1,
+                              max_tokens: Optional[int] = None,
+                              context_documents: Optional[List[Union[str, ContextChunk]]] = None,
+                              **kwargs) -> AsyncIterator[Union[str, LLMResponse]]:
+        """
+        Stream a response from the specified or default provider: text deltas,
+        then the complete ``LLMResponse``. Its metadata carries ``ttft_ms``,
+        the time from sending the request to the first token, which is also
+        recorded per provider (see ``get_provider_info``), and the context
+        packing report as in ``generate_response_with_context``.
+        """
+        if not self._initialized:
+            await self.initialize()
+        
+        provider_type = provider or self.default_provider
+        self.get_provider(provider_type)
+        
+        messages = []
+        packed = None
+        if system_prompt or context_documents:
+            enhanced_system_prompt, packed = self._build_context_prompt(
+                system_prompt, context_documents or [], provider_type, settings.LLM_ROUTING_POLICY
+            )
+            messages.append(LLMMessage("system", enhanced_system_prompt))
+        messages.append(LLMMessage("user", query))
+        
+        # Under failover or hedged routing, a provider that fails before its
+        # first token is replaced by the other one
+        order = self._route_order(provider_type, settings.LLM_ROUTING_POLICY)
+        for attempt, candidate in enumerate(order):
+            llm_provider = self.get_provider(candidate)
+            grant = await self._acquire(candidate, messages, max_tokens)
+            health = self.health.setdefault(candidate, ProviderHealth())
+            
+            started = time.perf_counter()
+            ttft_ms = None
+            try:
+                async for item in llm_provider.stream_response(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs
+                ):
+                    if isinstance(item, LLMResponse):
+                        duration_ms = (time.perf_counter() - started) * 1000
+                        health.record_success(duration_ms)
+                        await grant.settle(item.usage.get("total_tokens"))
+                        item.metadata["ttft_ms"] = round(ttft_ms, 1) if ttft_ms is not None else None
+                        item.metadata["duration_ms"] = round(duration_ms, 1)
+                        if packed:
+                            item.metadata["context"] = packed.to_dict()
+                    elif ttft_ms is None and item:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                        self.ttft.setdefault(candidate, LatencyWindow()).add(ttft_ms)
+                    yield item
+                return
+            
+            except Exception as e:
+                health.record_error(e)
+                if ttft_ms is not None or attempt == len(order) - 1:
+                    raise
+                self.routing_stats["failovers"] += 1
+                logger.warning(f"{candidate.value} failed before streaming ({e}), failing over to {order[attempt + 1].value}")
     
     async def generate_embedding(self, 
                                text: str, 
                                provider: Optional[LLMProvider] = None) -> List[float]:
         """Generate embedding using available provider"""
+        return (await self.generate_embeddings([text], provider))[0]
+    
+    async def generate_embeddings(self,
+                                  texts: List[str],
+                                  provider: Optional[LLMProvider] = None) -> List[List[float]]:
+        """
+        Embed texts in order. Vectors already in the embedding cache are
+        reused; the rest are packed into batches by token count and sent one
+        request per batch.
+        """
         if not self._initialized:
             await self.initialize()
         
@@ -429,7 +912,21 @@ class LLMService:
                 raise ValueError("No embedding-capable provider available")
         
         llm_provider = self.get_provider(embedding_provider)
-        return await llm_provider.generate_embedding(text)
+        
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            await rate_governor.acquire(
+                embedding_provider.value,
+                llm_provider.embedding_model,
+                estimate_request_tokens(batch, 0)
+            )
+            return await llm_provider.generate_embeddings(batch)
+        
+        return await embedding_cache.embed(
+            texts,
+            llm_provider.embedding_model,
+            llm_provider.embedding_dimension,
+            embed_batch
+        )
     
     def set_default_provider(self, provider: LLMProvider):
         """Set the default provider"""
@@ -445,14 +942,20 @@ class LLMService:
             "initialized": self._initialized,
             "default_provider": self.default_provider,
             "available_providers": [],
-            "provider_details": {}
+            "provider_details": {},
+            "routing": {"policy": settings.LLM_ROUTING_POLICY, **self.routing_stats},
+            "response_cache": llm_response_cache.get_stats(),
+            "embedding_cache": embedding_cache.get_stats(),
+            "rate_limits": rate_governor.get_stats()
         }
         
         for provider_type, provider in self.providers.items():
             info["available_providers"].append(provider_type)
             info["provider_details"][provider_type] = {
                 "model": provider.model,
-                "available": provider.is_available()
+                "available": provider.is_available(),
+                "time_to_first_token": self.ttft[provider_type].to_dict() if provider_type in self.ttft else None,
+                "health": self.health[provider_type].to_dict() if provider_type in self.health else None
             }
         
         return info
@@ -0,0 +1,205 @@
+"""
+Persistent cache for document parse artifacts
+
+Stores the LlamaParse markdown, the raw extraction JSON and the structured
+financial data for a file, keyed by its content digest plus a fingerprint of
+the parser configuration (parsing instruction, extraction prompt and model).
+Changing any of those produces a new key, so stale artifacts are never
+served. Total size is bounded; least recently used entries are evicted first.
+Hits only read the database; their access times are written in batches (see
+``cache_access``).
+"""
+
+import hashlib
+import json
+from datetime import datetime, date
+from typing import Optional, Dict, Any
+import logging
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import ParseArtifact
+from app.services.cache_access import CacheAccessLog
+
+logger = logging.getLogger(__name__)
+
+
+def make_fingerprint(*parts: Any) -> str:
+    """Hash parser configuration into a short, stable fingerprint"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _json_safe(value: Any) -> Any:
+    """Convert dates and other non-JSON types so the value can be stored"""
+    return json.loads(json.dumps(value, default=lambda v: v.isoformat() if isinstance(v, (datetime, date)) else str(v)))
+
+
+# Fields of the structured financial data that the parser returns as dates
+_DATE_FIELDS = ("issue_date", "due_date")
+
+
+def _restore_dates(extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn the ISO strings ``_json_safe`` stored back into dates, as the parser returns them"""
+    restored = dict(extracted_data)
+    for field in _DATE_FIELDS:
+        value = restored.get(field)
+        if isinstance(value, str):
+            try:
+                restored[field] = date.fromisoformat(value[:10])
+            except ValueError:
+                pass
+    return restored
+
+
+class ParseCache:
+    """Size-bounded, SQLite-backed cache of parse artifacts"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = settings.PARSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.accesses = CacheAccessLog(ParseArtifact)
+
+    @staticmethod
+    def cache_key(content_digest: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{content_digest}:{fingerprint}".encode()).hexdigest()
+
+    async def get(self, content_digest: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return cached artifacts for this content and parser configuration, if present"""
+        if not settings.PARSE_CACHE_ENABLED:
+            return None
+
+        key = self.cache_key(content_digest, fingerprint)
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    select(ParseArtifact).where(ParseArtifact.cache_key == key)
+                )
+                artifact = result.scalars().first()
+
+                if not artifact:
+                    self.misses += 1
+                    return None
+
+            except Exception as e:
+                logger.error(f"Parse cache lookup failed: {e}")
+                return None
+
+        self.hits += 1
+        self.accesses.record(key)
+        if self.accesses.due:
+            await self.accesses.flush()
+        return {
+            "parsed_content": artifact.parsed_content,
+            "metadata": artifact.extraction,
+            "extracted_data": _restore_dates(artifact.extracted_data) if artifact.extracted_data else artifact.extracted_data
+        }
+
+    async def put(self,
+                  content_digest: str,
+                  fingerprint: str,
+                  parsed_content: str,
+                  extraction: Optional[Dict[str, Any]] = None,
+                  extracted_data: Optional[Dict[str, Any]] = None):
+        """Store artifacts, replacing any existing entry, then enforce the size bound"""
+        if not settings.PARSE_CACHE_ENABLED:
+            return
+
+        extraction = _json_safe(extraction) if extraction is not None else None
+        extracted_data = _json_safe(extracted_data) if extracted_data is not None else None
+        size_bytes = (
+            len(parsed_content.encode())
+            + len(json.dumps(extraction or {}))
+            + len(json.dumps(extracted_data or {}))
+        )
+        values = {
+            "parsed_content": parsed_content,
+            "extraction": extraction,
+            "extracted_data": extracted_data,
+            "size_bytes": size_bytes,
+            "last_accessed_at": datetime.utcnow()
+        }
+
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    insert(ParseArtifact)
+                    .values(
+                        cache_key=self.cache_key(content_digest, fingerprint),
+                        content_digest=content_digest,
+                        fingerprint=fingerprint,
+                        **values
+                    )
+                    .on_conflict_do_update(index_elements=[ParseArtifact.cache_key], set_=values)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to store parse artifacts: {e}")
+                return
+
+        await self.evict()
+
+    async def evict(self) -> int:
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        await self.accesses.flush()
+        async with AsyncSessionLocal() as session:
+            try:
+                total = (await session.execute(
+                    select(func.coalesce(func.sum(ParseArtifact.size_bytes), 0))
+                )).scalar()
+                if total <= self.max_bytes:
+                    return 0
+
+                result = await session.execute(
+                    select(ParseArtifact.cache_key, ParseArtifact.size_bytes)
+                    .order_by(ParseArtifact.last_accessed_at.asc())
+                )
+                evicted = []
+                for cache_key, size_bytes in result.all():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append(cache_key)
+                    total -= size_bytes
+
+                await session.execute(
+                    delete(ParseArtifact).where(ParseArtifact.cache_key.in_(evicted))
+                )
+                await session.commit()
+                logger.info(f"Evicted {len(evicted)} parse artifacts")
+                return len(evicted)
+
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Parse cache eviction failed: {e}")
+                return 0
+
+    async def invalidate(self, content_digest: str):
+        """Drop every cached artifact for a file's content"""
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    delete(ParseArtifact).where(ParseArtifact.content_digest == content_digest)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to invalidate parse artifacts for {content_digest}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process"""
+        return {
+            "enabled": settings.PARSE_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "pending_access_updates": self.accesses.pending,
+            "max_bytes": self.max_bytes
+        }
+
+
+# Global parse cache instance
+parse_cache = ParseCache()
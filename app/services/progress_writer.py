@@ -0,0 +1,246 @@
+"""
+Write-behind recorder for processing job state
+
+Pipeline steps record progress here instead of opening a session and
+committing for every change. Updates to the same job are merged in memory,
+and a single writer task flushes everything pending in one transaction on a
+short interval, so SQLite sees a handful of batched writes instead of a
+stream of tiny transactions competing for the database lock. Terminal
+states are written with ``write_now``, which returns only after the flush
+that contains them has committed. Stage duration observations are folded
+into the ``job_stage_metrics`` histogram in the same transactions.
+
+A progress update never moves a job out of a terminal state, so a job
+cancelled by another process stays cancelled even if this process still
+had progress for it queued. Terminal states are a compare-and-set as well:
+only a pending or processing job can finish, and ``write_now`` reports
+whether its terminal state was the one that landed. Every update also
+requires that the job is unleased or leased to this process, so a worker
+that stalled past its lease cannot write over the worker that recovered
+the job.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from sqlalchemy import update, or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import ProcessingJob, JobStageMetric
+from app.services.job_events import ACTIVE_STATUSES, TERMINAL_STATUSES
+from app.services.job_metrics import bucket_for, period_for
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgressWriter:
+    """Coalesces job updates and writes them from one background task"""
+
+    def __init__(self, flush_interval: Optional[float] = None, lock_retries: Optional[int] = None):
+        self.flush_interval = flush_interval or settings.JOB_PROGRESS_FLUSH_INTERVAL
+        self.lock_retries = settings.JOB_PROGRESS_LOCK_RETRIES if lock_retries is None else lock_retries
+        self.lease_owner: Optional[str] = None  # Worker ID of this process, set by the ingestion executor
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._stage_metrics: Dict[Tuple[str, datetime, int], List[float]] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._refused: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.updates_received = 0
+        self.rows_written = 0
+        self.commits = 0
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.terminal_writes = 0
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, job_id: str, **values: Any):
+        """Merge column updates for a job into the next flush"""
+        self._pending.setdefault(job_id, {}).update(values)
+        self.updates_received += 1
+
+    def observe_stage(self, stage: str, duration_ms: float):
+        """Add a stage duration to the histogram in the next flush"""
+        key = (stage, period_for(datetime.utcnow()), bucket_for(duration_ms))
+        counts = self._stage_metrics.setdefault(key, [0, 0.0])
+        counts[0] += 1
+        counts[1] += duration_ms
+
+    async def write_now(self, job_id: str, **values: Any) -> bool:
+        """
+        Record updates and wait until they are committed. Returns False if
+        they set a terminal status and the job had already finished (been
+        cancelled, usually) or another worker now holds its lease, in which
+        case none of them were written.
+        """
+        self._refused.discard(job_id)
+        self.record(job_id, **values)
+        self.terminal_writes += 1
+        await self.flush_soon()
+        if job_id in self._refused:
+            self._refused.discard(job_id)
+            return False
+        return True
+
+    def pending_values(self, job_id: str) -> Dict[str, Any]:
+        """Updates for a job that have not been written yet"""
+        return dict(self._pending.get(job_id, {}))
+
+    async def flush_soon(self):
+        """Ask the writer task to flush now and wait for the commit"""
+        if not self.started:
+            await self.flush()
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._wakeup.set()
+        await waiter
+
+    async def start(self):
+        """Start the writer task"""
+        if self.started:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="job-progress-writer")
+        logger.info(f"Job progress writer started (flush every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop the writer task and flush whatever is still pending"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        logger.info("Job progress writer stopped")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Job progress flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Write all pending updates in one transaction; returns the number of jobs written"""
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            metrics, self._stage_metrics = self._stage_metrics, {}
+            waiters, self._waiters = self._waiters, []
+
+            try:
+                if batch or metrics:
+                    self._refused.update(await self._write(batch, metrics))
+            except Exception as e:
+                # Put the batch back underneath anything recorded since
+                for job_id, values in batch.items():
+                    self._pending[job_id] = {**values, **self._pending.get(job_id, {})}
+                for key, (count, total_ms) in metrics.items():
+                    counts = self._stage_metrics.setdefault(key, [0, 0.0])
+                    counts[0] += count
+                    counts[1] += total_ms
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                raise
+
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            return len(batch)
+
+    async def _write(self, batch: Dict[str, Dict[str, Any]],
+                     metrics: Dict[Tuple[str, datetime, int], List[float]]) -> List[str]:
+        """Write a batch; returns the jobs whose terminal status was refused"""
+        for attempt in range(self.lock_retries + 1):
+            try:
+                refused = []
+                async with AsyncSessionLocal() as session:
+                    for job_id, values in batch.items():
+                        statement = (
+                            update(ProcessingJob)
+                            .where(ProcessingJob.id == job_id)
+                            .where(or_(
+                                ProcessingJob.lease_owner.is_(None),
+                                ProcessingJob.lease_owner == self.lease_owner
+                            ))
+                        )
+                        status = values.get("status")
+                        if status in TERMINAL_STATUSES:
+                            statement = statement.where(ProcessingJob.status.in_(ACTIVE_STATUSES))
+                        elif status in ACTIVE_STATUSES:
+                            statement = statement.where(ProcessingJob.status.notin_(TERMINAL_STATUSES))
+                        result = await session.execute(statement.values(**values))
+                        if status in TERMINAL_STATUSES and result.rowcount == 0:
+                            refused.append(job_id)
+                    for (stage, period_start, bucket_ms), (count, total_ms) in metrics.items():
+                        await session.execute(
+                            insert(JobStageMetric)
+                            .values(
+                                stage=stage,
+                                period_start=period_start,
+                                bucket_ms=bucket_ms,
+                                count=count,
+                                total_ms=total_ms
+                            )
+                            .on_conflict_do_update(
+                                index_elements=[JobStageMetric.stage, JobStageMetric.period_start, JobStageMetric.bucket_ms],
+                                set_={
+                                    "count": JobStageMetric.count + count,
+                                    "total_ms": JobStageMetric.total_ms + total_ms
+                                }
+                            )
+                        )
+                    await session.commit()
+                self.commits += 1
+                self.rows_written += len(batch) - len(refused)
+                if refused:
+                    logger.info(f"Refused terminal status for {len(refused)} jobs that had already finished")
+                return refused
+            except OperationalError as e:
+                if "locked" not in str(e) or attempt == self.lock_retries:
+                    raise
+                delay = 0.05 * 2 ** attempt
+                self.lock_waits += 1
+                self.lock_wait_seconds += delay
+                logger.debug(f"Database locked, retrying progress flush in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Write counters, including what the per-update commits would have cost"""
+        documents = self.terminal_writes
+        return {
+            "started": self.started,
+            "flush_interval": self.flush_interval,
+            "pending_jobs": len(self._pending),
+            "updates_received": self.updates_received,
+            "rows_written": self.rows_written,
+            "commits": self.commits,
+            "commits_saved": max(0, self.updates_received - self.commits),
+            "lock_waits": self.lock_waits,
+            "lock_wait_seconds": round(self.lock_wait_seconds, 3),
+            "documents_finished": documents,
+            "updates_per_document": round(self.updates_received / documents, 2) if documents else None,
+            "commits_per_document": round(self.commits / documents, 2) if documents else None,
+            "lock_waits_per_document": round(self.lock_waits / documents, 3) if documents else None
+        }
+
+
+# Global job progress writer instance
+job_progress_writer = JobProgressWriter()
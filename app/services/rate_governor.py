@@ -0,0 +1,316 @@
+"""
+Client-side request and token rate limits per LLM provider and model
+
+Every call to a provider first acquires a grant from ``rate_governor`` for
+its ``provider:model`` bucket, sized by the prompt's token count (tiktoken)
+plus the completion budget. A bucket enforces requests and tokens per minute
+over a sliding 60 second window, so bursts from ingestion, expense
+categorization and chat no longer trip the provider's 429s.
+
+Waiters queue per bucket: interactive calls (chat, queries) go ahead of bulk
+calls (ingestion, re-embedding) and calls of the same priority are served in
+arrival order. Bulk calls may only use ``1 - LLM_RATE_INTERACTIVE_RESERVE``
+of each limit, which leaves headroom for interactive traffic arriving from
+other processes too. Ingestion jobs and embedding migrations mark their
+tasks bulk with ``set_bulk_priority()``; everything else is interactive.
+
+When the API and workers run as separate processes, grants are recorded in
+the shared ``llm_rate_ledger`` table with a conditional insert, so the
+limits hold across all of them.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from sqlalchemy import select, update, delete, func, literal
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.core.instrumentation import estimate_tokens
+from app.db.database import AsyncSessionLocal
+from app.db.models import LLMRateGrant
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+WINDOW_SECONDS = 60.0
+
+_current_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+def set_bulk_priority():
+    """Mark the rest of the current task (and tasks it creates) as bulk traffic"""
+    _current_priority.set(PRIORITY_BULK)
+
+
+def is_bulk() -> bool:
+    """Whether calls made in the current context are bulk traffic"""
+    return _current_priority.get() == PRIORITY_BULK
+
+
+def estimate_request_tokens(prompt_texts: List[str], completion_tokens: Optional[int] = None) -> int:
+    """Prompt tokens plus the completion budget, the way providers count against TPM"""
+    prompt_tokens = sum(estimate_tokens(text) for text in prompt_texts if text)
+    if completion_tokens is None:
+        completion_tokens = settings.LLM_RATE_COMPLETION_TOKENS
+    return prompt_tokens + completion_tokens
+
+
+class RateGrant:
+    """Capacity taken by one call; ``settle`` replaces the estimate with the actual usage"""
+
+    def __init__(self,
+                 bucket: Optional["RateBucket"],
+                 tokens: int,
+                 entry: List[float],
+                 ledger_id: Optional[int] = None):
+        self.bucket = bucket
+        self.tokens = tokens
+        self.entry = entry
+        self.ledger_id = ledger_id
+
+    async def settle(self, actual_tokens: Optional[int]):
+        if self.bucket is None or not actual_tokens or actual_tokens == self.tokens:
+            return
+        self.entry[1] = actual_tokens
+        self.tokens = actual_tokens
+        self.bucket.wake()
+        if self.ledger_id is not None:
+            await rate_governor._settle_shared(self.ledger_id, actual_tokens)
+
+
+class RateBucket:
+    """Sliding-window RPM/TPM limits and the priority queue of callers for one provider and model"""
+
+    def __init__(self, key: str, rpm: int, tpm: int):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        # [granted_at, tokens] for grants made by this process in the last minute
+        self.window: deque = deque()
+        self.waiters: List[Tuple[int, int]] = []
+        self.condition = asyncio.Condition()
+        self.granted = 0
+        self.waited = 0
+        self.wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def limits_for(self, priority: int) -> Tuple[float, float]:
+        """RPM and TPM a caller of this priority may use"""
+        if priority == PRIORITY_INTERACTIVE:
+            return self.rpm, self.tpm
+        share = 1 - settings.LLM_RATE_INTERACTIVE_RESERVE
+        return max(1.0, self.rpm * share), max(1.0, self.tpm * share)
+
+    def expire(self, now: float):
+        while self.window and self.window[0][0] <= now - WINDOW_SECONDS:
+            self.window.popleft()
+
+    def usage(self) -> Tuple[int, int]:
+        return len(self.window), sum(entry[1] for entry in self.window)
+
+    def fits(self, tokens: int, priority: int) -> bool:
+        """Whether a grant fits in this process's window"""
+        rpm, tpm = self.limits_for(priority)
+        requests, used_tokens = self.usage()
+        # An oversized request still goes through once the window is empty
+        return requests < rpm and (used_tokens + tokens <= tpm or used_tokens == 0)
+
+    def next_expiry(self, now: float) -> float:
+        """Seconds until the oldest grant leaves the window"""
+        if not self.window:
+            return settings.LLM_RATE_POLL_INTERVAL
+        return max(0.01, self.window[0][0] + WINDOW_SECONDS - now)
+
+    def wake(self):
+        asyncio.get_running_loop().create_task(self._notify())
+
+    async def _notify(self):
+        async with self.condition:
+            self.condition.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.expire(time.time())
+        requests, used_tokens = self.usage()
+        return {
+            "rpm_limit": self.rpm,
+            "tpm_limit": self.tpm,
+            "requests_last_minute": requests,
+            "tokens_last_minute": used_tokens,
+            "queued": len(self.waiters),
+            "queued_interactive": sum(1 for priority, _ in self.waiters if priority == PRIORITY_INTERACTIVE),
+            "granted": self.granted,
+            "waited": self.waited,
+            "mean_wait_ms": round(self.wait_ms / self.waited, 1) if self.waited else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 1)
+        }
+
+
+class RateGovernor:
+    """Process-wide registry of rate buckets"""
+
+    def __init__(self):
+        self.buckets: Dict[str, RateBucket] = {}
+        self.shared = False
+        self._sequence = itertools.count()
+        self._grants_since_prune = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.LLM_RATE_LIMIT_ENABLED
+
+    def use_shared_ledger(self):
+        """Coordinate limits with other processes through the database"""
+        self.shared = True
+
+    def _limits(self, provider: str, model: str) -> Optional[Dict[str, int]]:
+        limits = settings.LLM_RATE_LIMITS
+        return limits.get(f"{provider}:{model}") or limits.get(provider)
+
+    def _bucket(self, provider: str, model: str) -> Optional[RateBucket]:
+        key = f"{provider}:{model}"
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            limits = self._limits(provider, model)
+            if not limits:
+                return None
+            bucket = RateBucket(key, limits.get("rpm", 0) or 10 ** 9, limits.get("tpm", 0) or 10 ** 12)
+            self.buckets[key] = bucket
+        return bucket
+
+    async def acquire(self, provider: str, model: str, tokens: int, priority: Optional[int] = None) -> RateGrant:
+        """
+        Wait for capacity for one request of ``tokens`` tokens. Call
+        ``settle(actual_tokens)`` on the returned grant once the provider
+        reports usage.
+        """
+        bucket = self._bucket(provider, model) if self.enabled else None
+        if bucket is None:
+            return RateGrant(None, tokens, [time.time(), tokens])
+
+        priority = _current_priority.get() if priority is None else priority
+        return await self._wait_for_grant(bucket, tokens, priority)
+
+    async def _wait_for_grant(self, bucket: RateBucket, tokens: int, priority: int) -> RateGrant:
+        waiter = (priority, next(self._sequence))
+        heapq.heappush(bucket.waiters, waiter)
+        started = time.perf_counter()
+        waited = False
+        try:
+            async with bucket.condition:
+                while True:
+                    now = time.time()
+                    bucket.expire(now)
+                    if bucket.waiters[0] == waiter and bucket.fits(tokens, priority):
+                        granted, ledger_id = True, None
+                        if self.shared:
+                            granted, ledger_id = await self._grant_shared(bucket, tokens, priority, now)
+                        if granted:
+                            entry = [now, tokens]
+                            bucket.window.append(entry)
+                            heapq.heappop(bucket.waiters)
+                            bucket.condition.notify_all()
+                            break
+                        # Another process holds the capacity: poll the ledger
+                        timeout = settings.LLM_RATE_POLL_INTERVAL
+                    else:
+                        timeout = bucket.next_expiry(now)
+                    waited = True
+                    try:
+                        await asyncio.wait_for(bucket.condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+        except BaseException:
+            if waiter in bucket.waiters:
+                bucket.waiters.remove(waiter)
+                heapq.heapify(bucket.waiters)
+                bucket.wake()
+            raise
+
+        bucket.granted += 1
+        if waited:
+            wait_ms = (time.perf_counter() - started) * 1000
+            bucket.waited += 1
+            bucket.wait_ms += wait_ms
+            bucket.max_wait_ms = max(bucket.max_wait_ms, wait_ms)
+        return RateGrant(bucket, tokens, entry, ledger_id)
+
+    async def _grant_shared(self,
+                            bucket: RateBucket,
+                            tokens: int,
+                            priority: int,
+                            now: float) -> Tuple[bool, Optional[int]]:
+        """
+        Record a grant in the shared ledger if every process together is under
+        the limits. Returns whether it was granted and the ledger row to settle.
+        """
+        rpm, tpm = bucket.limits_for(priority)
+        in_window = (LLMRateGrant.bucket == bucket.key, LLMRateGrant.granted_at > now - WINDOW_SECONDS)
+        requests = select(func.count()).where(*in_window).scalar_subquery()
+        used_tokens = select(func.coalesce(func.sum(LLMRateGrant.tokens), 0)).where(*in_window).scalar_subquery()
+
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    LLMRateGrant.__table__.insert()
+                    .from_select(
+                        ["bucket", "granted_at", "tokens", "priority"],
+                        select(literal(bucket.key), literal(now), literal(tokens), literal(priority))
+                        .where(requests < rpm, (used_tokens + tokens <= tpm) | (used_tokens == 0))
+                    )
+                    .returning(LLMRateGrant.id)
+                )
+                ledger_id = result.scalar()
+
+                self._grants_since_prune += 1
+                if self._grants_since_prune >= 100:
+                    self._grants_since_prune = 0
+                    await session.execute(
+                        delete(LLMRateGrant).where(LLMRateGrant.granted_at <= now - WINDOW_SECONDS)
+                    )
+                await session.commit()
+                return ledger_id is not None, ledger_id
+
+            except OperationalError as e:
+                await session.rollback()
+                if "locked" in str(e).lower():
+                    # Busy database: try again on the next poll
+                    return False, None
+                logger.error(f"Rate ledger grant failed, using local limits only: {e}")
+                return True, None
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Rate ledger grant failed, using local limits only: {e}")
+                return True, None
+
+    async def _settle_shared(self, ledger_id: int, actual_tokens: int):
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    update(LLMRateGrant).where(LLMRateGrant.id == ledger_id).values(tokens=actual_tokens)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to settle rate ledger grant {ledger_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Limits, current usage and queueing per bucket for this process"""
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "interactive_reserve": settings.LLM_RATE_INTERACTIVE_RESERVE,
+            "buckets": {key: bucket.to_dict() for key, bucket in self.buckets.items()}
+        }
+
+
+# Global rate governor instance
+rate_governor = RateGovernor()
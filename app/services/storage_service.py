@@ -0,0 +1,413 @@
+"""
+Streaming storage helpers for uploaded documents
+
+Uploads are written to a temporary file in fixed-size chunks while the
+SHA-256 digest and byte count are computed in the same pass, so memory use
+stays flat regardless of file size. Hashing, writes and the final fsync run
+in worker threads, so concurrent uploads do not block the event loop. The finished file is then moved into
+a content-addressed blob store with an atomic rename; each document path
+in DOCUMENTS_DIR is a hard link to its blob.
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+import logging
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import DocumentBlob, DocumentRecord
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload crosses the configured byte limit"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File too large. Maximum size: {max_size} bytes")
+
+
+class InvalidArchiveError(ValueError):
+    """Raised when a batch upload is not a readable ZIP or TAR archive"""
+
+
+class StoredUpload:
+    """Result of streaming an upload to disk"""
+
+    def __init__(self, temp_path: Path, size: int, sha256: str, elapsed: float):
+        self.path = temp_path
+        self.size = size
+        self.sha256 = sha256
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self) -> float:
+        """Write throughput in bytes per second"""
+        if self.elapsed <= 0:
+            return float(self.size)
+        return self.size / self.elapsed
+
+    def move_to(self, destination: Path) -> Path:
+        """Atomically rename the temporary file into its final location"""
+        os.replace(self.path, destination)
+        self.path = destination
+        return destination
+
+    def discard(self):
+        """Remove the file if it still exists"""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for API responses"""
+        return {
+            "bytes_received": self.size,
+            "sha256": self.sha256,
+            "elapsed_seconds": round(self.elapsed, 4),
+            "throughput_bytes_per_sec": round(self.throughput, 2)
+        }
+
+
+async def stream_upload_to_temp(upload,
+                                max_size: Optional[int] = None,
+                                chunk_size: Optional[int] = None) -> StoredUpload:
+    """
+    Stream an UploadFile (or any object with an async ``read(size)``) to a
+    temporary file, enforcing the size limit while copying.
+
+    Raises FileTooLargeError as soon as the copy crosses the limit; the
+    partial temporary file is removed before the exception propagates. An
+    UploadFile has already been received in full by then; bodies declared
+    too large are refused before that (see ``upload_size_limit``).
+    """
+    max_size = settings.MAX_FILE_SIZE if max_size is None else max_size
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    digest = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
+
+    def write(buffer, chunk: bytes):
+        digest.update(chunk)
+        buffer.write(chunk)
+
+    def sync(buffer):
+        buffer.flush()
+        os.fsync(buffer.fileno())
+
+    fd, temp_name = tempfile.mkstemp(dir=settings.UPLOAD_TMP_DIR, suffix=".part")
+    temp_path = Path(temp_name)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(max_size)
+                await asyncio.to_thread(write, buffer, chunk)
+            await asyncio.to_thread(sync, buffer)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    elapsed = time.perf_counter() - started
+    logger.debug(f"Streamed {size} bytes to {temp_path} in {elapsed:.3f}s")
+    return StoredUpload(temp_path, size, digest.hexdigest(), elapsed)
+
+
+def copy_stream_to_temp(source,
+                        max_size: Optional[int] = None,
+                        chunk_size: Optional[int] = None) -> StoredUpload:
+    """
+    Synchronous counterpart of stream_upload_to_temp for blocking file
+    objects such as archive members. Call it from a worker thread.
+    """
+    max_size = settings.MAX_FILE_SIZE if max_size is None else max_size
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    digest = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
+
+    fd, temp_name = tempfile.mkstemp(dir=settings.UPLOAD_TMP_DIR, suffix=".part")
+    temp_path = Path(temp_name)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(max_size)
+                digest.update(chunk)
+                buffer.write(chunk)
+            buffer.flush()
+            os.fsync(buffer.fileno())
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+    return StoredUpload(temp_path, size, digest.hexdigest(), time.perf_counter() - started)
+
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def is_archive_filename(filename: str) -> bool:
+    """Check whether a filename looks like a supported archive"""
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def extract_archive_members(fileobj, archive_name: str) -> Tuple[List[Tuple[str, StoredUpload]], List[Dict[str, str]]]:
+    """
+    Stream every allowed member of a ZIP or TAR archive into its own
+    temporary file, one chunk at a time.
+
+    Returns ``(extracted, skipped)`` where ``extracted`` pairs each member's
+    base filename with its StoredUpload. Blocking - run it in a worker thread.
+    """
+    extracted: List[Tuple[str, StoredUpload]] = []
+    skipped: List[Dict[str, str]] = []
+
+    def accept(member_name: str, member_size: int) -> Optional[str]:
+        filename = Path(member_name).name
+        if not filename or filename.startswith(".") or "__MACOSX" in member_name:
+            return None
+        if Path(filename).suffix.lower() not in settings.ALLOWED_EXTENSIONS:
+            skipped.append({"member": member_name, "reason": "file type not allowed"})
+            return None
+        if member_size > settings.MAX_FILE_SIZE:
+            skipped.append({"member": member_name, "reason": "file too large"})
+            return None
+        if len(extracted) >= settings.MAX_ARCHIVE_MEMBERS:
+            skipped.append({"member": member_name, "reason": "archive member limit reached"})
+            return None
+        return filename
+
+    def store(filename: str, member_name: str, source):
+        try:
+            extracted.append((filename, copy_stream_to_temp(source)))
+        except FileTooLargeError:
+            skipped.append({"member": member_name, "reason": "file too large"})
+
+    try:
+        if archive_name.lower().endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    filename = accept(info.filename, info.file_size)
+                    if filename:
+                        with archive.open(info) as source:
+                            store(filename, info.filename, source)
+        else:
+            # Stream mode reads members sequentially without seeking
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    filename = accept(member.name, member.size)
+                    if filename:
+                        source = archive.extractfile(member)
+                        if source is not None:
+                            store(filename, member.name, source)
+    except BaseException as e:
+        for _, stored in extracted:
+            stored.discard()
+        if isinstance(e, (zipfile.BadZipFile, tarfile.TarError)):
+            raise InvalidArchiveError(f"Could not read archive {archive_name}: {e}") from e
+        raise
+
+    return extracted, skipped
+
+
+class BlobStore:
+    """Content-addressed document storage keyed by SHA-256 with reference counting"""
+    
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or settings.BLOB_DIR
+    
+    def blob_path(self, digest: str) -> Path:
+        """Location of the blob for a digest, fanned out by its first two characters"""
+        return self.root / digest[:2] / digest
+    
+    async def add(self, stored: StoredUpload, link_path: Path) -> DocumentBlob:
+        """
+        Store an upload under its digest and link it to ``link_path``.
+        
+        If the blob already exists the temporary file is discarded; either way
+        the blob's reference count is incremented.
+        """
+        blobs = await self.add_many([(stored, link_path)])
+        return blobs[0]
+    
+    async def add_many(self, items: List[Tuple[StoredUpload, Path]]) -> List[DocumentBlob]:
+        """
+        Store several uploads and record all of their references in one
+        transaction. If it fails, the links and any blobs this call created
+        are removed again.
+        """
+        created: List[Path] = []
+        try:
+            for stored, link_path in items:
+                blob_path = self.blob_path(stored.sha256)
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                
+                if blob_path.exists():
+                    stored.discard()
+                else:
+                    stored.move_to(blob_path)
+                    created.append(blob_path)
+                
+                self._link(blob_path, link_path)
+            
+            async with AsyncSessionLocal() as session:
+                try:
+                    for stored, _ in items:
+                        await session.execute(
+                            insert(DocumentBlob)
+                            .values(
+                                digest=stored.sha256,
+                                blob_path=str(self.blob_path(stored.sha256)),
+                                file_size=stored.size,
+                                ref_count=1
+                            )
+                            .on_conflict_do_update(
+                                index_elements=[DocumentBlob.digest],
+                                set_={"ref_count": DocumentBlob.ref_count + 1}
+                            )
+                        )
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+                
+        except Exception:
+            for _, link_path in items:
+                link_path.unlink(missing_ok=True)
+            for blob_path in created:
+                blob_path.unlink(missing_ok=True)
+            raise
+        
+        for stored, link_path in items:
+            blob_path = self.blob_path(stored.sha256)
+            if not blob_path.exists():
+                # The last other reference was released meanwhile and took the file with it
+                self._link(link_path, blob_path)
+        
+        async with AsyncSessionLocal() as session:
+            digests = {stored.sha256 for stored, _ in items}
+            result = await session.execute(
+                select(DocumentBlob).where(DocumentBlob.digest.in_(digests))
+            )
+            blobs = {blob.digest: blob for blob in result.scalars().all()}
+            return [blobs[stored.sha256] for stored, _ in items]
+    
+    async def get(self, digest: str) -> Optional[DocumentBlob]:
+        """Look up a blob by digest"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(DocumentBlob).where(DocumentBlob.digest == digest)
+            )
+            return result.scalars().first()
+    
+    async def set_source_document(self, digest: str, document_id: str):
+        """Record the document whose processed artifacts can be reused for this digest"""
+        async with AsyncSessionLocal() as session:
+            try:
+                await session.execute(
+                    update(DocumentBlob)
+                    .where(DocumentBlob.digest == digest)
+                    .where(DocumentBlob.source_document_id.is_(None))
+                    .values(source_document_id=document_id)
+                )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to set source document for blob {digest}: {e}")
+    
+    async def release(self, digest: str, document_id: str):
+        """
+        Drop one reference to a blob, deleting it when the last reference is gone.
+        
+        The count is decremented in place and the row is deleted only while it
+        is still unreferenced, so a concurrent ``add_many`` or ``release`` is
+        never lost. If the released document was the artifact source for the
+        blob, another completed document with the same digest takes its place.
+        """
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.execute(
+                    update(DocumentBlob)
+                    .where(DocumentBlob.digest == digest)
+                    .values(ref_count=DocumentBlob.ref_count - 1)
+                    .returning(DocumentBlob.ref_count, DocumentBlob.source_document_id)
+                    .execution_options(synchronize_session=False)
+                )
+                blob = result.first()
+                if not blob:
+                    await session.rollback()
+                    return
+                
+                if blob.ref_count <= 0:
+                    result = await session.execute(
+                        delete(DocumentBlob)
+                        .where(DocumentBlob.digest == digest)
+                        .where(DocumentBlob.ref_count <= 0)
+                        .returning(DocumentBlob.blob_path)
+                        .execution_options(synchronize_session=False)
+                    )
+                    deleted = result.scalars().first()
+                    await session.commit()
+                    if deleted:
+                        Path(deleted).unlink(missing_ok=True)
+                        logger.info(f"Deleted blob {digest} (no remaining references)")
+                    return
+                
+                if blob.source_document_id == document_id:
+                    replacement = await session.execute(
+                        select(DocumentRecord.id)
+                        .where(DocumentRecord.content_digest == digest)
+                        .where(DocumentRecord.id != document_id)
+                        .where(DocumentRecord.index_state == "indexed")
+                        .limit(1)
+                    )
+                    await session.execute(
+                        update(DocumentBlob)
+                        .where(DocumentBlob.digest == digest)
+                        .where(DocumentBlob.source_document_id == document_id)
+                        .values(source_document_id=replacement.scalars().first())
+                    )
+                await session.commit()
+                
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Failed to release blob {digest}: {e}")
+    
+    def _link(self, blob_path: Path, link_path: Path):
+        """Hard link the blob into place, falling back to a copy across filesystems"""
+        try:
+            os.link(blob_path, link_path)
+        except OSError:
+            shutil.copy2(blob_path, link_path)
+
+
+# Global blob store instance
+blob_store = BlobStore()
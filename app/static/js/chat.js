@@ -11,6 +11,10 @@ class ChatClient {
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 1000;
         
+        // Answer currently being streamed
+        this.streamingMessage = null;
+        this.streamingText = '';
+        
         // DOM elements
         this.messagesContainer = document.getElementById('messagesContainer');
         this.messageInput = document.getElementById('messageInput');
@@ -175,6 +179,7 @@ class ChatClient {
         
         // Handle different message types
         if (data.type === 'error') {
+            this.streamingMessage = null;
             this.showErrorModal(data.error || data.message || 'An error occurred while processing your request.');
             return;
         }
@@ -190,6 +195,37 @@ class ChatClient {
             return;
         }
         
+        if (data.type === 'ai_response_sources') {
+            // Start a streamed answer: sources first, text follows in delta frames
+            this.streamingMessage = this.addMessage({
+                type: 'ai',
+                content: '',
+                sources: data.sources || [],
+                financial_summary: data.financial_summary || null,
+                timestamp: data.timestamp || new Date().toISOString()
+            });
+            this.streamingText = '';
+            return;
+        }
+        
+        if (data.type === 'ai_response_delta') {
+            if (this.streamingMessage) {
+                this.streamingText += data.content;
+                this.streamingMessage.querySelector('.message-bubble').innerHTML = this.formatAiResponse(this.streamingText);
+                this.scrollToBottom();
+            }
+            return;
+        }
+        
+        if (data.type === 'ai_response' && this.streamingMessage) {
+            // Final frame of a streamed answer: replace the accumulated text with the full answer
+            this.streamingMessage.querySelector('.message-bubble').innerHTML = this.formatAiResponse(data.answer || this.streamingText);
+            this.streamingMessage = null;
+            this.streamingText = '';
+            this.scrollToBottom();
+            return;
+        }
+        
         // Add AI response to chat
         this.addMessage({
             type: 'ai',
@@ -234,6 +270,7 @@ class ChatClient {
 
         this.messagesContainer.appendChild(messageElement);
         this.scrollToBottom();
+        return messageElement;
     }
 
     renderSources(sources) {
@@ -147,6 +147,48 @@ class FileManager {
     async trackProcessingJob(jobId, filename) {
         this.updateProgress(10, `Processing "${filename}" - Validating file...`);
         
+        if (!window.EventSource) {
+            return this.pollProcessingJob(jobId, filename);
+        }
+        
+        // Progress is pushed by the server; the stream closes when the job finishes
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(`/api/v1/jobs/events?job_id=${encodeURIComponent(jobId)}`);
+            let received = false;
+            
+            source.addEventListener('progress', (event) => {
+                received = true;
+                const progress = JSON.parse(event.data);
+                
+                // Update progress bar
+                const progressPercent = Math.max(10, progress.progress || 0);
+                const stepText = progress.current_step || 'Processing...';
+                this.updateProgress(progressPercent, `"${filename}" - ${stepText}`);
+                
+                if (progress.completed) {
+                    source.close();
+                    if (progress.status === 'failed' || progress.status === 'dead_letter') {
+                        reject(new Error(progress.error_message || 'Processing failed'));
+                    } else {
+                        resolve();
+                    }
+                }
+            });
+            
+            source.onerror = () => {
+                source.close();
+                if (received) {
+                    console.error(`Lost progress stream for job ${jobId}`);
+                    resolve();
+                } else {
+                    // Stream unavailable: fall back to polling
+                    this.pollProcessingJob(jobId, filename).then(resolve, reject);
+                }
+            };
+        });
+    }
+
+    async pollProcessingJob(jobId, filename) {
         let completed = false;
         let attempts = 0;
         const maxAttempts = 120; // Max 2 minutes with 1-second intervals
@@ -167,7 +209,7 @@ class FileManager {
                 
                 if (progress.completed) {
                     completed = true;
-                    if (progress.status === 'failed') {
+                    if (progress.status === 'failed' || progress.status === 'dead_letter') {
                         throw new Error(progress.error_message || 'Processing failed');
                     }
                 } else {
@@ -194,8 +236,8 @@ class FileManager {
             const response = await fetch('/api/v1/documents');
             if (!response.ok) throw new Error('Failed to load documents');
             
-            const documents = await response.json();
-            this.renderFiles(documents);
+            const data = await response.json();
+            this.renderFiles(data.documents);
         } catch (error) {
             this.showError('Failed to load documents: ' + error.message);
         }
@@ -0,0 +1,97 @@
+"""
+Standalone ingestion worker (penny-worker)
+
+Runs the document processing pipeline outside the API process. Each worker
+process claims pending jobs from the ``processing_jobs`` table under a lease,
+so any number of them can run next to an API started with
+``INGEST_MODE=api``:
+
+    INGEST_MODE=api uvicorn app.main:app
+    python -m app.worker --processes 2 --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(workers: Optional[int] = None):
+    """Run one worker process until SIGINT/SIGTERM, then release its claimed jobs"""
+    from app.db.database import create_tables
+    from app.services.container import service_container
+    from app.services.ingestion_executor import ingestion_executor
+    from app.services.job_service import job_service
+
+    if workers:
+        ingestion_executor.worker_count = workers
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await create_tables()
+
+    # Load the shared DocumentService once; every job reuses its warm index
+    await service_container.start(run_migrations=False)
+    await job_service.initialize(role="worker")
+    try:
+        await stop.wait()
+    finally:
+        logger.info(f"Stopping ingestion worker {ingestion_executor.worker_id}")
+        await job_service.shutdown()
+        await service_container.stop()
+
+
+def _run_process(workers: Optional[int], log_level: str):
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)s %(processName)s %(name)s %(levelname)s: %(message)s"
+    )
+    asyncio.run(run_worker(workers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="penny-worker", description="Run Penny ingestion workers")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes to start (default: 1)")
+    parser.add_argument("--workers", type=int, default=settings.INGEST_WORKERS,
+                        help=f"Concurrent jobs per process (default: {settings.INGEST_WORKERS})")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1:
+        _run_process(args.workers, args.log_level)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=_run_process,
+            args=(args.workers, args.log_level),
+            name=f"penny-worker-{index}"
+        )
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()